@@ -365,6 +365,7 @@ from detroit import (
 
 from .dispatch import dispatch
 from .drag import Drag as drag
+from .drag import QuadtreeSubject
 from .events import event_producers, pointer
 from .force import force_simulation
 from .selection import create, select
@@ -385,6 +386,7 @@ __version__ = importlib.metadata.version(__package__)
 
 __all__ = [
     "Delaunay",
+    "QuadtreeSubject",
     "SCHEME_ACCENT",
     "SCHEME_BLUES",
     "SCHEME_BRBG",
@@ -1,3 +1,4 @@
 from .drag import Drag
+from .subject import QuadtreeSubject
 
-__all__ = ["Drag"]
+__all__ = ["Drag", "QuadtreeSubject"]
@@ -6,7 +6,7 @@ from detroit.types import Accessor
 from lxml import etree
 
 from ..dispatch import Dispatch, dispatch
-from ..events import Event, MouseEvent, pointer
+from ..events import Event, MouseEvent, SessionAttribute, pointer
 from ..selection import LiveSelection, select
 from ..types import EventFunction, T
 from .drag_event import DragEvent
@@ -110,6 +110,15 @@ class Drag:
         Extra nodes to update when the listener is called
     """
 
+    # States of gestures are specific to each session
+    _gestures = SessionAttribute()
+    _container_element = SessionAttribute()
+    _active = SessionAttribute()
+    _mouse_down_x = SessionAttribute()
+    _mouse_down_y = SessionAttribute()
+    _mouse_moving = SessionAttribute()
+    _touch_ending = SessionAttribute()
+
     def __init__(self, extra_nodes: list[etree.Element] | None = None):
         self._extra_nodes = extra_nodes
         self._filter = argpass(default_filter)
@@ -301,6 +310,10 @@ class Drag:
         The subject is then exposed as event.subject on subsequent drag events
         for this gesture.
 
+        For nearest-node dragging over many data (e.g. nodes of a force
+        simulation), :code:`QuadtreeSubject` finds the subject without
+        scanning all data.
+
         Parameters
         ----------
         subject : EventFunction[T | None, T | dict[str, float]]
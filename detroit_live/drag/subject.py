@@ -0,0 +1,241 @@
+from collections.abc import Callable
+from typing import TypeVar
+
+from detroit.array import argpass
+from detroit.types import Accessor
+
+from ..events.spatial import Quadtree
+from ..force.simulation import LiveForceSimulation
+from ..types import T
+from .drag_event import DragEvent
+
+TQuadtreeSubject = TypeVar("QuadtreeSubject", bound="QuadtreeSubject")
+
+
+def default_x(d: T) -> float:
+    return d["x"]
+
+
+def default_y(d: T) -> float:
+    return d["y"]
+
+
+class QuadtreeSubject:
+    """
+    Subject accessor of a drag behavior (see :code:`Drag.set_subject`) which
+    returns the datum closest to the pointer. Positions of data are kept in a
+    quadtree, therefore the lookup made on each :code:`mousedown` does not
+    scan all data.
+
+    When bound to a force simulation (see :code:`QuadtreeSubject.bind`),
+    positions are updated on each tick of the simulation; only moved data
+    are reinserted and most of them stay in the same quadrant.
+
+    Parameters
+    ----------
+    data : list[T] | None
+        Data; nodes of the bound simulation by default
+    x : Accessor[T, float]
+        X-coordinate accessor called with :code:`(d, i, data)`
+    y : Accessor[T, float]
+        Y-coordinate accessor called with :code:`(d, i, data)`
+    radius : float | None
+        Search radius; unbounded by default
+
+    Examples
+    --------
+
+    >>> simulation = d3.force_simulation(nodes)
+    >>> subject = QuadtreeSubject(radius=20).bind(simulation)
+    >>> node.call(d3.drag().set_subject(subject).on("drag", dragged))
+    """
+
+    def __init__(
+        self,
+        data: list[T] | None = None,
+        x: Accessor[T, float] = default_x,
+        y: Accessor[T, float] = default_y,
+        radius: float | None = None,
+    ):
+        self._x = argpass(x)
+        self._y = argpass(y)
+        self._radius = radius
+        self._data = []
+        self._positions = []
+        self._quadtree = Quadtree()
+        if data is not None:
+            self.set_data(data)
+
+    def __call__(self, event: DragEvent, d: T | None = None) -> T | None:
+        return self.find(event.x, event.y)
+
+    def find(self, x: float, y: float, radius: float | None = None) -> T | None:
+        """
+        Returns the datum closest to the position :math:`(x, y)`.
+
+        Parameters
+        ----------
+        x : float
+            X-coordinate
+        y : float
+            Y-coordinate
+        radius : float | None
+            Search radius; the radius of the subject by default
+
+        Returns
+        -------
+        T | None
+            Closest datum within the radius if any
+        """
+        radius = self._radius if radius is None else radius
+        index = self._quadtree.nearest(x, y, radius)
+        return None if index is None else self._data[index]
+
+    def update(self, indices: list[int] | None = None) -> TQuadtreeSubject:
+        """
+        Reads positions of data again and moves those which changed in the
+        quadtree. Data moved by other means than the bound simulation (e.g.
+        in drag listeners) must be updated with this method.
+
+        Parameters
+        ----------
+        indices : list[int] | None
+            Indices of updated data; all data by default
+
+        Returns
+        -------
+        QuadtreeSubject
+            Itself
+        """
+        data = self._data
+        positions = self._positions
+        quadtree = self._quadtree
+        for i in range(len(data)) if indices is None else indices:
+            d = data[i]
+            x = self._x(d, i, data)
+            y = self._y(d, i, data)
+            if positions[i] != (x, y):
+                positions[i] = (x, y)
+                quadtree.insert(i, (x, y, x, y))
+        return self
+
+    def bind(self, simulation: LiveForceSimulation) -> TQuadtreeSubject:
+        """
+        Updates positions on each tick of the simulation. Data default to
+        nodes of the simulation and follow :code:`simulation.set_nodes`.
+
+        Parameters
+        ----------
+        simulation : LiveForceSimulation
+            Force simulation
+
+        Returns
+        -------
+        QuadtreeSubject
+            Itself
+        """
+        if not self._data:
+            self.set_data(simulation.get_nodes())
+        simulation.on(f"tick.subject-{id(self)}", self._ticked)
+        return self
+
+    def _ticked(self, simulation: LiveForceSimulation):
+        nodes = simulation.get_nodes()
+        if nodes is not self._data:
+            self.set_data(nodes)
+        else:
+            self.update()
+
+    def set_data(self, data: list[T]) -> TQuadtreeSubject:
+        """
+        Sets data and rebuilds the quadtree.
+
+        Parameters
+        ----------
+        data : list[T]
+            Data
+
+        Returns
+        -------
+        QuadtreeSubject
+            Itself
+        """
+        get_x = self._x
+        get_y = self._y
+        self._data = data
+        self._positions = [
+            (get_x(d, i, data), get_y(d, i, data)) for i, d in enumerate(data)
+        ]
+        self._quadtree.load(
+            {i: (x, y, x, y) for i, (x, y) in enumerate(self._positions)}
+        )
+        return self
+
+    def set_x(self, x: Accessor[T, float]) -> TQuadtreeSubject:
+        """
+        Sets the x-coordinate accessor and rebuilds the quadtree.
+
+        Parameters
+        ----------
+        x : Accessor[T, float]
+            X-coordinate accessor
+
+        Returns
+        -------
+        QuadtreeSubject
+            Itself
+        """
+        self._x = argpass(x)
+        return self.set_data(self._data)
+
+    def set_y(self, y: Accessor[T, float]) -> TQuadtreeSubject:
+        """
+        Sets the y-coordinate accessor and rebuilds the quadtree.
+
+        Parameters
+        ----------
+        y : Accessor[T, float]
+            Y-coordinate accessor
+
+        Returns
+        -------
+        QuadtreeSubject
+            Itself
+        """
+        self._y = argpass(y)
+        return self.set_data(self._data)
+
+    def set_radius(self, radius: float | None) -> TQuadtreeSubject:
+        """
+        Sets the search radius.
+
+        Parameters
+        ----------
+        radius : float | None
+            Search radius; unbounded when :code:`None`
+
+        Returns
+        -------
+        QuadtreeSubject
+            Itself
+        """
+        self._radius = radius
+        return self
+
+    def get_data(self) -> list[T]:
+        return self._data
+
+    def get_x(self) -> Callable[..., float]:
+        return self._x
+
+    def get_y(self) -> Callable[..., float]:
+        return self._y
+
+    def get_radius(self) -> float | None:
+        return self._radius
+
+    def __len__(self) -> int:
+        return len(self._quadtree)
+
+    def __repr__(self) -> str:
+        return f"QuadtreeSubject(size={len(self)}, radius={self._radius})"
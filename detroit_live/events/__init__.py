@@ -1,22 +1,43 @@
 from .base import Event
+from .binary import BinaryEncoder
+from .broadcast import Broadcaster, Subscriber
+from .coalescer import DiffCoalescer
 from .context_listener import ContextListener
+from .dirty_tracker import DirtyTracker
 from .event_listeners import EventListener, EventListeners, EventListenersGroup
 from .event_producers import EventProducers, event_producers
+from .marks import CanvasMarks, Marks
+from .offloader import DetachedCall, Offloader
 from .pointer import pointer
+from .session import Session, SessionAttribute, get_session
+from .spatial import SpatialIndex
 from .tracking_tree import TrackingTree
 from .types import MouseEvent, WheelEvent, WindowSizeEvent
 
 __all__ = [
+    "BinaryEncoder",
+    "Broadcaster",
+    "CanvasMarks",
     "ContextListener",
+    "DetachedCall",
+    "DiffCoalescer",
+    "DirtyTracker",
     "Event",
     "EventListener",
     "EventListeners",
     "EventListenersGroup",
     "EventProducers",
+    "Marks",
     "MouseEvent",
+    "Offloader",
+    "Session",
+    "SessionAttribute",
+    "SpatialIndex",
+    "Subscriber",
     "TrackingTree",
     "WheelEvent",
     "WindowSizeEvent",
     "event_producers",
+    "get_session",
     "pointer",
 ]
@@ -0,0 +1,189 @@
+import re
+import struct
+from collections.abc import Iterator
+from typing import Any
+
+import orjson
+
+# Records of a binary message; the first byte of a message is always
+# :code:`MAGIC` whereas JSON messages start with :code:`[`.
+MAGIC = 0
+NAME = 1
+RUN = 2
+STRINGS = 3
+REMOVE = 4
+JSON = 5
+
+NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d*[1-9])?")
+
+
+def parse_number(value: str) -> tuple[float, int] | None:
+    """
+    Parses an attribute value as a number if the client can format it back to
+    the same string.
+
+    Parameters
+    ----------
+    value : str
+        Attribute value
+
+    Returns
+    -------
+    tuple[float, int] | None
+        Number and its size in bytes (:code:`4` when the value holds on a
+        float32 without losing any significant digit, :code:`8` otherwise) or
+        :code:`None` if the value is not a number
+    """
+    if not isinstance(value, str) or NUMBER.fullmatch(value) is None:
+        return None
+    number = float(value)
+    if number and not (1e-6 <= abs(number) < 1e21) or value == "-0":
+        return None
+    digits = value.lstrip("-").replace(".", "").lstrip("0")
+    return number, 4 if len(digits) <= 6 else 8
+
+
+class BinaryEncoder:
+    """
+    Encoder of updated values into a compact binary message. One encoder must
+    be used per connection since attribute names are interned: each name is
+    sent once and then referenced by its index.
+
+    A message starts with a null byte followed by records:
+
+    * :code:`NAME` : :code:`u16` index, :code:`u16` length, UTF-8 name
+    * :code:`RUN` : :code:`u8` value size (:code:`4` or :code:`8`),
+      :code:`u16` number of names, :code:`u16` name indices, :code:`u32`
+      number of nodes, :code:`u32` node ids, then float32 or float64 values
+      node after node
+    * :code:`STRINGS` : :code:`u32` node id, :code:`u16` number of
+      attributes, then :code:`u16` name index, :code:`u32` length and UTF-8
+      value for each attribute
+    * :code:`REMOVE` : :code:`u32` node id, :code:`u16` number of names,
+      :code:`u16` name indices
+    * :code:`JSON` : :code:`u32` length, JSON value (structural operations
+      and values which do not reference nodes by numeric ids)
+
+    Numbers are little-endian. Differences between two structural operations
+    are grouped into runs: nodes whose changed numeric attributes have the
+    same names and the same size share the same run.
+    """
+
+    def __init__(self):
+        self._names = {}
+
+    def _name(self, name: str, header: bytearray) -> int:
+        if (index := self._names.get(name)) is None:
+            index = self._names[name] = len(self._names)
+            self._pack_name(name, index, header)
+        return index
+
+    def _pack_name(self, name: str, index: int, header: bytearray):
+        encoded = name.encode("utf-8")
+        header += struct.pack("<BHH", NAME, index, len(encoded))
+        header += encoded
+
+    def names(self) -> bytes:
+        """
+        Encodes all interned names into a binary message; it must be sent
+        first to a client which connects after names were interned (see
+        :code:`Broadcaster`).
+
+        Returns
+        -------
+        bytes
+            Binary message
+        """
+        header = bytearray([MAGIC])
+        for name, index in self._names.items():
+            self._pack_name(name, index, header)
+        return bytes(header)
+
+    def _diffs(
+        self,
+        diffs: list[dict[str, Any]],
+        header: bytearray,
+        body: bytearray,
+    ):
+        runs = {}
+        for value in diffs:
+            node_id = value["elementId"]
+            diff = value["diff"]
+            keys = []
+            numbers = []
+            size = 4
+            strings = []
+            for key, new in diff["change"]:
+                if (number := parse_number(new)) is None:
+                    strings.append((key, new))
+                else:
+                    keys.append(key)
+                    numbers.append(number[0])
+                    size = max(size, number[1])
+            if keys:
+                run = runs.setdefault((tuple(keys), size), ([], []))
+                run[0].append(node_id)
+                run[1].extend(numbers)
+            if strings:
+                body += struct.pack("<BIH", STRINGS, node_id, len(strings))
+                for key, new in strings:
+                    encoded = str(new).encode("utf-8")
+                    body += struct.pack(
+                        "<HI", self._name(key, header), len(encoded)
+                    )
+                    body += encoded
+            if remove := diff["remove"]:
+                body += struct.pack("<BIH", REMOVE, node_id, len(remove))
+                body += struct.pack(
+                    f"<{len(remove)}H", *(self._name(key, header) for key, _ in remove)
+                )
+        for (keys, size), (node_ids, numbers) in runs.items():
+            indices = [self._name(key, header) for key in keys]
+            body += struct.pack(
+                f"<BBH{len(indices)}H", RUN, size, len(indices), *indices
+            )
+            body += struct.pack("<I", len(node_ids))
+            body += struct.pack(f"<{len(node_ids)}I", *node_ids)
+            body += struct.pack(
+                f"<{len(numbers)}{'f' if size == 4 else 'd'}", *numbers
+            )
+
+    def _segments(
+        self, values: list[dict[str, Any]]
+    ) -> Iterator[tuple[bool, list[dict[str, Any]]]]:
+        diffs = []
+        for value in values:
+            if "diff" in value and isinstance(value.get("elementId"), int):
+                diffs.append(value)
+                continue
+            if diffs:
+                yield True, diffs
+                diffs = []
+            yield False, [value]
+        if diffs:
+            yield True, diffs
+
+    def encode(self, values: list[dict[str, Any]]) -> bytes:
+        """
+        Encodes updated values into a binary message.
+
+        Parameters
+        ----------
+        values : list[dict[str, Any]]
+            Updated values sent through websocket
+
+        Returns
+        -------
+        bytes
+            Binary message
+        """
+        header = bytearray([MAGIC])
+        body = bytearray()
+        for is_diff, segment in self._segments(values):
+            if is_diff:
+                self._diffs(segment, header, body)
+            else:
+                encoded = orjson.dumps(segment[0])
+                body += struct.pack("<BI", JSON, len(encoded))
+                body += encoded
+        return bytes(header + body)
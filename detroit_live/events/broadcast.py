@@ -0,0 +1,312 @@
+import asyncio
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any
+
+import orjson
+
+from .binary import BinaryEncoder
+from .coalescer import DiffCoalescer
+from .event_producers import EventProducers
+from .marks import CanvasMarks
+from .tracking_tree import TrackingTree
+from .utils import to_string
+
+
+class Subscriber:
+    """
+    Subscriber of a :code:`Broadcaster`, one per websocket connection.
+    Messages are put into a send buffer and sent by a dedicated task; a slow
+    subscriber therefore never stalls the others.
+
+    When the buffer is full, pending messages are dropped and replaced by a
+    snapshot of the document which brings the client back to the current
+    state.
+
+    Parameters
+    ----------
+    send : Callable[[bytes], Awaitable[None]]
+        Function which sends a message through websocket
+    buffer_size : int
+        Maximum number of pending messages
+    resync : Callable[[], list[bytes]]
+        Function which returns messages bringing a client to the current
+        state of the document
+    encode : Callable[[list[dict[str, Any]]], bytes]
+        Encoder of acknowledgements
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes], Awaitable[None]],
+        buffer_size: int,
+        resync: Callable[[], list[bytes]],
+        encode: Callable[[list[dict[str, Any]]], bytes],
+    ):
+        self._send = send
+        self._buffer_size = buffer_size
+        self._resync = resync
+        self._encode = encode
+        self._buffer = deque()
+        self._acks = DiffCoalescer()
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        self.resyncs = 0
+
+    def acknowledge(self, typename: str | None):
+        """
+        Acknowledges an event received from this subscriber; acknowledgements
+        are sent to this subscriber only.
+
+        Parameters
+        ----------
+        typename : str | None
+            Typename of the received event
+        """
+        self._acks.acknowledge(typename)
+
+    def put(self, message: bytes):
+        """
+        Puts a message into the send buffer. When the buffer is full, pending
+        messages are replaced by a snapshot which includes the message.
+
+        Parameters
+        ----------
+        message : bytes
+            Encoded message
+        """
+        if len(self._buffer) >= self._buffer_size:
+            self.resync()
+            self.resyncs += 1
+        else:
+            self._buffer.append(message)
+
+    def resync(self):
+        """
+        Replaces pending messages by a snapshot of the document.
+        """
+        self._buffer.clear()
+        self._buffer.extend(self._resync())
+
+    def flush(self):
+        """
+        Wakes up the send task at the end of a frame.
+        """
+        if self._buffer or self._acks:
+            self._ready.set()
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._buffer:
+                await self._send(self._buffer.popleft())
+            if self._acks:
+                await self._send(self._encode(self._acks.flush()))
+
+    def close(self):
+        """
+        Stops the send task.
+        """
+        self._task.cancel()
+
+
+class Broadcaster:
+    """
+    Publisher which shares the document between all websocket connections.
+    Updated values of a frame, from timers or listeners, are merged and
+    encoded once; the same message is then put into the send buffer of each
+    subscriber (see :code:`Subscriber`).
+
+    A new subscriber first receives a snapshot of the document (and names
+    interned by the binary encoder), which catches up frames published since
+    the page was rendered.
+
+    Parameters
+    ----------
+    frame_window : float
+        Duration in milliseconds during which updated values are merged
+        before being published
+    binary : bool
+        :code:`True` for encoding messages with :code:`BinaryEncoder`
+    buffer_size : int
+        Maximum number of pending messages per subscriber
+    """
+
+    def __init__(
+        self,
+        frame_window: float = 16.0,
+        binary: bool = False,
+        buffer_size: int = 64,
+    ):
+        if buffer_size < 1:
+            raise ValueError(f"Invalid buffer size: {buffer_size}")
+        self._encoder = BinaryEncoder() if binary else None
+        self._encode = orjson.dumps if self._encoder is None else self._encoder.encode
+        self._frame_window = frame_window
+        self._buffer_size = buffer_size
+        self._subscribers = set()
+        self._coalescer = DiffCoalescer()
+        self._producers = EventProducers()
+        self._consumer = None
+        self._frame = None
+        self.published = 0
+
+    @property
+    def subscribers(self) -> int:
+        """
+        Returns the number of subscribers.
+
+        Returns
+        -------
+        int
+            Number of subscribers
+        """
+        return len(self._subscribers)
+
+    def snapshot(self) -> list[bytes]:
+        """
+        Returns messages which bring a client to the current state of the
+        document.
+
+        Returns
+        -------
+        list[bytes]
+            Encoded messages
+        """
+        ttree = TrackingTree()
+        root = ttree.root
+        messages = [] if self._encoder is None else [self._encoder.names()]
+        if root is not None:
+            messages.append(
+                self._encode(
+                    [
+                        {
+                            "op": "replace",
+                            "elementId": ttree.get_reference(root),
+                            "outerHTML": to_string(root),
+                        },
+                        *CanvasMarks().snapshot(root),
+                    ]
+                )
+            )
+        return messages
+
+    def subscribe(self, send: Callable[[bytes], Awaitable[None]]) -> Subscriber:
+        """
+        Adds a subscriber and starts producers if needed.
+
+        Parameters
+        ----------
+        send : Callable[[bytes], Awaitable[None]]
+            Function which sends a message through websocket
+
+        Returns
+        -------
+        Subscriber
+            Subscriber
+        """
+        subscriber = Subscriber(send, self._buffer_size, self.snapshot, self._encode)
+        subscriber.resync()
+        subscriber.flush()
+        self._subscribers.add(subscriber)
+        self.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        """
+        Removes a subscriber.
+
+        Parameters
+        ----------
+        subscriber : Subscriber
+            Subscriber
+        """
+        self._subscribers.discard(subscriber)
+        subscriber.close()
+
+    def start(self):
+        """
+        Starts timers which are not started yet and the task which consumes
+        their updated values.
+        """
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.create_task(self._consume())
+        self._start_timers()
+
+    def _start_timers(self, result: int | None = None):
+        if next_tasks := self._producers.next_tasks(result):
+            for task in next_tasks:
+                task.add_done_callback(self._timer_done)
+
+    def _timer_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is None:
+            self._start_timers(task.result())
+
+    async def _consume(self):
+        while True:
+            _source, values = await self._producers.queue_task()
+            self.extend(values)
+
+    def extend(self, values: Iterable[dict[str, Any]]):
+        """
+        Adds updated values to the current frame.
+
+        Parameters
+        ----------
+        values : Iterable[dict[str, Any]]
+            Updated values produced by a listener or a timer callback
+        """
+        self._coalescer.extend(values)
+        self._schedule()
+
+    def add_task(self, task: asyncio.Task[list[dict[str, Any]]]):
+        """
+        Adds updated values returned by a task (asynchronous listener) to the
+        frame during which it is done.
+
+        Parameters
+        ----------
+        task : asyncio.Task[list[dict[str, Any]]]
+            Task returning updated values
+        """
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task[list[dict[str, Any]]]):
+        if not task.cancelled() and task.exception() is None:
+            self.extend(task.result())
+
+    def acknowledge(self, subscriber: Subscriber, typename: str | None):
+        """
+        Acknowledges an event received from a subscriber at the end of the
+        current frame.
+
+        Parameters
+        ----------
+        subscriber : Subscriber
+            Subscriber which sent the event
+        typename : str | None
+            Typename of the event
+        """
+        subscriber.acknowledge(typename)
+        self._schedule()
+
+    def _schedule(self):
+        if self._frame is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if self._frame_window > 0:
+            self._frame = loop.call_later(self._frame_window / 1000, self._flush)
+        else:
+            self._frame = loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._frame = None
+        values = self._coalescer.flush()
+        if values and self._subscribers:
+            message = self._encode(values)
+            self.published += 1
+            for subscriber in self._subscribers:
+                subscriber.put(message)
+        for subscriber in self._subscribers:
+            subscriber.flush()
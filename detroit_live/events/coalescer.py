@@ -0,0 +1,111 @@
+from collections.abc import Iterable
+from typing import Any
+
+from .dirty_tracker import same_elements
+
+
+class DiffCoalescer:
+    """
+    Output stage which gathers updated values produced during a frame window
+    and merges them before they are sent through websocket.
+
+    Attribute differences are merged per node: the latest value wins for each
+    attribute, so an attribute written several times during the window is
+    sent once. Consecutive columnar writes on the same elements are merged
+    likewise. Structural operations (insertions, removals and moves) keep
+    their order; differences gathered before an operation are emitted before
+    it since references of nodes may depend on it.
+
+    Received events are acknowledged at the end of the frame, which lets the
+    client limit the number of events in flight.
+    """
+
+    def __init__(self):
+        self._values = []
+        self._pending = {}
+        self._acks = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._values or self._pending or self._acks)
+
+    def acknowledge(self, typename: str | None):
+        """
+        Acknowledges a received event; acknowledgements are sent with the
+        values of the current frame.
+
+        Parameters
+        ----------
+        typename : str | None
+            Typename of the received event
+        """
+        if typename is not None:
+            self._acks[typename] = self._acks.get(typename, 0) + 1
+
+    def extend(self, values: Iterable[dict[str, Any]]):
+        """
+        Adds updated values to the current frame.
+
+        Parameters
+        ----------
+        values : Iterable[dict[str, Any]]
+            Updated values produced by a listener or a timer callback
+        """
+        for value in values:
+            if value.get("op") == "attrs":
+                self._close()
+                if (
+                    self._values
+                    and (previous := self._values[-1]).get("op") == "attrs"
+                    and same_elements(previous, value)
+                ):
+                    value = {
+                        **previous,
+                        "attributes": previous["attributes"] | value["attributes"],
+                    }
+                    self._values[-1] = value
+                else:
+                    self._values.append(value)
+                continue
+            if (diff := value.get("diff")) is None:
+                if value.get("op") == "remove":
+                    for element_id in value["elementIds"]:
+                        self._pending.pop(element_id, None)
+                self._close()
+                self._values.append(value)
+                continue
+            attributes = self._pending.setdefault(value["elementId"], {})
+            for key, old in diff["remove"]:
+                attributes[key] = (False, old)
+            for key, new in diff["change"]:
+                attributes[key] = (True, new)
+
+    def _close(self):
+        """
+        Moves merged differences into the list of values to send.
+        """
+        for element_id, attributes in self._pending.items():
+            change = []
+            remove = []
+            for key, (changed, value) in attributes.items():
+                (change if changed else remove).append([key, value])
+            self._values.append(
+                {"elementId": element_id, "diff": {"remove": remove, "change": change}}
+            )
+        self._pending = {}
+
+    def flush(self) -> list[dict[str, Any]]:
+        """
+        Returns merged values of the current frame and starts a new frame.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            Updated values sent through websocket
+        """
+        self._close()
+        values = self._values
+        self._values = []
+        if self._acks:
+            values.append({"ack": [[key, count] for key, count in self._acks.items()]})
+            self._acks = {}
+        return values
@@ -1,15 +1,15 @@
-from collections.abc import Callable
-from typing import Generic, Optional, TypeVar
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+from inspect import isawaitable
+from typing import Any, Generic, Optional, TypeVar
 
 from lxml import etree
 
 from .base import Event
+from .dirty_tracker import DirtyTracker
+from .session import Session
 from .tracking_tree import TrackingTree
-from .utils import (
-    diffdict,
-    node_attribs,
-    xpath_to_query_selector,
-)
+from .utils import diffdict, node_attribs
 
 T = TypeVar("T")
 
@@ -21,7 +21,9 @@ class ContextListener(Generic[T]):
         self,
         updated_nodes: list[etree.Element],
         html_nodes: list[etree.Element],
-        listener: Callable[[Event, T | None, Optional[etree.Element]], None],
+        listener: Callable[
+            [Event, T | None, Optional[etree.Element]], Awaitable[None] | None
+        ],
         data_accessor: Callable[[etree.Element], T],
     ):
         self._updated_nodes = updated_nodes
@@ -29,23 +31,97 @@ class ContextListener(Generic[T]):
         self._listener = listener
         self._data_accessor = data_accessor
 
-    def __call__(self, event: Event):
-        ttree = TrackingTree()
-        states = [
-            (node, node_attribs(node, node in self._html_nodes))
-            for node in self._updated_nodes
-        ]
+    def __call__(
+        self, event: Event
+    ) -> Iterator[dict[str, Any] | asyncio.Task[list[dict[str, Any]]]]:
+        """
+        Calls the listener and yields updated values. When the listener is
+        asynchronous (it returns an awaitable), a task is yielded instead; it
+        awaits the listener and returns updated values once it is done, while
+        other events keep being processed.
+
+        Parameters
+        ----------
+        event : Event
+            Event
+
+        Returns
+        -------
+        Iterator[dict[str, Any] | asyncio.Task[list[dict[str, Any]]]]
+            Updated values or task returning updated values
+        """
+        tracker = DirtyTracker()
+        states = (
+            []
+            if tracker.enabled
+            else [
+                (node, node_attribs(node, node in self._html_nodes))
+                for node in self._updated_nodes
+            ]
+        )
 
         node = self.get_node()
-        self._listener(event, self._data_accessor(node), node)
+        tracker.start()
+        try:
+            result = self._listener(event, self._data_accessor(node), node)
+        finally:
+            tracker.stop()
+        if isawaitable(result):
+            yield asyncio.ensure_future(self._wait(result, states))
+            return
+        yield from self._diffs(states)
+
+    async def _wait(
+        self,
+        awaitable: Awaitable[None],
+        states: list[tuple[etree.Element, dict[str, str]]],
+    ) -> list[dict[str, Any]]:
+        tracker = DirtyTracker()
+        tracker.isolate()
+        tracker.start()
+        try:
+            await awaitable
+        finally:
+            tracker.stop()
+        return list(self._diffs(states))
 
+    def _diffs(
+        self, states: list[tuple[etree.Element, dict[str, str]]]
+    ) -> Iterator[dict[str, Any]]:
+        tracker = DirtyTracker()
+        yield from tracker.flush()
+
+        ttree = TrackingTree()
         for node, old_attrib in states:
-            element_id = xpath_to_query_selector(ttree.get_path(node))
+            if not tracker.attached(node):
+                continue
+            element_id = ttree.get_reference(node)
             new_attrib = node_attribs(node, node in self._html_nodes)
             diff = diffdict(old_attrib, new_attrib)
             if diff != EMPTY_DIFF:
                 yield {"elementId": element_id, "diff": diff}
 
+    def fork(self, session: Session) -> "ContextListener[T]":
+        """
+        Returns a copy of the context listener for nodes of the session.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        ContextListener[T]
+            Context listener of the session
+        """
+        return ContextListener(
+            list(map(session.node, self._updated_nodes)),
+            list(map(session.node, self._html_nodes)),
+            self._listener,
+            session.data_accessor(self._data_accessor),
+        )
+
     def get_listener(
         self,
     ) -> Callable[[Event, T | None, Optional[etree.Element]], None]:
@@ -0,0 +1,787 @@
+from collections.abc import Callable, Iterable, Iterator
+from contextvars import ContextVar
+from typing import Any
+
+from lxml import etree
+
+from .session import Session, get_session
+from .spatial import (
+    IDENTITY,
+    Box,
+    Matrix,
+    geometry,
+    multiply,
+    parse_transform,
+    transform_box,
+)
+from .tracking_tree import TrackingTree
+from .utils import get_attribute, to_string
+
+# Number of listeners or timer callbacks currently running in the current
+# context; asynchronous callbacks run in their own task, hence their own depth.
+_depth: ContextVar[int] = ContextVar("detroit_live_recording_depth", default=0)
+
+
+def same_elements(first: dict[str, Any], second: dict[str, Any]) -> bool:
+    """
+    Returns :code:`True` if two columnar operations reference the same
+    elements.
+
+    Parameters
+    ----------
+    first : dict[str, Any]
+        Columnar operation
+    second : dict[str, Any]
+        Columnar operation
+
+    Returns
+    -------
+    bool
+        :code:`True` if they reference the same elements
+    """
+    return (
+        first.get("start") == second.get("start")
+        and first.get("count") == second.get("count")
+        and first.get("elementIds") == second.get("elementIds")
+    )
+
+
+class DirtyState:
+    """
+    Shared state of :code:`DirtyTracker`.
+
+    Attributes
+    ----------
+    enabled : bool
+        :code:`True` when dirty tracking replaces snapshots of updated nodes
+    changes : dict[etree.Element, dict[str, str | None]]
+        Original values of written attributes, mapped by nodes
+    operations : list[tuple]
+        Structural operations (insertions, removals and moves), columnar
+        writes, writes of canvas marks and changes of listened nodes in order
+    inserted : set[etree.Element]
+        Nodes inserted since the last flush
+    released : list[etree.Element]
+        Removed nodes whose numeric ids are released after the next flush
+    viewports : dict[etree.Element, tuple[Callable, float]]
+        Extent function and padding of viewports, mapped by nodes
+    deferred : dict[etree.Element, dict[str, str | None]]
+        Values known by the client of attributes of nodes outside of their
+        viewport, mapped by nodes
+    """
+
+    __slots__ = (
+        "enabled",
+        "changes",
+        "operations",
+        "inserted",
+        "released",
+        "viewports",
+        "deferred",
+    )
+
+    def __init__(self):
+        self.enabled = False
+        self.changes = {}
+        self.operations = []
+        self.inserted = set()
+        self.released = []
+        self.viewports = {}
+        self.deferred = {}
+
+    def fork(self, session: Session) -> "DirtyState":
+        """
+        Returns an empty state for the session with the same status.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        DirtyState
+            Dirty state of the session
+        """
+        state = DirtyState()
+        state.enabled = self.enabled
+        state.viewports = {
+            session.node(node): viewport for node, viewport in self.viewports.items()
+        }
+        return state
+
+
+class DirtyTracker:
+    """
+    Dirty tracker object which records writes made through
+    :code:`LiveSelection` while a listener or a timer callback is running.
+
+    Instead of copying the attributes of every updated node before and after a
+    callback, only written :code:`(node, key)` pairs are recorded with their
+    original values; the cost of a diff therefore depends on the number of
+    written attributes only.
+
+    Structural edits (:code:`append`, :code:`insert`, :code:`remove`,
+    :code:`order` and therefore :code:`join`) are always recorded as
+    operations, whether dirty tracking is enabled or not.
+
+    Once enabled, this object can be used globally without futher
+    configuration.
+    """
+
+    __state = DirtyState()
+
+    @property
+    def _state(self) -> DirtyState:
+        if (session := get_session()) is None:
+            return self.__state
+        return session.state(DirtyTracker, self.__state.fork)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns :code:`True` if dirty tracking is enabled.
+
+        Returns
+        -------
+        bool
+            Dirty tracking status
+        """
+        return self._state.enabled
+
+    @property
+    def culling(self) -> bool:
+        """
+        Returns :code:`True` if at least one viewport culls differences (see
+        :code:`DirtyTracker.set_viewport`).
+
+        Returns
+        -------
+        bool
+            Culling status
+        """
+        return bool(self._state.viewports)
+
+    def enable(self, enabled: bool = True):
+        """
+        Enables or disables dirty tracking and drops recorded changes.
+
+        Parameters
+        ----------
+        enabled : bool
+            :code:`True` for enabling dirty tracking
+        """
+        self._state.enabled = enabled
+        self._state.changes.clear()
+        self._state.operations.clear()
+        self._state.inserted.clear()
+        self._release()
+        self._state.deferred.clear()
+
+    @property
+    def recording(self) -> bool:
+        """
+        Returns :code:`True` when writes are currently recorded.
+
+        Returns
+        -------
+        bool
+            Recording status
+        """
+        return _depth.get() > 0
+
+    def start(self):
+        """
+        Starts recording writes; called before a listener or a timer callback.
+        """
+        _depth.set(_depth.get() + 1)
+
+    def stop(self):
+        """
+        Stops recording writes; called after a listener or a timer callback.
+        """
+        _depth.set(max(0, _depth.get() - 1))
+
+    def isolate(self):
+        """
+        Resets the recording depth of the current context; called by
+        asynchronous callbacks which run in their own task. Changes are
+        shared: when any callback ends, changes recorded so far by callbacks
+        still awaiting are flushed as well.
+        """
+        _depth.set(0)
+
+    def record(self, nodes: Iterable[etree.Element], key: str):
+        """
+        Records the original value of the attribute :code:`key` for each node
+        if it was not already recorded.
+
+        Parameters
+        ----------
+        nodes : Iterable[etree.Element]
+            Written nodes
+        key : str
+            Attribute name or :code:`"innerHTML"`
+        """
+        state = self._state
+        if not (state.enabled and _depth.get()):
+            return
+        changes = state.changes
+        for node in nodes:
+            if (olds := changes.get(node)) is None:
+                changes[node] = {key: get_attribute(node, key)}
+            elif key not in olds:
+                olds[key] = get_attribute(node, key)
+
+    def columns(self, nodes: list[etree.Element], columns: dict[str, list[str]]):
+        """
+        Records attributes written at once on several nodes (see
+        :code:`LiveSelection.attrs`); they are sent as a single columnar
+        operation.
+
+        Parameters
+        ----------
+        nodes : list[etree.Element]
+            Written nodes
+        columns : dict[str, list[str]]
+            Written values of each attribute name, one per node
+        """
+        state = self._state
+        if not (state.enabled and _depth.get()) or not nodes:
+            return
+        state.operations.append(("attrs", nodes, columns))
+        # Columnar operations are sent before differences: their values become
+        # the ones known by the client for attributes already recorded
+        for olds_by_node in (state.changes, state.deferred):
+            if not olds_by_node:
+                continue
+            for key, values in columns.items():
+                for node, value in zip(nodes, values):
+                    if (olds := olds_by_node.get(node)) is not None and key in olds:
+                        olds[key] = value
+
+    def marks(self, marks: Any, start: int, stop: int, keys: Iterable[str]):
+        """
+        Records values of marks drawn on a canvas (see :code:`Marks`) written
+        from :code:`start` to :code:`stop`; they are packed when changes are
+        flushed. Consecutive writes on the same marks are merged. Like
+        structural edits, they are recorded whether dirty tracking is enabled
+        or not.
+
+        Parameters
+        ----------
+        marks : Marks
+            Written marks
+        start : int
+            Index of the first written mark
+        stop : int
+            Index after the last written mark
+        keys : Iterable[str]
+            Written attribute names
+        """
+        if not _depth.get():
+            return
+        operations = self._state.operations
+        if operations and operations[-1][0] == "marks" and operations[-1][1] is marks:
+            _, _, previous_start, previous_stop, previous_keys = operations[-1]
+            operations[-1] = (
+                "marks",
+                marks,
+                min(start, previous_start),
+                max(stop, previous_stop),
+                previous_keys | set(keys),
+            )
+        else:
+            operations.append(("marks", marks, start, stop, set(keys)))
+
+    def listen(self, typename: str, node: etree.Element, listening: bool):
+        """
+        Records that a node gained its first or lost its last mouse event
+        listener of a typename; the client only sends mouse events of nodes
+        which have listeners (see :code:`EventListenersGroup.into_script`).
+        Like structural edits, it is recorded whether dirty tracking is
+        enabled or not.
+
+        Parameters
+        ----------
+        typename : str
+            Typename
+        node : etree.Element
+            Node element
+        listening : bool
+            :code:`True` when the node gained a listener
+        """
+        if _depth.get() and TrackingTree().ids_enabled:
+            self._state.operations.append(("listen", typename, node, listening))
+
+    def set_viewport(
+        self,
+        node: etree.Element,
+        extent: Callable[[etree.Element], list[list[float]]] | None,
+        padding: float = 0,
+    ):
+        """
+        Culls differences of descendants of a node outside of its visible
+        extent :math:`[[x_0, y_0], [x_1, y_1]]` (see :code:`Zoom.set_culling`).
+        Bounding boxes of circles, ellipses, rectangles, polygons, polylines
+        and paths are mapped through transforms of their ancestors; when they
+        do not intersect the extent enlarged by :code:`padding`, their
+        differences are deferred until they come back into view. Other nodes
+        are never culled.
+
+        Culling only applies to differences recorded while dirty tracking is
+        enabled; structural and columnar operations are always sent.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Viewport node
+        extent : Callable[[etree.Element], list[list[float]]] | None
+            Function which returns the extent of the viewport in its own
+            coordinates; :code:`None` removes the viewport
+        padding : float
+            Margin added around the extent
+        """
+        viewports = self._state.viewports
+        if extent is None:
+            viewports.pop(node, None)
+        else:
+            viewports[node] = (extent, padding)
+
+    def _frame(
+        self,
+        node: etree.Element | None,
+        frames: dict[etree.Element, tuple[Box, Matrix] | None],
+    ) -> tuple[Box, Matrix] | None:
+        """
+        Returns the visible box of the nearest viewport of the children of a
+        node and the matrix from their coordinates to coordinates of the
+        viewport.
+        """
+        if node is None:
+            return None
+        if node in frames:
+            return frames[node]
+        if (viewport := self._state.viewports.get(node)) is not None:
+            extent, padding = viewport
+            [[x0, y0], [x1, y1]] = extent(node)
+            box = (x0 - padding, y0 - padding, x1 + padding, y1 + padding)
+            frame = (box, IDENTITY)
+        elif (parent := self._frame(node.getparent(), frames)) is None:
+            frame = None
+        else:
+            box, matrix = parent
+            frame = (box, multiply(matrix, parse_transform(node.get("transform"))))
+        frames[node] = frame
+        return frame
+
+    def visible(
+        self,
+        node: etree.Element,
+        frames: dict[etree.Element, tuple[Box, Matrix] | None] | None = None,
+    ) -> bool:
+        """
+        Returns :code:`False` if the node lies outside of the extent of its
+        viewport (see :code:`DirtyTracker.set_viewport`).
+
+        Parameters
+        ----------
+        node : etree.Element
+            Node element
+        frames : dict[etree.Element, tuple[Box, Matrix] | None] | None
+            Cache of visible boxes and matrices of ancestors shared between
+            calls
+
+        Returns
+        -------
+        bool
+            :code:`True` if the node is visible or cannot be culled
+        """
+        viewports = self._state.viewports
+        if not viewports or node in viewports:
+            return True
+        if (shape := geometry(node)) is None:
+            return True
+        frames = {} if frames is None else frames
+        if (frame := self._frame(node.getparent(), frames)) is None:
+            return True
+        (vx0, vy0, vx1, vy1), matrix = frame
+        matrix = multiply(matrix, parse_transform(node.get("transform")))
+        x0, y0, x1, y1 = transform_box(matrix, shape[2])
+        return x1 >= vx0 and x0 <= vx1 and y1 >= vy0 and y0 <= vy1
+
+    def attached(self, node: etree.Element) -> bool:
+        """
+        Returns :code:`True` if the node belongs to the tracked tree.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Node element
+
+        Returns
+        -------
+        bool
+            :code:`True` if attached
+        """
+        # Removed nodes still belong to the document of the tree in lxml,
+        # hence the lookup of their top ancestor
+        while (parent := node.getparent()) is not None:
+            node = parent
+        return node is TrackingTree().root
+
+    def covered(self, node: etree.Element) -> bool:
+        """
+        Returns :code:`True` if one of the ancestors of the node was inserted
+        since the last flush; its content will be serialized with its
+        ancestor.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Node element
+
+        Returns
+        -------
+        bool
+            :code:`True` if covered by an inserted ancestor
+        """
+        inserted = self._state.inserted
+        if not inserted:
+            return False
+        for ancestor in node.iterancestors():
+            if ancestor in inserted:
+                return True
+        return False
+
+    def reference(self, node: etree.Element | None) -> int | str | None:
+        """
+        Returns the reference of a node used by the client to find the
+        corresponding element.
+
+        Parameters
+        ----------
+        node : etree.Element | None
+            Node element
+
+        Returns
+        -------
+        int | str | None
+            Numeric id or query selector of the node
+        """
+        if node is None:
+            return None
+        return TrackingTree().get_reference(node)
+
+    def insert(
+        self,
+        node: etree.Element,
+        parent_id: int | str,
+        anchor_id: int | str | None,
+    ):
+        """
+        Records the insertion of a node. Its content is serialized when
+        changes are flushed.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Inserted node
+        parent_id : int | str
+            Reference of the parent node
+        anchor_id : int | str | None
+            Reference of the node before which the node was inserted;
+            :code:`None` when appended
+        """
+        state = self._state
+        if not _depth.get() or self.covered(node):
+            return
+        state.operations.append(("insert", node, parent_id, anchor_id))
+        state.inserted.add(node)
+
+    def pending(self, node: etree.Element) -> bool:
+        """
+        Returns :code:`True` if the node or one of its ancestors or
+        descendants was inserted since the last flush. Once removed, its
+        numeric ids must be kept until changes are flushed (see
+        :code:`DirtyTracker.release`): inserted content is serialized when
+        changes are flushed and must reference the same ids as the recorded
+        operations.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Node element
+
+        Returns
+        -------
+        bool
+            :code:`True` if its insertion is pending
+        """
+        inserted = self._state.inserted
+        if not inserted:
+            return False
+        return self.covered(node) or any(
+            element in inserted for element in node.iter(etree.Element)
+        )
+
+    def release(self, node: etree.Element):
+        """
+        Releases numeric ids of a removed node after the next flush.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Removed node
+        """
+        self._state.released.append(node)
+
+    def _release(self):
+        """
+        Releases numeric ids of removed nodes which were not attached again.
+        """
+        state = self._state
+        if not state.released:
+            return
+        ttree = TrackingTree()
+        for node in state.released:
+            if not self.attached(node):
+                ttree.release_ids(node)
+        state.released = []
+
+    def remove(self, element_ids: list[int | str]):
+        """
+        Records the removal of nodes. References must be computed before
+        removing any of these nodes.
+
+        Parameters
+        ----------
+        element_ids : list[int | str]
+            References of removed nodes
+        """
+        if _depth.get() and element_ids:
+            self._state.operations.append(("remove", element_ids))
+
+    def move(
+        self,
+        element_id: int | str,
+        parent_id: int | str,
+        anchor_id: int | str | None,
+    ):
+        """
+        Records the move of a node. References must be computed before moving
+        the node.
+
+        Parameters
+        ----------
+        element_id : int | str
+            Reference of the moved node
+        parent_id : int | str
+            Reference of the new parent node
+        anchor_id : int | str | None
+            Reference of the node before which the node is moved;
+            :code:`None` when moved at the end
+        """
+        if _depth.get():
+            self._state.operations.append(("move", element_id, parent_id, anchor_id))
+
+    def writes(self) -> tuple[list[tuple[etree.Element, str, str | None]], int]:
+        """
+        Returns written attributes with their current values (:code:`None`
+        when removed) and the number of structural operations, then clears
+        them. Unlike :code:`flush`, no updated value is built: writes are
+        meant to be applied to another tree.
+
+        Returns
+        -------
+        tuple[list[tuple[etree.Element, str, str | None]], int]
+            Written attributes and number of structural operations
+        """
+        state = self._state
+        changes = state.changes
+        operations = state.operations
+        state.changes = {}
+        state.operations = []
+        state.inserted = set()
+        self._release()
+        writes = []
+        structural = 0
+        for operation in operations:
+            if operation[0] != "attrs":
+                structural += 1
+                continue
+            _, nodes, columns = operation
+            for key, values in columns.items():
+                writes.extend((node, key, value) for node, value in zip(nodes, values))
+        for node, olds in changes.items():
+            for key, old in olds.items():
+                if (new := get_attribute(node, key)) != old:
+                    writes.append((node, key, new))
+        return writes, structural
+
+    def _columns(
+        self, nodes: list[etree.Element], columns: dict[str, list[str]]
+    ) -> dict[str, Any] | None:
+        """
+        Builds the columnar operation of attributes written on nodes. Nodes
+        are referenced by a range of numeric ids when they are consecutive.
+        Values are packed into a single string separated by spaces when none
+        of them contains a space.
+        """
+        attached = {}
+        mask = []
+        for node in nodes:
+            parent = node.getparent()
+            key = node if parent is None else parent
+            if (found := attached.get(key)) is None:
+                found = attached[key] = self.attached(key)
+            mask.append(found)
+        if not all(mask):
+            nodes = [node for node, keep in zip(nodes, mask) if keep]
+            columns = {
+                key: [value for value, keep in zip(values, mask) if keep]
+                for key, values in columns.items()
+            }
+        if not nodes:
+            return None
+        ttree = TrackingTree()
+        references = [ttree.get_reference(node) for node in nodes]
+        value = {"op": "attrs"}
+        start = references[0]
+        if isinstance(start, int) and references == list(
+            range(start, start + len(references))
+        ):
+            value["start"] = start
+            value["count"] = len(references)
+        else:
+            value["elementIds"] = references
+        value["attributes"] = {
+            key: values if any(" " in item for item in values) else " ".join(values)
+            for key, values in columns.items()
+        }
+        return value
+
+    def flush(self) -> Iterator[dict[str, Any]]:
+        """
+        Returns structural operations followed by differences of recorded
+        attributes and clears them. Nothing is returned while a listener or a
+        timer callback is still running in the current context.
+
+        Returns
+        -------
+        Iterator[dict[str, Any]]
+            Updated values sent through websocket
+        """
+        state = self._state
+        if _depth.get() or not (state.changes or state.operations):
+            return
+        changes = state.changes
+        operations = state.operations
+        inserted = state.inserted
+        state.changes = {}
+        state.operations = []
+        state.inserted = set()
+        if state.deferred:
+            # Deferred values are the ones known by the client
+            for node, olds in state.deferred.items():
+                changes[node] = changes.pop(node, {}) | olds
+            state.deferred = {}
+        frames = {} if state.viewports else None
+
+        ttree = TrackingTree()
+        previous = None
+        for operation in operations:
+            match operation:
+                case ("insert", node, parent_id, anchor_id):
+                    if ttree.ids_enabled:
+                        ttree.assign_ids(node)
+                    html = to_string(node)
+                    if (
+                        previous is not None
+                        and previous["op"] == "insert"
+                        and previous["parentId"] == parent_id
+                        and previous["anchorId"] == anchor_id
+                    ):
+                        previous["outerHTML"] += html
+                        continue
+                    current = {
+                        "op": "insert",
+                        "parentId": parent_id,
+                        "anchorId": anchor_id,
+                        "outerHTML": html,
+                    }
+                case ("remove", element_ids):
+                    current = {"op": "remove", "elementIds": element_ids}
+                case ("move", element_id, parent_id, anchor_id):
+                    current = {
+                        "op": "move",
+                        "elementId": element_id,
+                        "parentId": parent_id,
+                        "anchorId": anchor_id,
+                    }
+                case ("marks", marks, start, stop, keys):
+                    if not self.attached(marks.canvas):
+                        continue
+                    current = {
+                        "elementId": self.reference(marks.canvas),
+                        **marks.patch(start, stop, keys),
+                    }
+                case ("listen", typename, node, listening):
+                    element_id = ttree.get_id(node)
+                    if (
+                        previous is not None
+                        and previous["op"] == "listen"
+                        and previous["typename"] == typename
+                        and previous["listening"] == listening
+                    ):
+                        previous["elementIds"].append(element_id)
+                        continue
+                    current = {
+                        "op": "listen",
+                        "typename": typename,
+                        "listening": listening,
+                        "elementIds": [element_id],
+                    }
+                case ("attrs", nodes, columns):
+                    current = self._columns(nodes, columns)
+                    if current is None:
+                        continue
+                    if (
+                        previous is not None
+                        and previous["op"] == "attrs"
+                        and same_elements(previous, current)
+                    ):
+                        previous["attributes"].update(current["attributes"])
+                        continue
+            if previous is not None:
+                yield previous
+            previous = current
+        if previous is not None:
+            yield previous
+        self._release()
+
+        for node, olds in changes.items():
+            if not self.attached(node):
+                continue
+            if inserted and (
+                node in inserted
+                or any(ancestor in inserted for ancestor in node.iterancestors())
+            ):
+                continue
+            if frames is not None and not self.visible(node, frames):
+                state.deferred[node] = olds
+                continue
+            change = []
+            remove = []
+            for key, old in olds.items():
+                new = get_attribute(node, key)
+                if new is None:
+                    if old is not None:
+                        remove.append([key, old])
+                elif new != old:
+                    change.append([key, new])
+            if change or remove:
+                yield {
+                    "elementId": self.reference(node),
+                    "diff": {"remove": remove, "change": change},
+                }
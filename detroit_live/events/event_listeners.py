@@ -1,13 +1,17 @@
+import asyncio
 import logging
-from collections.abc import Iterator
-from dataclasses import dataclass
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, replace
 from typing import Any, Optional, TypeVar
 
 from lxml import etree
 
 from .base import Event
 from .context_listener import ContextListener
+from .dirty_tracker import DirtyTracker
 from .headers import headers
+from .session import Session
+from .spatial import SpatialIndex
 from .tracking_tree import TrackingTree
 from .types import parse_event
 from .utils import search, xpath_to_query_selector
@@ -16,6 +20,9 @@ T = TypeVar("T")
 
 log = logging.getLogger(__name__)
 
+# Typenames of high-frequency events coalesced by the client
+COALESCED_TYPENAMES = ("mousemove", "wheel", "touchmove", "input")
+
 
 def parse_target(
     target: str | None = None,
@@ -77,6 +84,10 @@ class EventListener:
         Node associated to the event listener
     target : str
         Target
+    in_flight : int | None
+        Maximum number of events sent by the client and not acknowledged yet
+        by the server, for coalesced typenames (:code:`"mousemove"`,
+        :code:`"wheel"`, :code:`"touchmove"` and :code:`"input"`)
     """
 
     typename: str
@@ -84,6 +95,7 @@ class EventListener:
     listener: ContextListener
     active: bool = True
     target: str | None = None
+    in_flight: int | None = None
 
     def __post_init__(self):
         self.node = self.listener.get_node()
@@ -93,6 +105,22 @@ class EventListener:
             self.node,
         )
 
+    def fork(self, session: Session) -> "EventListener":
+        """
+        Returns a copy of the event listener for nodes of the session.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        EventListener
+            Event listener of the session
+        """
+        return replace(self, listener=self.listener.fork(session))
+
     def into_script(self, event_json: str) -> str:
         typename = repr(self.typename)
         return (
@@ -106,6 +134,11 @@ class EventListenersGroup:
     Class which groups event listeners by typenames, elements (nodes) and
     names.
 
+    Active event listeners are also indexed by :code:`(typename, node)` and
+    kept up to date when event listeners are set, popped or (de)activated,
+    so that dispatching an event is a single lookup (see
+    :code:`EventListenersGroup.listeners`).
+
     Attributes
     ----------
     event : type[Event]
@@ -120,6 +153,9 @@ class EventListenersGroup:
         self._event_listeners: dict[
             etree.Element, dict[str, dict[str, EventListener]]
         ] = {}
+        self._index: dict[
+            tuple[str, etree.Element | None], tuple[EventListener, ...]
+        ] = {}
         self._previous_node = None
         self._mousedowned_node = None
 
@@ -137,9 +173,11 @@ class EventListenersGroup:
             Event listener object
         """
         node, typename, name = key
-        (self._event_listeners.setdefault(typename, {}).setdefault(node, {}))[name] = (
-            event_listener
-        )
+        by_nodes = self._event_listeners.setdefault(typename, {})
+        if node not in by_nodes and self.event_type == "MouseEvent":
+            DirtyTracker().listen(typename, node, True)
+        by_nodes.setdefault(node, {})[name] = event_listener
+        self._reindex(typename, node)
 
     def get(self, key: tuple[etree.Element, str, str]) -> EventListener | None:
         """
@@ -183,9 +221,90 @@ class EventListenersGroup:
         node, typename, name = key
         if by_nodes := self._event_listeners.get(typename):
             if by_names := by_nodes.get(node):
-                return by_names.pop(name, default)
+                event_listener = by_names.pop(name, default)
+                if not by_names:
+                    del by_nodes[node]
+                    if self.event_type == "MouseEvent":
+                        DirtyTracker().listen(typename, node, False)
+                self._reindex(typename, node)
+                return event_listener
         return default
 
+    def set_active(self, key: tuple[etree.Element, str, str | None], active: bool):
+        """
+        Activates or deactivates the event listener given the specified
+        :code:`key`, if it exists.
+
+        Parameters
+        ----------
+        key : tuple[etree.Element, str, str | None]
+            Tuple :code:`(node, typename, name)`; all names of the node and
+            the typename when :code:`name` is :code:`None`
+        active : bool
+            :code:`True` for activating the event listener
+        """
+        node, typename, name = key
+        if by_nodes := self._event_listeners.get(typename):
+            if by_names := by_nodes.get(node):
+                if name is None:
+                    event_listeners = by_names.values()
+                elif (event_listener := by_names.get(name)) is not None:
+                    event_listeners = [event_listener]
+                else:
+                    return
+                for event_listener in event_listeners:
+                    event_listener.active = active
+                self._reindex(typename, node)
+
+    def _reindex(self, typename: str, node: etree.Element):
+        by_names = self._event_listeners.get(typename, {}).get(node)
+        active = (
+            tuple(
+                event_listener
+                for event_listener in by_names.values()
+                if event_listener.active
+            )
+            if by_names
+            else ()
+        )
+        if active:
+            self._index[typename, node] = active
+        else:
+            self._index.pop((typename, node), None)
+        # Listeners of all nodes are gathered again on the next lookup
+        self._index.pop((typename, None), None)
+
+    def listeners(
+        self, node: etree.Element | None, typename: str
+    ) -> tuple[EventListener, ...]:
+        """
+        Returns active event listeners of a node for the specified
+        :code:`typename`.
+
+        Parameters
+        ----------
+        node : etree.Element | None
+            Node element; all nodes when :code:`None`
+        typename : str
+            Typename
+
+        Returns
+        -------
+        tuple[EventListener, ...]
+            Active event listeners
+        """
+        if (event_listeners := self._index.get((typename, node))) is not None:
+            return event_listeners
+        if node is not None:
+            return ()
+        event_listeners = self._index[typename, None] = tuple(
+            event_listener
+            for by_names in self._event_listeners.get(typename, {}).values()
+            for event_listener in by_names.values()
+            if event_listener.active
+        )
+        return event_listeners
+
     def search(
         self,
         node: Optional[etree.Element] = None,
@@ -212,9 +331,9 @@ class EventListenersGroup:
         """
         return list(search(self._event_listeners, (typename, node, name)))
 
-    def filter_by(self, event: Event, typename: str) -> list[EventListener]:
+    def filter_by(self, event: Event, typename: str) -> tuple[EventListener, ...]:
         """
-        Filters event listeners based on the given :code:`event` and
+        Filters active event listeners based on the given :code:`event` and
         :code:`typename`.
 
         Parameters
@@ -226,41 +345,54 @@ class EventListenersGroup:
 
         Returns
         -------
-        list[EventListener]
-            List of event listeners
+        tuple[EventListener, ...]
+            Active event listeners
         """
         ttree = TrackingTree()
         if hasattr(
             event, "element_id"
         ):  # MouseEvent and events with attribute 'element_id'
             element_id = event.element_id
-            next_node = ttree.get_node(element_id)
+            if element_id is None and (index := SpatialIndex()).enabled:
+                # The client sent coordinates only (see `into_script`)
+                next_node = index.find(event.page_x, event.page_y)
+                if next_node is None:
+                    next_node = index.surface()
+            else:
+                next_node = ttree.get_node(element_id)
             if next_node is None and self._mousedowned_node is None:
-                return []
+                return ()
 
             # Update states for mouse events
             # `previous_node` is the node that the mouse has left
             # `mousedowned_node` is the node that the mouse is currently "holding"
             match typename:
                 case "mouseover":
-                    event_listeners = self.search(
-                        self._previous_node, "mouseleave"
-                    ) + self.search(next_node, typename)
+                    left = self.listeners(self._previous_node, "mouseleave")
                     self._previous_node = next_node
-                    return event_listeners
+                    entered = self.listeners(next_node, typename)
+                    return left + entered if left else entered
                 case "mousedown":
-                    self._mousedowned_node = next_node
+                    # Pointers are held by nodes with listeners only, as done
+                    # by the client filter (see `FT`)
+                    if self._mousedowned_node is not None or any(
+                        next_node in by_nodes
+                        for by_nodes in self._event_listeners.values()
+                    ):
+                        self._mousedowned_node = next_node
 
             target = (
                 next_node if self._mousedowned_node is None else self._mousedowned_node
             )
             if typename == "mouseup":
                 self._mousedowned_node = None
-            return self.search(target, typename)
+            return self.listeners(target, typename)
         else:  # Other event types
-            return self.search(typename=typename)
+            return self.listeners(None, typename)
 
-    def propagate(self, event: dict[str, Any]) -> Iterator[list[dict[str, Any]]]:
+    def propagate(
+        self, event: dict[str, Any]
+    ) -> Iterator[list[dict[str, Any]] | asyncio.Task[list[dict[str, Any]]]]:
         """
         Propagate an :code:`event` to all matched event listeners.
 
@@ -271,15 +403,21 @@ class EventListenersGroup:
 
         Returns
         -------
-        Iterator[list[dict[str, Any]]]
-            Iterator of updated values sent through websocket
+        Iterator[list[dict[str, Any]] | asyncio.Task[list[dict[str, Any]]]]
+            Iterator of updated values sent through websocket; asynchronous
+            listeners give tasks which return updated values once done
         """
         typename = event["typename"]
         event = self.event.from_json(event)
         for event_listener in self.filter_by(event, typename):
+            # Listeners may be deactivated by previous ones of the same event
             if not event_listener.active:
                 continue
-            yield list(event_listener.listener(event))
+            values = list(event_listener.listener(event))
+            if values and isinstance(values[0], asyncio.Task):
+                yield values[0]
+            else:
+                yield values
 
     def event_json(self) -> str:
         """
@@ -319,23 +457,109 @@ class EventListenersGroup:
             Script used by JavaScript
         """
         event_json = self.event_json()
+        limits = "".join(
+            f"L[{typename!r}] = {in_flight};"
+            for typename, in_flight in self.in_flight_limits().items()
+        )
         if self.event_type == "MouseEvent":
-            typenames = list(self._event_listeners)
+            index = SpatialIndex()
             event_json = f"function _ev(e){{return {event_json}}}"
-            listeners = [
-                (
+            listeners = []
+            for typename, nodes in self._event_listeners.items():
+                if index.resolves(nodes):
+                    # Targets resolved by the spatial index need no DOM walk
+                    target = "null"
+                elif self.filtered:
+                    # Events of nodes without listeners are dropped (see `FT`)
+                    listeners.append(
+                        f"window.addEventListener({typename!r}, (e) => {{"
+                        f"var u = p(e.srcElement);"
+                        f"if (FT({typename!r}, u)) f(_ev(e), {typename!r}, u);}});"
+                    )
+                    continue
+                else:
+                    target = "p(e.srcElement)"
+                listeners.append(
                     f"window.addEventListener({typename!r}, (e) => "
-                    f" f(_ev(e), {typename!r}, p(e.srcElement)));"
+                    f" f(_ev(e), {typename!r}, {target}));"
                 )
-                for typename in typenames
-            ]
-            return event_json + "".join(listeners)
+            return event_json + self.filter_script() + "".join(listeners) + limits
         else:
-            return "".join(
-                event_listener.into_script(event_json)
-                for event_listener in self.search()
+            return (
+                "".join(
+                    event_listener.into_script(event_json)
+                    for event_listener in self.search()
+                )
+                + limits
             )
 
+    @property
+    def filtered(self) -> bool:
+        """
+        Returns :code:`True` when the client drops mouse events of nodes
+        without listeners; nodes must be referenced by numeric ids.
+
+        Returns
+        -------
+        bool
+            Filtering status
+        """
+        return self.event_type == "MouseEvent" and TrackingTree().ids_enabled
+
+    def filter_script(self) -> str:
+        """
+        Returns the script which initializes the client filter of mouse
+        events: ids of nodes which have listeners, mapped by typenames, and
+        the hovered and pressed nodes known by the server, so that a gesture
+        in progress keeps being sent. Nodes which later gain or lose their
+        listeners are sent as :code:`"listen"` operations (see
+        :code:`DirtyTracker.listen`).
+
+        Returns
+        -------
+        str
+            Script used by JavaScript
+        """
+        if not self.filtered:
+            return ""
+        ttree = TrackingTree()
+
+        def reference(node: etree.Element | None) -> str:
+            return "null" if node is None else str(ttree.get_id(node))
+
+        sets = "".join(
+            f"FS[{typename!r}] = new Set([{', '.join(map(reference, nodes))}]);"
+            for typename, nodes in self._event_listeners.items()
+        )
+        return (
+            f"{sets}FO = {reference(self._previous_node)};"
+            f"FD = {reference(self._mousedowned_node)};"
+            f"FM = {'false' if self._mousedowned_node is None else 'true'};"
+        )
+
+    def in_flight_limits(self) -> dict[str, int]:
+        """
+        Returns the maximum number of unacknowledged events for each
+        coalesced typename; when several event listeners share the same
+        typename, the lowest limit is kept. The default limit is :code:`1`.
+
+        Returns
+        -------
+        dict[str, int]
+            Limits mapped by typenames
+        """
+        limits = {}
+        for typename in COALESCED_TYPENAMES:
+            if typename not in self._event_listeners:
+                continue
+            in_flights = [
+                event_listener.in_flight
+                for event_listener in self.search(typename=typename)
+                if event_listener.in_flight is not None
+            ]
+            limits[typename] = max(1, min(in_flights, default=1))
+        return limits
+
 
 class EventListeners:
     """
@@ -344,6 +568,7 @@ class EventListeners:
 
     def __init__(self):
         self._event_listeners: dict[str, EventListenersGroup] = {}
+        self._scripts: dict[Any, Callable[[], str]] = {}
 
     def __getitem__(self, event_type: str) -> EventListenersGroup:
         """
@@ -377,7 +602,9 @@ class EventListeners:
         """
         return event_type in self._event_listeners
 
-    def __call__(self, event: dict[str, Any]) -> Iterator[list[dict[str, Any]]]:
+    def __call__(
+        self, event: dict[str, Any]
+    ) -> Iterator[list[dict[str, Any]] | asyncio.Task[list[dict[str, Any]]]]:
         """
         Applies the specified :code:`event` to all matched event listeners.
 
@@ -388,8 +615,9 @@ class EventListeners:
 
         Returns
         -------
-        Iterator[list[dict[str, Any]]]
-            Iterator of updated values sent through websocket
+        Iterator[list[dict[str, Any]] | asyncio.Task[list[dict[str, Any]]]]
+            Iterator of updated values sent through websocket; asynchronous
+            listeners give tasks which return updated values once done
         """
         event_type = event.get("type")
         if event_type is None:
@@ -415,6 +643,69 @@ class EventListeners:
         )
         event_listeners_group[key] = target
 
+    def fork(self, session: Session) -> "EventListeners":
+        """
+        Returns a copy of the collection for nodes of the session; states of
+        groups (hovered and pressed nodes) are not shared.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        EventListeners
+            Event listeners of the session
+        """
+        event_listeners = EventListeners()
+        for group in self._event_listeners.values():
+            for event_listener in group.search():
+                event_listeners.add_event_listener(event_listener.fork(session))
+        event_listeners._scripts = dict(self._scripts)
+        return event_listeners
+
+    def set_script(self, key: Any, script: Callable[[], str] | None):
+        """
+        Adds a client script appended to the script of event listeners; it is
+        built when the script is generated (see :code:`into_script`), once
+        references of nodes are known. Behaviors use it for running part of
+        an interaction on the client (see :code:`Zoom.set_predictive`).
+
+        Parameters
+        ----------
+        key : Any
+            Key of the script; a script with the same key is replaced
+        script : Callable[[], str] | None
+            Function which returns the script; :code:`None` removes the
+            script
+        """
+        if script is None:
+            self._scripts.pop(key, None)
+        else:
+            self._scripts[key] = script
+
+    def set_active(
+        self, typename: str, name: str | None, node: etree.Element, active: bool
+    ):
+        """
+        Activates or deactivates an event listener of the collection.
+
+        Parameters
+        ----------
+        typename : str
+            Typename
+        name : str | None
+            Name; all names when :code:`None`
+        node : etree.Element
+            Node element
+        active : bool
+            :code:`True` for activating the event listener
+        """
+        event_type = parse_event(typename).__name__
+        if (event_listeners_group := self._event_listeners.get(event_type)) is not None:
+            event_listeners_group.set_active((node, typename, name), active)
+
     def remove_event_listener(self, typename: str, name: str, node: etree.Element):
         """
         Removes an event listener from the collection
@@ -428,9 +719,9 @@ class EventListeners:
         node : etree.Element
             Node element
         """
-        key = (node, typename, name)
-        for event_listeners_group in self._event_listeners.values():
-            event_listeners_group.pop(key)
+        event_type = parse_event(typename).__name__
+        if (event_listeners_group := self._event_listeners.get(event_type)) is not None:
+            event_listeners_group.pop((node, typename, name))
 
     def into_script(self, host: str | None = None, port: int | None = None) -> str:
         """
@@ -451,8 +742,10 @@ class EventListeners:
         """
         host = "localhost" if host is None else host
         port = 5000 if port is None else port
-        return headers(host, port) + "".join(
-            group.into_script() for group in self._event_listeners.values()
+        return (
+            headers(host, port)
+            + "".join(group.into_script() for group in self._event_listeners.values())
+            + "".join(script() for script in self._scripts.values())
         )
 
     def keys(self) -> set[str]:
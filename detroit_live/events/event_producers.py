@@ -1,20 +1,23 @@
 import asyncio
-from collections.abc import Callable, Iterator
-from dataclasses import dataclass
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import Executor
+from dataclasses import dataclass, replace
 from enum import Enum, auto
+from inspect import isawaitable
 from queue import Queue
 from typing import Any
 
 from lxml import etree
 
 from ..timer import Interval, Timer, TimerEvent
+from .coalescer import DiffCoalescer
+from .dirty_tracker import DirtyTracker
 from .event_source import EventSource
+from .offloader import Offloader
+from .session import Session, get_session
 from .tracking_tree import TrackingTree
-from .utils import (
-    diffdict,
-    node_attribs,
-    xpath_to_query_selector,
-)
+from .utils import diffdict, node_attribs
 
 EMPTY_DIFF = {"remove": [], "change": []}
 
@@ -91,10 +94,29 @@ class TimerModifier:
         html_nodes: list[etree.Element] | None,
         future_tasks: Queue[tuple[TimerStatus, TimerParameters | int]] | None,
     ):
-        self._timer = timer
+        self.__timer = timer
         self._updated_nodes = updated_nodes
         self._html_nodes = html_nodes
-        self._future_tasks = future_tasks
+        self.__future_tasks = future_tasks
+
+    @property
+    def _timer(self) -> Timer:
+        if (session := get_session()) is None:
+            return self.__timer
+        return session.timers.get(id(self.__timer), self.__timer)
+
+    @_timer.setter
+    def _timer(self, timer: Timer):
+        if (session := get_session()) is None:
+            self.__timer = timer
+        else:
+            session.timers[id(self.__timer)] = timer
+
+    @property
+    def _future_tasks(self) -> Queue[tuple[TimerStatus, TimerParameters | int]]:
+        if get_session() is None:
+            return self.__future_tasks
+        return EventProducers()._future_tasks
 
     def restart(
         self,
@@ -138,13 +160,130 @@ class TimerModifier:
         self._future_tasks.put((TimerStatus.STOP, id(self._timer)))
 
 
+class ProducerQueue(asyncio.Queue):
+    """
+    Bounded queue of updated values produced by timer callbacks. When the
+    queue is full (the websocket does not keep up with producers), the
+    behavior depends on the policy:
+
+    * :code:`"block"` : the timer callback waits until a slot is free; the
+      timer is paused meanwhile.
+    * :code:`"drop-oldest"` : the oldest pending frame is dropped. Dropped
+      values are lost, this policy fits producers which write the same
+      attributes on every tick.
+    * :code:`"merge"` : values are merged into the newest pending frame (the
+      latest value wins for each attribute of each node).
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of pending frames
+    policy : str
+        :code:`"block"`, :code:`"drop-oldest"` or :code:`"merge"`
+    """
+
+    policies = ("block", "drop-oldest", "merge")
+
+    def __init__(self, maxsize: int = 16, policy: str = "merge"):
+        if policy not in self.policies:
+            raise ValueError(f"Unknown policy: {policy!r}")
+        if maxsize < 1:
+            raise ValueError(f"Invalid queue size: {maxsize}")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.dropped = 0
+        self.merged = 0
+        # Slots of the queue hold placeholders; pending frames are kept here
+        # so that the newest one can be merged
+        self._frames = deque()
+
+    def put_frame(
+        self, item: tuple[EventSource, list[dict[str, Any]]]
+    ) -> Awaitable[None] | None:
+        """
+        Puts a frame of updated values into the queue, applying the policy
+        when the queue is full.
+
+        Parameters
+        ----------
+        item : tuple[EventSource, list[dict[str, Any]]]
+            Source and updated values
+
+        Returns
+        -------
+        Awaitable[None] | None
+            Awaitable to wait for a free slot with the :code:`"block"` policy
+            when the queue is full
+        """
+        if not self.full():
+            self.put_nowait(None)
+            self._frames.append(item)
+            return
+        match self.policy:
+            case "block":
+                return self._put_frame(item)
+            case "drop-oldest":
+                self.get_frame_nowait()
+                self.task_done()
+                self.dropped += 1
+                self.put_nowait(None)
+                self._frames.append(item)
+            case "merge":
+                self.merge(item)
+
+    async def _put_frame(self, item: tuple[EventSource, list[dict[str, Any]]]):
+        await self.put(None)
+        self._frames.append(item)
+
+    def merge(self, item: tuple[EventSource, list[dict[str, Any]]]):
+        """
+        Merges a frame of updated values into the newest pending frame.
+
+        Parameters
+        ----------
+        item : tuple[EventSource, list[dict[str, Any]]]
+            Source and updated values
+        """
+        source, values = self._frames[-1]
+        coalescer = DiffCoalescer()
+        coalescer.extend(values)
+        coalescer.extend(item[1])
+        self._frames[-1] = (source, coalescer.flush())
+        self.merged += 1
+
+    async def get_frame(self) -> tuple[EventSource, list[dict[str, Any]]]:
+        """
+        Removes and returns the oldest pending frame, waiting for one if the
+        queue is empty.
+
+        Returns
+        -------
+        tuple[EventSource, list[dict[str, Any]]]
+            Source and updated values
+        """
+        await self.get()
+        return self._frames.popleft()
+
+    def get_frame_nowait(self) -> tuple[EventSource, list[dict[str, Any]]]:
+        """
+        Removes and returns the oldest pending frame.
+
+        Returns
+        -------
+        tuple[EventSource, list[dict[str, Any]]]
+            Source and updated values
+        """
+        self.get_nowait()
+        return self._frames.popleft()
+
+
 class SharedState:
     """
     Shared state for global context when instanciating :code:`EventProducers`.
 
     Attributes
     ----------
-    queue : asyncio.Queue
+    queue : ProducerQueue
         Updated node attributes to send to the websocket
     restart : dict[int, TimerParameters]
         Tasks to restart
@@ -155,27 +294,121 @@ class SharedState:
     """
 
     def __init__(self):
-        self.queue = asyncio.Queue()
+        self.queue = ProducerQueue()
         self.restart = {}
         self.pending = {}
         self.future_tasks = Queue()
 
+    def fork(self, session: Session) -> "SharedState":
+        """
+        Returns the state of the session: timers which are not started yet are
+        copied into new timers, started in the session.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        SharedState
+            State of the session
+        """
+        state = SharedState()
+        state.queue = ProducerQueue(self.queue.maxsize, self.queue.policy)
+        for timer_params in self.restart.values():
+            timer = type(timer_params.timer)()
+            session.timers[id(timer_params.timer)] = timer
+            state.restart[id(timer)] = replace(timer_params, timer=timer)
+        return state
+
 
 class EventProducers:
     _shared_state = SharedState()
 
-    def __init__(self):
-        self._queue = self._shared_state.queue
-        self._restart = self._shared_state.restart
-        self._pending = self._shared_state.pending
-        self._future_tasks = self._shared_state.future_tasks
+    @property
+    def _state(self) -> SharedState:
+        if (session := get_session()) is None:
+            return self._shared_state
+        return session.state(EventProducers, self._shared_state.fork)
+
+    @property
+    def _queue(self) -> ProducerQueue:
+        return self._state.queue
+
+    @property
+    def _restart(self) -> dict[int, TimerParameters]:
+        return self._state.restart
+
+    @property
+    def _pending(self) -> dict[int, asyncio.Task]:
+        return self._state.pending
+
+    @_pending.setter
+    def _pending(self, pending: dict[int, asyncio.Task]):
+        self._state.pending = pending
+
+    @property
+    def _future_tasks(self) -> Queue[tuple[TimerStatus, TimerParameters | int]]:
+        return self._state.future_tasks
+
+    def configure_queue(self, maxsize: int = 16, policy: str = "merge"):
+        """
+        Configures the queue of updated values produced by timer callbacks.
+
+        Parameters
+        ----------
+        maxsize : int
+            Maximum number of pending frames
+        policy : str
+            Policy applied when the queue is full: :code:`"block"`,
+            :code:`"drop-oldest"` or :code:`"merge"` (see
+            :code:`ProducerQueue`)
+        """
+        queue = ProducerQueue(maxsize, policy)
+        previous = self._state.queue
+        queue.dropped = previous.dropped
+        queue.merged = previous.merged
+        # Pending frames are kept; they are merged if they exceed the new size
+        while not previous.empty():
+            item = previous.get_frame_nowait()
+            if queue.full():
+                queue.merge(item)
+            else:
+                queue.put_frame(item)
+        self._state.queue = queue
+
+    @property
+    def dropped_frames(self) -> int:
+        """
+        Returns the number of frames dropped with the :code:`"drop-oldest"`
+        policy.
+
+        Returns
+        -------
+        int
+            Number of dropped frames
+        """
+        return self._queue.dropped
+
+    @property
+    def merged_frames(self) -> int:
+        """
+        Returns the number of frames merged with the :code:`"merge"` policy.
+
+        Returns
+        -------
+        int
+            Number of merged frames
+        """
+        return self._queue.merged
 
     def _event_builder(
         self,
         callback: Callable[[float, TimerEvent], None],
         updated_nodes: list[etree.Element] | None,
         html_nodes: list[etree.Element] | None,
-    ) -> Callable[[float, TimerEvent], None]:
+    ) -> Callable[[float, TimerEvent], Awaitable[None] | None]:
         """
         Decorator function; for any call of :code:`callback`, gathers node
         changes and puts them into an asynchronous queue.
@@ -191,37 +424,73 @@ class EventProducers:
 
         Returns
         -------
-        Callable[[float, TimerEvent], None]
-            Decorated callback
+        Callable[[float, TimerEvent], Awaitable[None] | None]
+            Decorated callback; it returns an awaitable when the callback is
+            asynchronous or when it must wait for a free slot in the queue
         """
         updated_nodes = [] if updated_nodes is None else updated_nodes
-        html_nodes = set() if html_nodes is None else set(html_nodes)
+        html_nodes = [] if html_nodes is None else html_nodes
+        if (session := get_session()) is not None:
+            updated_nodes = list(map(session.node, updated_nodes))
+            html_nodes = list(map(session.node, html_nodes))
+        html_nodes = set(html_nodes)
         ttree = TrackingTree()
+        tracker = DirtyTracker()
 
         def diffs(states: list[dict]) -> Iterator[dict]:
             for node, old_attrib in states:
-                element_id = xpath_to_query_selector(ttree.get_path(node))
+                if not tracker.attached(node):
+                    continue
+                element_id = ttree.get_reference(node)
                 new_attrib = node_attribs(node, node in html_nodes)
                 diff = diffdict(old_attrib, new_attrib)
                 if diff != EMPTY_DIFF:
                     yield {"elementId": element_id, "diff": diff}
 
+        def publish(states: list[dict]) -> Awaitable[None] | None:
+            values = list(tracker.flush())
+            values.extend(diffs(states))
+            if values:
+                return self._queue.put_frame((EventSource.PRODUCER, values))
+
+        async def wait(awaitable: Awaitable[None], states: list[dict]):
+            tracker.isolate()
+            tracker.start()
+            try:
+                await awaitable
+            finally:
+                tracker.stop()
+            if (put := publish(states)) is not None:
+                await put
+
         def wrapper(elapsed: float, time_event: TimerEvent):
-            states = [
-                (node, node_attribs(node, node in html_nodes)) for node in updated_nodes
-            ]
-            callback(elapsed, time_event)
-            self._queue.put_nowait((EventSource.PRODUCER, list(diffs(states))))
+            states = (
+                []
+                if tracker.enabled
+                else [
+                    (node, node_attribs(node, node in html_nodes))
+                    for node in updated_nodes
+                ]
+            )
+            tracker.start()
+            try:
+                result = callback(elapsed, time_event)
+            finally:
+                tracker.stop()
+            if isawaitable(result):
+                return wait(result, states)
+            return publish(states)
 
         return wrapper
 
     def add_timer(
         self,
-        callback: Callable[[float, TimerEvent], None],
+        callback: Callable[[float, TimerEvent], Awaitable[None] | None],
         updated_nodes: list[etree.Element] | None = None,
         html_nodes: list[etree.Element] | None = None,
         delay: float | None = None,
         starting_time: float | None = None,
+        executor: Executor | None = None,
     ) -> TimerModifier:
         """
         Adds a timer which will calls :code:`callback` until its timer event is
@@ -229,8 +498,9 @@ class EventProducers:
 
         Parameters
         ----------
-        callback : Callable[[float, TimerEvent], None]
-            Timer callback
+        callback : Callable[[float, TimerEvent], Awaitable[None] | None]
+            Timer callback; when asynchronous, it is awaited while other events
+            and timers keep running, and the timer is paused meanwhile
         updated_nodes : list[etree.Element] | None
             Nodes to update when the timer callback is called
         html_nodes : list[etree.Element] | None
@@ -239,12 +509,18 @@ class EventProducers:
             Delay value
         starting_time : float | None
             Starting time value
+        executor : Executor | None
+            Thread pool in which the callback runs against a detached copy of
+            the document; its attribute writes are applied back as one batch
+            (see :code:`Offloader`)
 
         Returns
         -------
         TimerModifier
             Timer modifier
         """
+        if executor is not None:
+            callback = Offloader().timer(callback, executor)
         timer = Timer()
         timer_id = id(timer)
         self._restart[timer_id] = TimerParameters(
@@ -259,11 +535,12 @@ class EventProducers:
 
     def add_interval(
         self,
-        callback: Callable[[float, TimerEvent], None],
+        callback: Callable[[float, TimerEvent], Awaitable[None] | None],
         updated_nodes: list[etree.Element] | None = None,
         html_nodes: list[etree.Element] | None = None,
         delay: float | None = None,
         starting_time: float | None = None,
+        executor: Executor | None = None,
     ) -> TimerModifier:
         """
         Adds a interval timer which will calls :code:`callback` until its timer
@@ -271,8 +548,9 @@ class EventProducers:
 
         Parameters
         ----------
-        callback : Callable[[float, TimerEvent], None]
-            Timer callback
+        callback : Callable[[float, TimerEvent], Awaitable[None] | None]
+            Timer callback; when asynchronous, it is awaited while other events
+            and timers keep running, and the timer is paused meanwhile
         updated_nodes : list[etree.Element] | None
             Nodes to update when the timer callback is called
         html_nodes : list[etree.Element] | None
@@ -281,12 +559,18 @@ class EventProducers:
             Delay value
         starting_time : float | None
             Starting time value
+        executor : Executor | None
+            Thread pool in which the callback runs against a detached copy of
+            the document; its attribute writes are applied back as one batch
+            (see :code:`Offloader`)
 
         Returns
         -------
         TimerModifier
             Timer modifier
         """
+        if executor is not None:
+            callback = Offloader().timer(callback, executor)
         interval = Interval()
         timer_id = id(interval)
         self._restart[timer_id] = TimerParameters(
@@ -355,9 +639,18 @@ class EventProducers:
             self._restart.clear()
             return set(self._pending.values())
 
+    def cancel_tasks(self):
+        """
+        Cancels running timer tasks; called when the websocket connection of
+        a session is closed.
+        """
+        for task in self._pending.values():
+            task.cancel()
+        self._pending = {}
+
     def queue_task(self, result: Any | None = None) -> asyncio.Task | None:
         """
-        Returns a queue task (:code:`asyncio.create_task(queue.get())`)
+        Returns a queue task (:code:`asyncio.create_task(queue.get_frame())`)
         depending the last result.
 
         Parameters
@@ -368,10 +661,10 @@ class EventProducers:
         Returns
         -------
         asyncio.Task | None
-            Asynchrous :code:`queue.get` task
+            Asynchrous :code:`queue.get_frame` task
         """
         if result is None or (isinstance(result, (int, tuple)) and self._pending):
-            return asyncio.create_task(self._queue.get())
+            return asyncio.create_task(self._queue.get_frame())
 
 
 def event_producers() -> EventProducers:
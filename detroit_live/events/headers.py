@@ -2,6 +2,24 @@
 # This code is minified and it is JavaScript ...
 EVENT_HEADERS = """
 const socket = new WebSocket("ws://localhost:5000/ws");
+socket.binaryType = "arraybuffer";
+const N = new Map();
+
+function g(e) {
+    if (e.hasAttribute && e.hasAttribute("data-detroit-id")) N.set(+e.getAttribute("data-detroit-id"), e);
+    var l = e.querySelectorAll("[data-detroit-id]");
+    for (var i = 0, n = l.length; i < n; ++i) N.set(+l[i].getAttribute("data-detroit-id"), l[i]);
+}
+
+function h(e) {
+    if (e.hasAttribute("data-detroit-id")) N.delete(+e.getAttribute("data-detroit-id"));
+    var l = e.querySelectorAll("[data-detroit-id]");
+    for (var i = 0, n = l.length; i < n; ++i) N.delete(+l[i].getAttribute("data-detroit-id"));
+}
+
+document.readyState === "loading" ? document.addEventListener("DOMContentLoaded", () => g(document)) : g(document);
+
+const L = {}, I = {}, P = {}, Q = {};
 
 function f(o, t, u) {
     o.elementId = u;
@@ -9,7 +27,69 @@ function f(o, t, u) {
     point = pointer(o, document.querySelector("svg"));
     o.pageX = point[0];
     o.pageY = point[1];
-    socket.send(JSON.stringify(o, null, 0));
+    if (L[t] == undefined) {
+        for (var k in P) E(k, true);
+        socket.send(JSON.stringify(o, null, 0));
+        return;
+    }
+    if (t === "wheel" && P[t] != undefined && Q[t] !== event) {
+        o.deltaX += P[t].deltaX;
+        o.deltaY += P[t].deltaY;
+    }
+    P[t] = o;
+    Q[t] = event;
+    E(t, false);
+}
+
+function E(t, c) {
+    if (P[t] == undefined || (!c && (I[t] || 0) >= L[t])) return;
+    I[t] = (I[t] || 0) + 1;
+    socket.send(JSON.stringify(P[t], null, 0));
+    P[t] = undefined;
+}
+
+function K(c) {
+    for (var i = 0, t; i < c.length; ++i) {
+        t = c[i][0];
+        I[t] = Math.max(0, (I[t] || 0) - c[i][1]);
+        if (L[t] != undefined) E(t, false);
+    }
+}
+
+const FS = {};
+var FO = null, FD = null, FM = false;
+
+function FL(r) {
+    var l = FS[r.typename];
+    if (l == undefined) l = FS[r.typename] = new Set();
+    for (var i = 0, n = r.elementIds.length; i < n; ++i) r.listening ? l.add(r.elementIds[i]) : l.delete(r.elementIds[i]);
+}
+
+function FA(u) {
+    for (var k in FS) if (FS[k].has(u)) return true;
+    return false;
+}
+
+function FT(t, u) {
+    var l = FS[t], e = FS.mouseleave, c;
+    if (t === "mouseover") {
+        c = (l != undefined && l.has(u)) || (e != undefined && (e.has(u) || (FO == null ? e.size > 0 : e.has(FO))));
+        if (c) FO = u;
+        return c;
+    }
+    if (t === "mousedown") {
+        if (FM || FA(u)) {
+            FD = u;
+            FM = true;
+        }
+        return FM;
+    }
+    c = (l != undefined && l.has(FD == null ? u : FD)) || (t === "mouseup" && FM);
+    if (t === "mouseup") {
+        FD = null;
+        FM = false;
+    }
+    return c;
 }
 
 function sourceEvent(event) {
@@ -37,7 +117,7 @@ function pointer(event, node) {
   return [event.pageX, event.pageY];
 }
 
-function p(e) {
+function x(e) {
     if (!e) return;
     if (e === document.body) return 'body';
     let t = e.parentNode;
@@ -45,11 +125,17 @@ function p(e) {
     let r = Array.from(t.children).filter((t => t.tagName === e.tagName)),
         n = r.indexOf(e) + 1,
         a = e.tagName.toLowerCase(),
-        o = p(t) + '/' + a;
+        o = x(t) + '/' + a;
     return r.length > 1 && (o += `[${n}]`), o
 }
 
+function p(e) {
+    var i = e && e.getAttribute ? e.getAttribute("data-detroit-id") : null;
+    return i == null ? x(e) : +i;
+}
+
 function q(u) {
+    if (typeof u === "number") return N.get(u);
     var n, s = u.split(" "), t = s[s.length - 2], els = document.querySelectorAll(u);
     if ((n = els.length) === 1 || t === undefined) {
         return els[0];
@@ -63,33 +149,325 @@ function q(u) {
     }
 }
 
-socket.addEventListener('message', (e) => {
-    const fr = new FileReader();
-    fr.onload = function(o) {
-        const t = JSON.parse(o.target.result);
-        for (var i1 = 0, r, n = t.length; i1 < n; ++i1) {
-            r = t[i1];
-            const el = q(r.elementId);
-            if (el == undefined) {
-                continue;
+function s(r) {
+    var el, a, b, els;
+    switch (r.op) {
+        case "insert":
+            el = q(r.parentId);
+            if (el == undefined) return;
+            a = r.anchorId == null ? null : q(r.anchorId) || null;
+            b = a == null ? el.lastElementChild : a.previousElementSibling;
+            a == null ? el.insertAdjacentHTML("beforeend", r.outerHTML) : a.insertAdjacentHTML("beforebegin", r.outerHTML);
+            for (b = b == null ? el.firstElementChild : b.nextElementSibling; b != null && b !== a; b = b.nextElementSibling) g(b);
+            break;
+        case "remove":
+            els = r.elementIds.map(q);
+            for (var i = 0, n = els.length; i < n; ++i) {
+                if (els[i] != undefined) {
+                    h(els[i]);
+                    els[i].remove();
+                }
             }
-            if (r.diff != undefined) {
-                var c = r.diff.change;
-                for (var i2 = 0, k, v, m = c.length; i2 < m; ++i2) {
-                    [k, v] = c[i2];
-                    k === "innerHTML" ? el[k] = v: el.setAttribute(k, v)
+            break;
+        case "replace":
+            el = q(r.elementId);
+            if (el == undefined) return;
+            h(el);
+            el.insertAdjacentHTML("beforebegin", r.outerHTML);
+            a = el.previousElementSibling;
+            el.remove();
+            if (a != null) g(a);
+            break;
+        case "move":
+            el = q(r.elementId);
+            els = q(r.parentId);
+            a = r.anchorId == null ? null : q(r.anchorId);
+            if (el != undefined && els != undefined) els.insertBefore(el, a || null);
+            break;
+        case "marks":
+            R(r);
+            break;
+        case "listen":
+            FL(r);
+            break;
+    }
+}
+
+const M = new Map(), H = new Set();
+
+function V(v) {
+    var b = atob(v), u = new Uint8Array(b.length);
+    for (var i = 0, n = b.length; i < n; ++i) u[i] = b.charCodeAt(i);
+    return new Float32Array(u.buffer);
+}
+
+function R(r) {
+    var m = M.get(r.elementId), l, c, v, k, j, n;
+    if (m == undefined) M.set(r.elementId, m = {});
+    l = m[r.kind];
+    if (l == undefined) l = m[r.kind] = {n: 0, c: {}};
+    if (l.n !== r.size) {
+        for (k in l.c) {
+            c = l.c[k];
+            v = c instanceof Float64Array ? new Float64Array(r.size) : new Array(r.size).fill(null);
+            for (j = 0, n = Math.min(c.length, r.size); j < n; ++j) v[j] = c[j];
+            l.c[k] = v;
+        }
+        l.n = r.size;
+    }
+    for (k in r.columns) {
+        v = r.columns[k];
+        if (typeof v === "string") v = V(v);
+        c = l.c[k];
+        if (c == undefined || (v instanceof Float32Array) !== (c instanceof Float64Array)) c = l.c[k] = v instanceof Float32Array ? new Float64Array(l.n) : new Array(l.n).fill(null);
+        for (j = 0, n = v.length; j < n; ++j) c[r.start + j] = v[j];
+    }
+    H.add(r.elementId);
+}
+
+function W() {
+    H.forEach((u) => {
+        var e = q(u), m = M.get(u), t, k, l, c, j, n, f;
+        if (e == undefined || !e.getContext) return;
+        t = e.getContext("2d");
+        t.clearRect(0, 0, e.width, e.height);
+        for (k in m) {
+            l = m[k];
+            c = l.c;
+            for (j = 0, n = l.n; j < n; ++j) {
+                t.globalAlpha = c.opacity ? c.opacity[j] : 1;
+                t.beginPath();
+                if (k === "circle") {
+                    t.arc(c.cx ? c.cx[j] : 0, c.cy ? c.cy[j] : 0, c.r ? c.r[j] : 0, 0, 2 * Math.PI);
+                } else {
+                    t.rect(c.x ? c.x[j] : 0, c.y ? c.y[j] : 0, c.width ? c.width[j] : 0, c.height ? c.height[j] : 0);
+                }
+                f = c.fill ? c.fill[j] : null;
+                if (f !== "none") {
+                    t.fillStyle = f == null ? "black" : f;
+                    t.fill();
                 }
-                c = r.diff.remove;
-                for (var i2 = 0, k, v, m = c.length; i2 < m; ++i2) {
-                    [k, v] = c[i2];
-                    k === "innerHTML" ? el[k] = undefined : el.removeAttribute(k);
+                f = c.stroke ? c.stroke[j] : null;
+                if (f != null && f !== "none") {
+                    t.strokeStyle = f;
+                    t.lineWidth = c["stroke-width"] ? c["stroke-width"][j] : 1;
+                    t.stroke();
                 }
-            } else {
-                el.outerHTML = r.outerHTML;
             }
         }
+    });
+    H.clear();
+}
+
+function a(el, k, v) {
+    if (k === "transform" && X.has(el) && X.get(el)(v)) return;
+    k === "innerHTML" ? el[k] = v : el.setAttribute(k, v);
+}
+
+const X = new Map();
+
+function G(t, o) {
+    var e = o.e, r = o.t, x0 = (e[0][0] - t.x) / t.k - r[0][0], x1 = (e[1][0] - t.x) / t.k - r[1][0], y0 = (e[0][1] - t.y) / t.k - r[0][1], y1 = (e[1][1] - t.y) / t.k - r[1][1];
+    x0 = x1 > x0 ? (x0 + x1) / 2 : Math.min(0, x0) || Math.max(0, x1);
+    y0 = y1 > y0 ? (y0 + y1) / 2 : Math.min(0, y0) || Math.max(0, y1);
+    return {k: t.k, x: t.x + t.k * x0, y: t.y + t.k * y0};
+}
+
+function Z(v, u, o) {
+    var b = () => {
+        var e = q(v), n = q(u), t = {k: o.z[0], x: o.z[1], y: o.z[2]}, m = null, l = 0, c = null, y;
+        if (e == undefined || n == undefined) return;
+        y = () => performance.now() - l > o.d && m == null && !(I.wheel > 0 || I.mousemove > 0 || P.wheel || P.mousemove);
+        function d(p, i, k) {
+            t = G({k: k, x: p[0] - i[0] * k, y: p[1] - i[1] * k}, o);
+            n.setAttribute("transform", "translate(" + t.x + "," + t.y + ") scale(" + t.k + ")");
+            l = performance.now();
+        }
+        function j(r) {
+            var w = /translate\\(([^,]+),([^)]+)\\) scale\\(([^)]+)\\)/.exec(r);
+            if (w) t = {k: +w[3], x: +w[1], y: +w[2]};
+        }
+        function k() {
+            if (c == null) return;
+            if (!y()) {
+                setTimeout(k, o.d);
+                return;
+            }
+            n.setAttribute("transform", c);
+            j(c);
+            c = null;
+        }
+        X.set(n, (r) => {
+            if (y()) {
+                j(r);
+                return false;
+            }
+            if (c == null) setTimeout(k, o.d);
+            c = r;
+            return true;
+        });
+        e.addEventListener("wheel", (w) => {
+            var i = [w.clientX, w.clientY], s = t.k * Math.pow(2, -w.deltaY * (w.deltaMode === 1 ? 0.05 : w.deltaMode ? 1 : 0.002) * (w.ctrlKey ? 10 : 1));
+            s = Math.max(o.k[0], Math.min(o.k[1], s));
+            w.preventDefault();
+            if (s === t.k) return;
+            d(i, [(i[0] - t.x) / t.k, (i[1] - t.y) / t.k], s);
+        }, {passive: false});
+        e.addEventListener("mousedown", (w) => {
+            if (w.ctrlKey || w.button) return;
+            var i = pointer(w, document.querySelector("svg"));
+            m = [(i[0] - t.x) / t.k, (i[1] - t.y) / t.k];
+            l = performance.now();
+        });
+        window.addEventListener("mousemove", (w) => {
+            if (m != null) d(pointer(w, document.querySelector("svg")), m, t.k);
+        });
+        window.addEventListener("mouseup", () => {
+            m = null;
+        });
     };
-    fr.readAsText(e.data);
+    document.readyState === "loading" ? document.addEventListener("DOMContentLoaded", b) : b();
+}
+
+function z(el, k) {
+    k === "innerHTML" ? el[k] = undefined : el.removeAttribute(k);
+}
+
+const U = [];
+var B = null, F = 0;
+
+function w(u, k, v) {
+    if (B == null) {
+        B = new Map();
+        U.push(B);
+    }
+    var m = B.get(u);
+    if (m == undefined) B.set(u, m = new Map());
+    m.set(k, v);
+    if (!F) F = requestAnimationFrame(Y);
+}
+
+function O(r) {
+    U.push(r);
+    B = null;
+    if (!F) F = requestAnimationFrame(Y);
+}
+
+function Y() {
+    var u = U.splice(0, U.length), el;
+    F = 0;
+    B = null;
+    for (var i = 0, n = u.length, r; i < n; ++i) {
+        r = u[i];
+        if (r instanceof Map) {
+            r.forEach((m, j) => {
+                el = q(j);
+                if (el != undefined) m.forEach((v, k) => v === undefined ? z(el, k) : a(el, k, v));
+            });
+        } else if (r.op != undefined) {
+            s(r);
+        } else if ((el = q(r.elementId)) != undefined) {
+            el.outerHTML = r.outerHTML;
+        }
+    }
+    if (H.size) W();
+}
+
+function C(r) {
+    var d = r.elementIds, n = d == undefined ? r.count : d.length, c, j, k;
+    for (k in r.attributes) {
+        c = r.attributes[k];
+        if (typeof c === "string") c = c.split(" ");
+        for (j = 0; j < n; ++j) w(d == undefined ? r.start + j : d[j], k, c[j]);
+    }
+}
+
+function J(t) {
+    for (var i1 = 0, r, n = t.length; i1 < n; ++i1) {
+        r = t[i1];
+        if (r.ack != undefined) {
+            K(r.ack);
+            continue;
+        }
+        if (r.op === "attrs") {
+            C(r);
+            continue;
+        }
+        if (r.diff == undefined) {
+            O(r);
+            continue;
+        }
+        var c = r.diff.change;
+        for (var i2 = 0, m = c.length; i2 < m; ++i2) w(r.elementId, c[i2][0], c[i2][1]);
+        c = r.diff.remove;
+        for (var i2 = 0, m = c.length; i2 < m; ++i2) w(r.elementId, c[i2][0], undefined);
+    }
+}
+
+const A = [];
+const T = new TextDecoder();
+
+function S(v, i, m) {
+    return T.decode(new Uint8Array(v.buffer, v.byteOffset + i, m));
+}
+
+function D(v) {
+    var i = 1, n = v.byteLength, t, j, k, m, c, b, ks, ids, u;
+    while (i < n) {
+        t = v.getUint8(i);
+        i += 1;
+        switch (t) {
+            case 1:
+                j = v.getUint16(i, true);
+                m = v.getUint16(i + 2, true);
+                A[j] = S(v, i + 4, m);
+                i += 4 + m;
+                break;
+            case 2:
+                b = v.getUint8(i);
+                k = v.getUint16(i + 1, true);
+                i += 3;
+                ks = [];
+                for (j = 0; j < k; ++j, i += 2) ks.push(A[v.getUint16(i, true)]);
+                m = v.getUint32(i, true);
+                ids = i + 4;
+                i = ids + 4 * m;
+                for (j = 0; j < m; ++j) {
+                    u = v.getUint32(ids + 4 * j, true);
+                    for (c = 0; c < k; ++c, i += b) w(u, ks[c], b === 4 ? +v.getFloat32(i, true).toPrecision(6) : v.getFloat64(i, true));
+                }
+                break;
+            case 3:
+                u = v.getUint32(i, true);
+                k = v.getUint16(i + 4, true);
+                i += 6;
+                for (c = 0; c < k; ++c) {
+                    j = v.getUint16(i, true);
+                    m = v.getUint32(i + 2, true);
+                    w(u, A[j], S(v, i + 6, m));
+                    i += 6 + m;
+                }
+                break;
+            case 4:
+                u = v.getUint32(i, true);
+                k = v.getUint16(i + 4, true);
+                i += 6;
+                for (c = 0; c < k; ++c, i += 2) w(u, A[v.getUint16(i, true)], undefined);
+                break;
+            case 5:
+                m = v.getUint32(i, true);
+                J([JSON.parse(S(v, i + 4, m))]);
+                i += 4 + m;
+                break;
+            default:
+                return;
+        }
+    }
+}
+
+socket.addEventListener('message', (e) => {
+    const v = new DataView(e.data);
+    v.byteLength > 0 && v.getUint8(0) === 0 ? D(v) : J(JSON.parse(S(v, 0, v.byteLength)));
 });
 """
 
@@ -0,0 +1,412 @@
+import math
+import sys
+from array import array
+from base64 import b64encode
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from lxml import etree
+
+from .session import Session, get_session
+from .tracking_tree import TrackingTree
+from .utils import get_root
+
+# Geometry attributes of each kind of mark
+KINDS = {
+    "circle": ("cx", "cy", "r"),
+    "rect": ("x", "y", "width", "height"),
+}
+# Marks whose box spans more cells are tested on every query
+MAX_CELLS = 64
+
+
+def pack(values: array) -> str:
+    """
+    Packs numbers into little-endian float32 values encoded in base64.
+
+    Parameters
+    ----------
+    values : array
+        Numbers
+
+    Returns
+    -------
+    str
+        Packed values
+    """
+    packed = array("f", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return b64encode(packed.tobytes()).decode("ascii")
+
+
+def to_column(values: Iterable[Any]) -> array | list[str | None]:
+    """
+    Returns a numeric column when all values are numbers (or numeric
+    strings), otherwise a column of strings.
+
+    Parameters
+    ----------
+    values : Iterable[Any]
+        Values
+
+    Returns
+    -------
+    array | list[str | None]
+        Column
+    """
+    if hasattr(values, "dtype") and values.dtype.kind in "iuf":
+        return array("d", values.astype("float64").tobytes())
+    values = list(values)
+    try:
+        return array("d", [float(value) for value in values])
+    except (TypeError, ValueError):
+        return [None if value is None else str(value) for value in values]
+
+
+class Marks:
+    """
+    Columnar storage of marks of one kind (:code:`"circle"` or
+    :code:`"rect"`) drawn on a :code:`canvas` element. Numeric attributes
+    are stored as :code:`array("d")` and other attributes as lists of
+    strings; no element is created per mark.
+
+    Parameters
+    ----------
+    canvas : etree.Element
+        Canvas element
+    kind : str
+        Kind of marks
+    """
+
+    def __init__(self, canvas: etree.Element, kind: str):
+        if kind not in KINDS:
+            raise ValueError(
+                f"Unsupported kind of marks: {kind!r} (expected one of "
+                f"{', '.join(map(repr, KINDS))})."
+            )
+        self.canvas = canvas
+        self.kind = kind
+        self.size = 0
+        self.data = []
+        self.columns = {}
+        self._grid = None
+
+    def copy(self, canvas: etree.Element) -> "Marks":
+        """
+        Returns a copy of the marks drawn on another canvas.
+
+        Parameters
+        ----------
+        canvas : etree.Element
+            Canvas element
+
+        Returns
+        -------
+        Marks
+            Copy of the marks
+        """
+        marks = Marks(canvas, self.kind)
+        marks.size = self.size
+        marks.data = list(self.data)
+        marks.columns = {
+            key: array("d", column) if isinstance(column, array) else list(column)
+            for key, column in self.columns.items()
+        }
+        return marks
+
+    def resize(self, size: int):
+        """
+        Changes the number of marks; new marks have no attributes.
+
+        Parameters
+        ----------
+        size : int
+            Number of marks
+        """
+        for key, column in self.columns.items():
+            if size <= len(column):
+                del column[size:]
+            elif isinstance(column, array):
+                column.extend(array("d", bytes(8 * (size - len(column)))))
+            else:
+                column.extend([None] * (size - len(column)))
+        del self.data[size:]
+        self.data.extend([None] * (size - len(self.data)))
+        self.size = size
+        self._grid = None
+
+    def delete(self, indices: Iterable[int]):
+        """
+        Deletes marks.
+
+        Parameters
+        ----------
+        indices : Iterable[int]
+            Indices of deleted marks
+        """
+        deleted = set(indices)
+        keep = [i for i in range(self.size) if i not in deleted]
+        for key, column in self.columns.items():
+            values = [column[i] for i in keep]
+            self.columns[key] = (
+                array("d", values) if isinstance(column, array) else values
+            )
+        self.data = [self.data[i] for i in keep]
+        self.size = len(keep)
+        self._grid = None
+
+    def write(self, key: str, values: Iterable[Any], indices: list[int] | None = None):
+        """
+        Writes values of an attribute.
+
+        Parameters
+        ----------
+        key : str
+            Attribute name
+        values : Iterable[Any]
+            Values, one per written mark
+        indices : list[int] | None
+            Indices of written marks; all marks when :code:`None`
+        """
+        values = to_column(values)
+        column = self.columns.get(key)
+        if indices is None:
+            column = values
+        else:
+            if column is None:
+                column = array("d", bytes(8 * self.size))
+            if isinstance(column, array) and not isinstance(values, array):
+                column = [None if value is None else str(value) for value in column]
+            elif isinstance(values, array) and not isinstance(column, array):
+                values = [str(value) for value in values]
+            for i, value in zip(indices, values):
+                column[i] = value
+        self.columns[key] = column
+        if key in KINDS[self.kind]:
+            self._grid = None
+
+    def get(self, key: str, index: int) -> float | str | None:
+        """
+        Returns the value of an attribute of a mark.
+
+        Parameters
+        ----------
+        key : str
+            Attribute name
+        index : int
+            Index of the mark
+
+        Returns
+        -------
+        float | str | None
+            Value if written
+        """
+        if (column := self.columns.get(key)) is None:
+            return None
+        return column[index]
+
+    def patch(
+        self, start: int = 0, stop: int | None = None, keys: Iterable[str] | None = None
+    ) -> dict[str, Any]:
+        """
+        Returns the columnar operation which sends values of marks from
+        :code:`start` to :code:`stop`. Numbers are packed (see :code:`pack`).
+
+        Parameters
+        ----------
+        start : int
+            Index of the first mark
+        stop : int | None
+            Index after the last mark; the number of marks by default
+        keys : Iterable[str] | None
+            Sent attributes; all attributes by default
+
+        Returns
+        -------
+        dict[str, Any]
+            Columnar operation without reference of the canvas
+        """
+        stop = self.size if stop is None else min(stop, self.size)
+        keys = self.columns.keys() if keys is None else keys
+        columns = {}
+        for key in keys:
+            if (column := self.columns.get(key)) is None:
+                continue
+            values = column[start:stop]
+            columns[key] = pack(values) if isinstance(column, array) else values
+        return {
+            "op": "marks",
+            "kind": self.kind,
+            "size": self.size,
+            "start": start,
+            "columns": columns,
+        }
+
+    def _geometry(self) -> Iterator[tuple[float, ...]]:
+        zeros = array("d", bytes(8 * self.size))
+        columns = [
+            column if isinstance(column := self.columns.get(key), array) else zeros
+            for key in KINDS[self.kind]
+        ]
+        return zip(*columns)
+
+    def _build(self) -> tuple[float, dict[tuple[int, int], list[int]], list[int]]:
+        """
+        Builds a uniform grid of bounding boxes of marks.
+        """
+        boxes = []
+        if self.kind == "circle":
+            for cx, cy, r in self._geometry():
+                boxes.append((cx - r, cy - r, cx + r, cy + r))
+        else:
+            for x, y, width, height in self._geometry():
+                boxes.append((x, y, x + width, y + height))
+        if not boxes:
+            return 1.0, {}, []
+        x0 = min(box[0] for box in boxes)
+        y0 = min(box[1] for box in boxes)
+        x1 = max(box[2] for box in boxes)
+        y1 = max(box[3] for box in boxes)
+        size = max(math.sqrt((x1 - x0) * (y1 - y0) / len(boxes)), 1e-6)
+        cells = {}
+        oversized = []
+        for i, (bx0, by0, bx1, by1) in enumerate(boxes):
+            i0, i1 = math.floor(bx0 / size), math.floor(bx1 / size)
+            j0, j1 = math.floor(by0 / size), math.floor(by1 / size)
+            if (i1 - i0 + 1) * (j1 - j0 + 1) > MAX_CELLS:
+                oversized.append(i)
+                continue
+            for ci in range(i0, i1 + 1):
+                for cj in range(j0, j1 + 1):
+                    cells.setdefault((ci, cj), []).append(i)
+        return size, cells, oversized
+
+    def find(self, x: float, y: float) -> int | None:
+        """
+        Returns the index of the topmost mark (the last one drawn) which
+        contains the point.
+
+        Parameters
+        ----------
+        x : float
+            X-coordinate in canvas coordinates
+        y : float
+            Y-coordinate in canvas coordinates
+
+        Returns
+        -------
+        int | None
+            Index of the mark if found
+        """
+        if self._grid is None:
+            self._grid = self._build()
+        size, cells, oversized = self._grid
+        candidates = cells.get((math.floor(x / size), math.floor(y / size)), [])
+        geometry = [self.columns.get(key) for key in KINDS[self.kind]]
+
+        def value(column: Any, i: int) -> float:
+            return column[i] if isinstance(column, array) else 0.0
+
+        for i in sorted([*candidates, *oversized], reverse=True):
+            if self.kind == "circle":
+                cx, cy, r = (value(column, i) for column in geometry)
+                if (x - cx) ** 2 + (y - cy) ** 2 <= r * r:
+                    return i
+            else:
+                bx, by, width, height = (value(column, i) for column in geometry)
+                if bx <= x <= bx + width and by <= y <= by + height:
+                    return i
+        return None
+
+
+class MarksState:
+    __slots__ = ("layers",)
+
+    def __init__(self):
+        self.layers = {}
+
+    def fork(self, session: Session) -> "MarksState":
+        """
+        Returns a copy of marks drawn on canvases of the session.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        MarksState
+            Marks state of the session
+        """
+        state = MarksState()
+        for (canvas, kind), marks in self.layers.items():
+            canvas = session.node(canvas)
+            state.layers[canvas, kind] = marks.copy(canvas)
+        return state
+
+
+class CanvasMarks:
+    """
+    Registry of marks drawn on :code:`canvas` elements (see
+    :code:`LiveSelection.select_all`). Marks live on the server as columns;
+    the client receives them as packed buffers and draws them on the canvas.
+
+    Once marks are created, this object can be used globally without further
+    configuration.
+    """
+
+    __state = MarksState()
+
+    @property
+    def _state(self) -> MarksState:
+        if (session := get_session()) is None:
+            return self.__state
+        return session.state(CanvasMarks, self.__state.fork)
+
+    def layer(self, canvas: etree.Element, kind: str) -> Marks:
+        """
+        Returns the marks of a kind drawn on a canvas, created if needed.
+
+        Parameters
+        ----------
+        canvas : etree.Element
+            Canvas element
+        kind : str
+            Kind of marks (:code:`"circle"` or :code:`"rect"`)
+
+        Returns
+        -------
+        Marks
+            Marks
+        """
+        layers = self._state.layers
+        if (marks := layers.get((canvas, kind))) is None:
+            marks = layers[canvas, kind] = Marks(canvas, kind)
+        return marks
+
+    def snapshot(self, root: etree.Element | None) -> list[dict[str, Any]]:
+        """
+        Returns operations which send all marks drawn on canvases of the
+        document; sent when a client connects.
+
+        Parameters
+        ----------
+        root : etree.Element | None
+            Root node of the document
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            Columnar operations
+        """
+        ttree = TrackingTree()
+        values = []
+        for (canvas, _), marks in self._state.layers.items():
+            if root is None or get_root(canvas) is not root:
+                continue
+            values.append(
+                {"elementId": ttree.get_reference(canvas), **marks.patch()}
+            )
+        return values
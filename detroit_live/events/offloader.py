@@ -0,0 +1,415 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Iterable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextvars import copy_context
+from copy import deepcopy
+from typing import Any, Optional, TypeVar
+
+from lxml import etree
+
+from ..timer import TimerEvent
+from .base import Event
+from .dirty_tracker import DirtyTracker
+from .session import Session, get_session
+from .spatial import GEOMETRY_KEYS, SpatialIndex
+from .tracking_tree import TrackingTree
+from .utils import get_attribute
+
+T = TypeVar("T")
+
+log = logging.getLogger(__name__)
+
+# Write of an attribute (or :code:`"innerHTML"`); :code:`None` removes it
+Write = tuple[etree.Element, str, str | None]
+
+
+def element_state(element: etree.Element) -> dict[str, str | None]:
+    """
+    Returns attributes of an element and the text of leaf elements as
+    :code:`"innerHTML"`.
+
+    Parameters
+    ----------
+    element : etree.Element
+        Element
+
+    Returns
+    -------
+    dict[str, str | None]
+        State of the element
+    """
+    state = dict(element.attrib)
+    if len(element) == 0:
+        state["innerHTML"] = get_attribute(element, "innerHTML")
+    return state
+
+
+class DetachedCall:
+    """
+    Picklable call of a listener against a serialized copy of its node, run
+    by process pools. The listener receives the copy of the node and must
+    write through it (e.g. :code:`d3.select(node).attr(...)`).
+
+    Parameters
+    ----------
+    listener : Callable[[Event, T | None, Optional[etree.Element]], None]
+        Listener function defined at the top level of a module
+    event : Event
+        Event
+    d : T | None
+        Data of the node
+    node : etree.Element
+        Node
+    """
+
+    def __init__(
+        self,
+        listener: Callable[[Event, T | None, Optional[etree.Element]], None],
+        event: Event,
+        d: T | None,
+        node: etree.Element,
+    ):
+        self._listener = listener
+        self._event = event
+        self._d = d
+        self._xml = etree.tostring(node, with_tail=False)
+
+    def __call__(self) -> list[tuple[int, str, str | None]]:
+        """
+        Calls the listener and returns changes of the elements of the node
+        subtree as :code:`(index, key, value)` where :code:`index` is the
+        position of the element in document order.
+
+        Returns
+        -------
+        list[tuple[int, str, str | None]]
+            Changes
+        """
+        node = etree.fromstring(self._xml)
+        olds = [element_state(element) for element in node.iter(etree.Element)]
+        self._listener(self._event, self._d, node)
+        changes = []
+        for index, (element, old) in enumerate(zip(node.iter(etree.Element), olds)):
+            new = element_state(element)
+            if new == old:
+                continue
+            for key in old.keys() | new.keys():
+                if (value := new.get(key)) != old.get(key):
+                    changes.append((index, key, value))
+        return changes
+
+
+class DetachedData(dict):
+    """
+    Data bound to nodes of a session used by a callback run in an executor.
+    Values are deep copied from the data of the document when they are first
+    read, hence the cost of a call depends on the data it reads only.
+    Iterating only yields values read so far.
+
+    Parameters
+    ----------
+    session : Session
+        Session
+    data : dict[etree.Element, Any]
+        Data bound to nodes of the document
+    memo : dict[int, Any]
+        Memo shared with the other copies of the call (see
+        :code:`copy.deepcopy`)
+    """
+
+    def __init__(
+        self, session: Session, data: dict[etree.Element, Any], memo: dict[int, Any]
+    ):
+        super().__init__()
+        self._session = session
+        self._source = data
+        self._memo = memo
+        self._dropped = set()
+
+    def __missing__(self, node: etree.Element) -> Any:
+        master = self._session.master(node)
+        if node in self._dropped or master not in self._source:
+            raise KeyError(node)
+        value = self[node] = deepcopy(self._source[master], self._memo)
+        return value
+
+    def __contains__(self, node: etree.Element) -> bool:
+        return super().__contains__(node) or (
+            node not in self._dropped and self._session.master(node) in self._source
+        )
+
+    def get(self, node: etree.Element, default: Any = None) -> Any:
+        return self[node] if node in self else default
+
+    def pop(self, node: etree.Element, *default: Any) -> Any:
+        if node not in self:
+            if default:
+                return default[0]
+            raise KeyError(node)
+        value = self[node]
+        del self[node]
+        self._dropped.add(node)
+        return value
+
+
+class OffloaderState:
+    """
+    State of :code:`Offloader`.
+
+    Attributes
+    ----------
+    data : dict[etree.Element, Any]
+        Data bound to nodes of the document
+    snapshot : Session | None
+        Copy of the document reused by successive calls
+    revision : int
+        Revision of the document when it was copied (see
+        :code:`TrackingTree.revision`)
+    busy : bool
+        :code:`True` while a call uses the copy
+    """
+
+    __slots__ = ("data", "snapshot", "revision", "busy")
+
+    def __init__(self):
+        self.data = {}
+        self.snapshot = None
+        self.revision = 0
+        self.busy = False
+
+    def fork(self, session: Session) -> "OffloaderState":
+        """
+        Returns a state for the session, bound to the data of the session.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        OffloaderState
+            Offloader state of the session
+        """
+        state = OffloaderState()
+        state.data = session.data
+        return state
+
+
+class Offloader:
+    """
+    Runs listeners and timer callbacks in executors against detached copies
+    of their inputs; attribute writes are then applied back on the event loop
+    as one batch.
+
+    * With a thread pool, the callback runs in a session (see
+      :code:`Session`) holding a copy of the document; selections captured
+      by the callback write into the copy. The copy is reused by successive
+      calls until the document is modified on the event loop (see
+      :code:`TrackingTree.revision`) and bound data are copied when first
+      read by the callback (see :code:`DetachedData`).
+    * With a process pool, only listeners are supported: they must be
+      picklable and receive a copy of their node subtree (see
+      :code:`DetachedCall`).
+
+    Structural edits (insertions, removals and moves) made in an executor are
+    not applied back.
+    """
+
+    __state = OffloaderState()
+
+    @property
+    def _state(self) -> OffloaderState:
+        if (session := get_session()) is None:
+            return self.__state
+        return session.state(Offloader, self.__state.fork)
+
+    def set_data(self, data: dict[etree.Element, Any]):
+        """
+        Sets the data bound to nodes of the document, copied with the
+        document for thread pools.
+
+        Parameters
+        ----------
+        data : dict[etree.Element, Any]
+            Data bound to nodes
+        """
+        self.__state.data = data
+
+    def listener(
+        self,
+        listener: Callable[[Event, T | None, Optional[etree.Element]], None],
+        executor: Executor,
+    ) -> Callable[[Event, T | None, Optional[etree.Element]], Awaitable[None]]:
+        """
+        Returns an asynchronous listener which runs :code:`listener` in
+        :code:`executor`.
+
+        Parameters
+        ----------
+        listener : Callable[[Event, T | None, Optional[etree.Element]], None]
+            Listener function
+        executor : Executor
+            Thread pool or process pool
+
+        Returns
+        -------
+        Callable[[Event, T | None, Optional[etree.Element]], Awaitable[None]]
+            Asynchronous listener
+        """
+        if isinstance(executor, ProcessPoolExecutor):
+
+            async def offloaded(event: Event, d: T | None, node: etree.Element):
+                loop = asyncio.get_running_loop()
+                job = DetachedCall(listener, event, d, node)
+                changes = await loop.run_in_executor(executor, job)
+                elements = list(node.iter(etree.Element))
+                self._write(
+                    (elements[index], key, value)
+                    for index, key, value in changes
+                    if index < len(elements)
+                )
+
+        else:
+
+            async def offloaded(event: Event, d: T | None, node: etree.Element):
+                await self._run(executor, listener, event, d, node)
+
+        return offloaded
+
+    def timer(
+        self,
+        callback: Callable[[float, TimerEvent], None],
+        executor: Executor,
+    ) -> Callable[[float, TimerEvent], Awaitable[None]]:
+        """
+        Returns an asynchronous timer callback which runs :code:`callback` in
+        :code:`executor`.
+
+        Parameters
+        ----------
+        callback : Callable[[float, TimerEvent], None]
+            Timer callback
+        executor : Executor
+            Thread pool
+
+        Returns
+        -------
+        Callable[[float, TimerEvent], Awaitable[None]]
+            Asynchronous timer callback
+        """
+        if isinstance(executor, ProcessPoolExecutor):
+            raise ValueError(
+                "Timer callbacks cannot run in a process pool, use a thread pool."
+            )
+
+        async def offloaded(elapsed: float, timer_event: TimerEvent):
+            await self._run(executor, callback, elapsed, timer_event)
+
+        return offloaded
+
+    async def _run(self, executor: Executor, callback: Callable[..., None], *args):
+        """
+        Runs the callback in a thread of :code:`executor` against a copy of
+        the document and of bound data, then applies its attribute writes.
+        """
+        state = self._state
+        ttree = TrackingTree()
+        # A fresh copy is made while the reusable one is used by another call
+        reuse = not state.busy
+        if reuse and (state.snapshot is None or state.revision != ttree.revision):
+            state.snapshot = self._snapshot()
+            state.revision = ttree.revision
+        session = state.snapshot if reuse else self._snapshot()
+        memo = {}
+        session.data = DetachedData(session, state.data, memo)
+
+        def detach(arg: Any) -> Any:
+            if isinstance(arg, etree._Element):
+                return session.node(arg)
+            if isinstance(arg, TimerEvent):
+                return arg
+            return deepcopy(arg, memo)
+
+        args = [detach(arg) for arg in args]
+
+        def job() -> tuple[list[Write], int]:
+            session.enter()
+            tracker = DirtyTracker()
+            try:
+                tracker.isolate()
+                tracker.start()
+                try:
+                    callback(*args)
+                finally:
+                    tracker.stop()
+                writes, operations = tracker.writes()
+            finally:
+                session.exit()
+            # Nodes created in the session have no counterpart in the document
+            masters = session.masters
+            writes = [
+                (masters[node], key, value)
+                for node, key, value in writes
+                if node in masters
+            ]
+            return writes, operations
+
+        loop = asyncio.get_running_loop()
+        if reuse:
+            state.busy = True
+        try:
+            writes, operations = await loop.run_in_executor(
+                executor, copy_context().run, job
+            )
+        except BaseException:
+            # Writes made before the failure are not applied to the document
+            if reuse:
+                state.snapshot = None
+            raise
+        finally:
+            if reuse:
+                state.busy = False
+        if operations:
+            log.warning(
+                f"{operations} structural edit(s) made in an executor are not "
+                "applied."
+            )
+            if reuse:
+                state.snapshot = None
+        # The copy already holds its writes unless the document was modified
+        # in the meantime
+        current = reuse and state.revision == ttree.revision
+        self._write(writes)
+        if current:
+            state.revision = ttree.revision
+
+    def _snapshot(self) -> Session:
+        """
+        Returns a session holding a copy of the document; its states are
+        forked on the event loop before the copy is handed over.
+        """
+        session = Session(TrackingTree().root, {})
+        session.enter()
+        try:
+            TrackingTree().fork(session)
+            DirtyTracker().enable()
+        finally:
+            session.exit()
+        return session
+
+    def _write(self, writes: Iterable[Write]):
+        tracker = DirtyTracker()
+        index = SpatialIndex()
+        for node, key, value in writes:
+            tracker.record([node], key)
+            if key in GEOMETRY_KEYS:
+                index.invalidate([node])
+            if key == "innerHTML":
+                node.text = value
+            elif value is None:
+                node.attrib.pop(key, None)
+            else:
+                node.set(key, value)
+        TrackingTree().touch()
@@ -0,0 +1,200 @@
+from collections.abc import Callable
+from contextvars import ContextVar
+from copy import copy, deepcopy
+from itertools import islice
+from typing import Any, TypeVar
+
+from lxml import etree
+
+T = TypeVar("T")
+
+_current_session: ContextVar["Session | None"] = ContextVar(
+    "detroit_live_session", default=None
+)
+
+
+def get_session() -> "Session | None":
+    """
+    Returns the session of the current websocket connection, if any.
+
+    Returns
+    -------
+    Session | None
+        Current session
+    """
+    return _current_session.get()
+
+
+class Session:
+    """
+    Session which isolates the document of a websocket connection: each
+    connection gets its own copy of the document, bound data, numeric ids,
+    listener states, timers and zoom and drag states.
+
+    Singletons (:code:`TrackingTree`, :code:`DirtyTracker`,
+    :code:`EventProducers`, ...) keep their global state outside of sessions;
+    inside a session, they fork it on first access through :code:`state`.
+
+    Objects owned by the user (data values, closures, simulations) are not
+    copied: data values are shared between sessions.
+
+    Parameters
+    ----------
+    root : etree.Element
+        Root node of the document
+    data : dict[etree.Element, Any]
+        Data bound to nodes
+    """
+
+    def __init__(self, root: etree.Element, data: dict[etree.Element, Any]):
+        self.root = deepcopy(root)
+        self.nodes = dict(zip(root.iter(), self.root.iter()))
+        self._copied = len(self.nodes)
+        self._masters = None
+        # Nested session: nodes of the document are mapped too
+        if (parent := _current_session.get()) is not None:
+            for node, copied in list(self.nodes.items()):
+                self.nodes.setdefault(parent.master(node), copied)
+        self.data = {self.node(node): value for node, value in data.items()}
+        self._source_data = data
+        self.timers = {}
+        self._states = {}
+        self._attributes = {}
+        self._token = None
+
+    @property
+    def masters(self) -> dict[etree.Element, etree.Element]:
+        """
+        Returns nodes of the document mapped by their session nodes; the
+        mapping is built on first access.
+
+        Returns
+        -------
+        dict[etree.Element, etree.Element]
+            Document nodes mapped by session nodes
+        """
+        if self._masters is None:
+            # Nodes mapped for nested sessions come after copied nodes
+            self._masters = {
+                node: master
+                for master, node in islice(self.nodes.items(), self._copied)
+            }
+        return self._masters
+
+    def node(self, node: T) -> T:
+        """
+        Returns the session node of the specified document node; nodes created
+        in the session are returned as is.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Node element
+
+        Returns
+        -------
+        etree.Element
+            Session node
+        """
+        return self.nodes.get(node, node)
+
+    def master(self, node: etree.Element) -> etree.Element:
+        """
+        Returns the document node of the specified session node.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Session node
+
+        Returns
+        -------
+        etree.Element
+            Document node
+        """
+        return self.masters.get(node, node)
+
+    def data_accessor(
+        self, data_accessor: Callable[[etree.Element], Any]
+    ) -> Callable[[etree.Element], Any]:
+        """
+        Returns the data accessor of the session given the data accessor of
+        the document.
+
+        Parameters
+        ----------
+        data_accessor : Callable[[etree.Element], Any]
+            Data accessor (e.g. :code:`data.get`)
+
+        Returns
+        -------
+        Callable[[etree.Element], Any]
+            Data accessor which reads data bound to nodes of the session
+        """
+        if getattr(data_accessor, "__self__", None) is self._source_data:
+            return self.data.get
+        return data_accessor
+
+    def state(self, key: Any, fork: Callable[["Session"], T]) -> T:
+        """
+        Returns the state of a singleton in this session; the state is forked
+        from the global state on first access.
+
+        Parameters
+        ----------
+        key : Any
+            Key of the singleton
+        fork : Callable[[Session], T]
+            Function which forks the global state for this session
+
+        Returns
+        -------
+        T
+            State of the singleton
+        """
+        if (state := self._states.get(key)) is None:
+            state = self._states[key] = fork(self)
+        return state
+
+    def enter(self):
+        """
+        Makes this session the session of the current context.
+        """
+        self._token = _current_session.set(self)
+
+    def exit(self):
+        """
+        Restores the previous session of the current context.
+        """
+        if self._token is not None:
+            _current_session.reset(self._token)
+            self._token = None
+
+
+class SessionAttribute:
+    """
+    Descriptor of an attribute whose value is specific to each session
+    (e.g. states of gestures). Outside of sessions, it behaves as a regular
+    attribute; inside a session, the value is copied from the regular
+    attribute on first access.
+    """
+
+    def __set_name__(self, owner: type, name: str):
+        self._name = name
+
+    def __get__(self, obj: Any, objtype: type | None = None) -> Any:
+        if obj is None:
+            return self
+        if (session := _current_session.get()) is None:
+            return obj.__dict__[self._name]
+        key = (id(obj), self._name)
+        attributes = session._attributes
+        if key not in attributes:
+            attributes[key] = copy(obj.__dict__[self._name])
+        return attributes[key]
+
+    def __set__(self, obj: Any, value: Any):
+        if (session := _current_session.get()) is None:
+            obj.__dict__[self._name] = value
+        else:
+            session._attributes[(id(obj), self._name)] = value
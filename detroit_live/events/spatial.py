@@ -0,0 +1,1066 @@
+import heapq
+import math
+import re
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from lxml import etree
+
+from .session import Session, get_session
+from .tracking_tree import TrackingTree
+from .utils import get_root
+
+# Attributes which change the geometry of an element in its parent coordinates
+GEOMETRY_KEYS = frozenset(
+    {"cx", "cy", "r", "rx", "ry", "x", "y", "width", "height", "d", "points"}
+    | {"x1", "y1", "x2", "y2", "transform"}
+)
+
+# Maximum number of items of a leaf before it is split
+CAPACITY = 8
+MAX_DEPTH = 16
+# Number of segments used to flatten each curve of a path
+CURVE_SEGMENTS = 8
+
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+TRANSFORM = re.compile(r"(\w+)\s*\(([^)]*)\)")
+PATH_TOKEN = re.compile(
+    r"([MmLlHhVvCcSsQqTtAaZz])|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+)
+PATH_ARITY = {
+    "M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7, "Z": 0
+}  # fmt: skip
+
+# Affine matrix :code:`(a, b, c, d, e, f)` as in SVG
+Matrix = tuple[float, float, float, float, float, float]
+Box = tuple[float, float, float, float]
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def multiply(m: Matrix, n: Matrix) -> Matrix:
+    """
+    Returns the product :math:`m \\times n` of two affine matrices.
+
+    Parameters
+    ----------
+    m : Matrix
+        Left matrix
+    n : Matrix
+        Right matrix
+
+    Returns
+    -------
+    Matrix
+        Product
+    """
+    a, b, c, d, e, f = m
+    na, nb, nc, nd, ne, nf = n
+    return (
+        a * na + c * nb,
+        b * na + d * nb,
+        a * nc + c * nd,
+        b * nc + d * nd,
+        a * ne + c * nf + e,
+        b * ne + d * nf + f,
+    )
+
+
+def invert(m: Matrix) -> Matrix | None:
+    """
+    Returns the inverse of an affine matrix; :code:`None` when it is not
+    invertible.
+
+    Parameters
+    ----------
+    m : Matrix
+        Matrix
+
+    Returns
+    -------
+    Matrix | None
+        Inverse matrix
+    """
+    a, b, c, d, e, f = m
+    det = a * d - b * c
+    if det == 0:
+        return None
+    return (
+        d / det,
+        -b / det,
+        -c / det,
+        a / det,
+        (c * f - d * e) / det,
+        (b * e - a * f) / det,
+    )
+
+
+def apply(m: Matrix, x: float, y: float) -> tuple[float, float]:
+    """
+    Applies an affine matrix on a point.
+
+    Parameters
+    ----------
+    m : Matrix
+        Matrix
+    x : float
+        X-coordinate
+    y : float
+        Y-coordinate
+
+    Returns
+    -------
+    tuple[float, float]
+        Transformed point
+    """
+    a, b, c, d, e, f = m
+    return a * x + c * y + e, b * x + d * y + f
+
+
+def parse_transform(transform: str | None) -> Matrix:
+    """
+    Returns the matrix of a :code:`transform` attribute (:code:`translate`,
+    :code:`scale`, :code:`rotate`, :code:`skewX`, :code:`skewY` and
+    :code:`matrix`).
+
+    Parameters
+    ----------
+    transform : str | None
+        Value of the :code:`transform` attribute
+
+    Returns
+    -------
+    Matrix
+        Matrix of the transformation
+
+    Examples
+    --------
+
+    >>> parse_transform("translate(10, 20) scale(2)")
+    (2.0, 0.0, 0.0, 2.0, 10.0, 20.0)
+    """
+    matrix = IDENTITY
+    if not transform:
+        return matrix
+    for name, arguments in TRANSFORM.findall(transform):
+        values = [float(value) for value in NUMBER.findall(arguments)]
+        match name, values:
+            case "translate", [tx]:
+                current = (1.0, 0.0, 0.0, 1.0, tx, 0.0)
+            case "translate", [tx, ty]:
+                current = (1.0, 0.0, 0.0, 1.0, tx, ty)
+            case "scale", [k]:
+                current = (k, 0.0, 0.0, k, 0.0, 0.0)
+            case "scale", [kx, ky]:
+                current = (kx, 0.0, 0.0, ky, 0.0, 0.0)
+            case "rotate", [angle, *center]:
+                cos = math.cos(math.radians(angle))
+                sin = math.sin(math.radians(angle))
+                current = (cos, sin, -sin, cos, 0.0, 0.0)
+                if len(center) == 2:
+                    cx, cy = center
+                    current = multiply(
+                        multiply((1.0, 0.0, 0.0, 1.0, cx, cy), current),
+                        (1.0, 0.0, 0.0, 1.0, -cx, -cy),
+                    )
+            case "skewX", [angle]:
+                current = (1.0, 0.0, math.tan(math.radians(angle)), 1.0, 0.0, 0.0)
+            case "skewY", [angle]:
+                current = (1.0, math.tan(math.radians(angle)), 0.0, 1.0, 0.0, 0.0)
+            case "matrix", [a, b, c, d, e, f]:
+                current = (a, b, c, d, e, f)
+            case _:
+                continue
+        matrix = multiply(matrix, current)
+    return matrix
+
+
+def _arc(
+    x0: float,
+    y0: float,
+    rx: float,
+    ry: float,
+    angle: float,
+    large: float,
+    sweep: float,
+    x1: float,
+    y1: float,
+) -> list[tuple[float, float]]:
+    """
+    Flattens an elliptical arc given in endpoint parameterization (see
+    SVG implementation notes) into points, the start point excluded.
+    """
+    rx = abs(rx)
+    ry = abs(ry)
+    if rx == 0 or ry == 0 or (x0 == x1 and y0 == y1):
+        return [(x1, y1)]
+    phi = math.radians(angle)
+    cos = math.cos(phi)
+    sin = math.sin(phi)
+    dx = (x0 - x1) / 2
+    dy = (y0 - y1) / 2
+    px = cos * dx + sin * dy
+    py = -sin * dx + cos * dy
+    scale = (px * px) / (rx * rx) + (py * py) / (ry * ry)
+    if scale > 1:
+        rx *= math.sqrt(scale)
+        ry *= math.sqrt(scale)
+    numerator = rx * rx * ry * ry - rx * rx * py * py - ry * ry * px * px
+    denominator = rx * rx * py * py + ry * ry * px * px
+    factor = math.sqrt(max(0.0, numerator / denominator))
+    if bool(large) == bool(sweep):
+        factor = -factor
+    cpx = factor * rx * py / ry
+    cpy = -factor * ry * px / rx
+    cx = cos * cpx - sin * cpy + (x0 + x1) / 2
+    cy = sin * cpx + cos * cpy + (y0 + y1) / 2
+    start = math.atan2((py - cpy) / ry, (px - cpx) / rx)
+    delta = math.atan2((-py - cpy) / ry, (-px - cpx) / rx) - start
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    segments = max(1, math.ceil(abs(delta) / (math.pi / 8)))
+    points = []
+    for i in range(1, segments + 1):
+        theta = start + delta * i / segments
+        ex = rx * math.cos(theta)
+        ey = ry * math.sin(theta)
+        points.append((cos * ex - sin * ey + cx, sin * ex + cos * ey + cy))
+    points[-1] = (x1, y1)
+    return points
+
+
+def _bezier(points: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    """
+    Flattens a quadratic or cubic Bézier curve into points, the start point
+    excluded.
+    """
+    flattened = []
+    for i in range(1, CURVE_SEGMENTS + 1):
+        t = i / CURVE_SEGMENTS
+        current = points
+        while len(current) > 1:
+            current = [
+                (ax + (bx - ax) * t, ay + (by - ay) * t)
+                for (ax, ay), (bx, by) in zip(current, current[1:])
+            ]
+        flattened.append(current[0])
+    return flattened
+
+
+def parse_path(d: str | None) -> list[list[tuple[float, float]]]:
+    """
+    Returns the subpaths of the :code:`d` attribute of a path as lists of
+    points; curves and arcs are flattened.
+
+    Parameters
+    ----------
+    d : str | None
+        Path data
+
+    Returns
+    -------
+    list[list[tuple[float, float]]]
+        Flattened subpaths
+    """
+    tokens = PATH_TOKEN.findall(d or "")
+    rings = []
+    ring = []
+    x = y = 0.0
+    start = (0.0, 0.0)
+    # Last control points of cubic and quadratic curves, for reflections
+    cubic = quadratic = None
+    command = None
+    i = 0
+    while i < len(tokens):
+        letter, _ = tokens[i]
+        if letter:
+            command = letter
+            i += 1
+        elif command is None:
+            i += 1
+            continue
+        upper = command.upper()
+        arity = PATH_ARITY[upper]
+        arguments = [float(number) for _, number in tokens[i : i + arity]]
+        if any(letter for letter, _ in tokens[i : i + arity]) or len(
+            arguments
+        ) < arity:
+            break
+        i += arity
+        if command.islower() and upper in ("M", "L", "C", "S", "Q", "T"):
+            arguments = [
+                value + (x if j % 2 == 0 else y) for j, value in enumerate(arguments)
+            ]
+        previous_cubic, previous_quadratic = cubic, quadratic
+        cubic = quadratic = None
+        match upper:
+            case "M":
+                if len(ring) > 1:
+                    rings.append(ring)
+                x, y = arguments
+                start = (x, y)
+                ring = [start]
+                # Following pairs are implicit lineto commands
+                command = "l" if command.islower() else "L"
+                continue
+            case "Z":
+                if len(ring) > 1:
+                    rings.append(ring)
+                x, y = start
+                ring = [start]
+                command = None
+                continue
+            case "L":
+                x, y = arguments
+                ring.append((x, y))
+                continue
+            case "H":
+                x = arguments[0] + (x if command.islower() else 0)
+                ring.append((x, y))
+                continue
+            case "V":
+                y = arguments[0] + (y if command.islower() else 0)
+                ring.append((x, y))
+                continue
+            case "C":
+                x1, y1, x2, y2, ex, ey = arguments
+                points = [(x, y), (x1, y1), (x2, y2), (ex, ey)]
+                cubic = (x2, y2)
+            case "S":
+                x2, y2, ex, ey = arguments
+                x1, y1 = previous_cubic or (x, y)
+                points = [(x, y), (2 * x - x1, 2 * y - y1), (x2, y2), (ex, ey)]
+                cubic = (x2, y2)
+            case "Q":
+                x1, y1, ex, ey = arguments
+                points = [(x, y), (x1, y1), (ex, ey)]
+                quadratic = (x1, y1)
+            case "T":
+                ex, ey = arguments
+                x1, y1 = previous_quadratic or (x, y)
+                quadratic = (2 * x - x1, 2 * y - y1)
+                points = [(x, y), quadratic, (ex, ey)]
+            case _:
+                rx, ry, angle, large, sweep, ex, ey = arguments
+                if command.islower():
+                    ex += x
+                    ey += y
+                ring.extend(_arc(x, y, rx, ry, angle, large, sweep, ex, ey))
+                x, y = ex, ey
+                continue
+        ring.extend(_bezier(points))
+        x, y = ex, ey
+    if len(ring) > 1:
+        rings.append(ring)
+    return rings
+
+
+def geometry(node: etree.Element) -> tuple[str, Any, Box] | None:
+    """
+    Returns the filled geometry of a circle, an ellipse, a rectangle, a
+    polygon, a polyline or a path in its own coordinates as
+    :code:`(kind, parameters, box)`; :code:`None` for other elements.
+
+    Parameters
+    ----------
+    node : etree.Element
+        Node element
+
+    Returns
+    -------
+    tuple[str, Any, Box] | None
+        Geometry and bounding box
+    """
+    tag = etree.QName(node).localname if isinstance(node.tag, str) else None
+
+    def number(key: str) -> float:
+        return float(node.get(key) or 0)
+
+    try:
+        match tag:
+            case "circle":
+                cx, cy, r = number("cx"), number("cy"), number("r")
+                return "circle", (cx, cy, r), (cx - r, cy - r, cx + r, cy + r)
+            case "ellipse":
+                cx, cy, rx, ry = number("cx"), number("cy"), number("rx"), number("ry")
+                return (
+                    "ellipse",
+                    (cx, cy, rx, ry),
+                    (cx - rx, cy - ry, cx + rx, cy + ry),
+                )
+            case "rect":
+                x, y = number("x"), number("y")
+                box = (x, y, x + number("width"), y + number("height"))
+                return "rect", box, box
+            case "polygon" | "polyline":
+                points = NUMBER.findall(node.get("points", ""))
+                values = [float(value) for value in points]
+                rings = [list(zip(values[::2], values[1::2]))]
+            case "path":
+                rings = parse_path(node.get("d"))
+            case _:
+                return None
+    except ValueError:  # Lengths with units or percentages
+        return None
+    points = [point for ring in rings for point in ring]
+    if not points:
+        return None
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    return "polygon", rings, (min(xs), min(ys), max(xs), max(ys))
+
+
+def contains(kind: str, parameters: Any, x: float, y: float) -> bool:
+    """
+    Returns :code:`True` if the point is inside the geometry; polygons use
+    the even-odd rule.
+
+    Parameters
+    ----------
+    kind : str
+        Kind of geometry (see :code:`geometry`)
+    parameters : Any
+        Parameters of the geometry
+    x : float
+        X-coordinate
+    y : float
+        Y-coordinate
+
+    Returns
+    -------
+    bool
+        :code:`True` if inside
+    """
+    match kind:
+        case "circle":
+            cx, cy, r = parameters
+            return (x - cx) ** 2 + (y - cy) ** 2 <= r * r
+        case "ellipse":
+            cx, cy, rx, ry = parameters
+            if rx <= 0 or ry <= 0:
+                return False
+            return ((x - cx) / rx) ** 2 + ((y - cy) / ry) ** 2 <= 1
+        case "rect":
+            x0, y0, x1, y1 = parameters
+            return x0 <= x <= x1 and y0 <= y <= y1
+        case _:
+            inside = False
+            for ring in parameters:
+                x0, y0 = ring[-1]
+                for x1, y1 in ring:
+                    if (y1 > y) != (y0 > y) and x < (x0 - x1) * (y - y1) / (
+                        y0 - y1
+                    ) + x1:
+                        inside = not inside
+                    x0, y0 = x1, y1
+            return inside
+
+
+def transform_box(matrix: Matrix, box: Box) -> Box:
+    """
+    Returns the bounding box of a transformed box.
+
+    Parameters
+    ----------
+    matrix : Matrix
+        Matrix
+    box : Box
+        Box :code:`(x0, y0, x1, y1)`
+
+    Returns
+    -------
+    Box
+        Bounding box of the transformed box
+    """
+    if matrix == IDENTITY:
+        return box
+    x0, y0, x1, y1 = box
+    corners = [apply(matrix, x, y) for x, y in ((x0, y0), (x1, y0), (x0, y1), (x1, y1))]
+    xs = [x for x, _ in corners]
+    ys = [y for _, y in corners]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def distance_2(box: Box, x: float, y: float) -> float:
+    """
+    Returns the squared distance between a point and a bounding box.
+
+    Parameters
+    ----------
+    box : Box
+        Bounding box :code:`(x0, y0, x1, y1)`
+    x : float
+        X-coordinate
+    y : float
+        Y-coordinate
+
+    Returns
+    -------
+    float
+        Squared distance, zero when the box contains the point
+    """
+    x0, y0, x1, y1 = box
+    dx = max(x0 - x, 0.0, x - x1)
+    dy = max(y0 - y, 0.0, y - y1)
+    return dx * dx + dy * dy
+
+
+class Quad:
+    __slots__ = "x0", "y0", "size", "items", "children"
+
+    def __init__(self, x0: float, y0: float, size: float):
+        self.x0 = x0
+        self.y0 = y0
+        self.size = size
+        self.items = {}
+        self.children = None
+
+    def covers(self, box: Box) -> bool:
+        x0, y0, x1, y1 = box
+        return (
+            x0 >= self.x0
+            and y0 >= self.y0
+            and x1 < self.x0 + self.size
+            and y1 < self.y0 + self.size
+        )
+
+    def child(self, box: Box) -> "Quad | None":
+        """
+        Returns the child which contains the box entirely, if any.
+        """
+        half = self.size / 2
+        xm = self.x0 + half
+        ym = self.y0 + half
+        x0, y0, x1, y1 = box
+        if x1 < xm:
+            i = 0
+        elif x0 >= xm:
+            i = 1
+        else:
+            return None
+        if y1 < ym:
+            return self.children[i]
+        elif y0 >= ym:
+            return self.children[i + 2]
+        return None
+
+    def child_at(self, x: float, y: float) -> "Quad":
+        half = self.size / 2
+        return self.children[(x >= self.x0 + half) + 2 * (y >= self.y0 + half)]
+
+    def split(self, quads: dict[Any, "Quad"]):
+        half = self.size / 2
+        self.children = [
+            Quad(self.x0 + dx * half, self.y0 + dy * half, half)
+            for dy in (0, 1)
+            for dx in (0, 1)
+        ]
+        items = self.items
+        self.items = {}
+        for item, box in items.items():
+            quad = self.child(box) or self
+            quad.items[item] = box
+            quads[item] = quad
+
+
+class Quadtree:
+    """
+    Quadtree of bounding boxes: each box is stored in the smallest quadrant
+    which contains it entirely, so that items can be moved without
+    rebuilding the tree. The extent grows when a box falls outside of it.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._quads = {}
+        self._boxes = {}
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    @property
+    def extent(self) -> Box | None:
+        """
+        Returns the extent of the tree, which contains all bounding boxes.
+
+        Returns
+        -------
+        Box | None
+            Extent :code:`(x0, y0, x1, y1)`; :code:`None` when empty
+        """
+        if (root := self._root) is None:
+            return None
+        return root.x0, root.y0, root.x0 + root.size, root.y0 + root.size
+
+    def insert(self, item: Any, box: Box):
+        """
+        Inserts or moves an item.
+
+        Parameters
+        ----------
+        item : Any
+            Hashable item
+        box : Box
+            Bounding box :code:`(x0, y0, x1, y1)`
+        """
+        quad = self._quads.get(item)
+        if quad is not None and quad.children is None and quad.covers(box):
+            # Small moves of items stay in their leaf
+            quad.items[item] = self._boxes[item] = box
+            return
+        self.remove(item)
+        self._boxes[item] = box
+        if self._root is None or not self._root.covers(box):
+            self._rebuild()
+        else:
+            self._place(item, box)
+
+    def load(self, boxes: dict[Any, Box]):
+        """
+        Replaces all items at once, building the tree a single time.
+
+        Parameters
+        ----------
+        boxes : dict[Any, Box]
+            Bounding box :code:`(x0, y0, x1, y1)` of each item
+        """
+        self._boxes = dict(boxes)
+        self._quads = {}
+        self._root = None
+        if self._boxes:
+            self._rebuild()
+
+    def remove(self, item: Any):
+        """
+        Removes an item if it exists.
+
+        Parameters
+        ----------
+        item : Any
+            Item
+        """
+        if (quad := self._quads.pop(item, None)) is not None:
+            del quad.items[item]
+            del self._boxes[item]
+
+    def query(self, x: float, y: float) -> Iterator[Any]:
+        """
+        Returns items whose bounding box contains the point.
+
+        Parameters
+        ----------
+        x : float
+            X-coordinate
+        y : float
+            Y-coordinate
+
+        Returns
+        -------
+        Iterator[Any]
+            Items
+        """
+        quad = self._root
+        if quad is None or not quad.covers((x, y, x, y)):
+            return
+        while quad is not None:
+            for item, (x0, y0, x1, y1) in quad.items.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    yield item
+            quad = None if quad.children is None else quad.child_at(x, y)
+
+    def nearest(
+        self, x: float, y: float, radius: float | None = None
+    ) -> Any | None:
+        """
+        Returns the item whose bounding box is the closest to the point, by
+        visiting quadrants from the closest one.
+
+        Parameters
+        ----------
+        x : float
+            X-coordinate
+        y : float
+            Y-coordinate
+        radius : float | None
+            Search radius; unbounded by default
+
+        Returns
+        -------
+        Any | None
+            Closest item within the radius if any
+        """
+        if self._root is None:
+            return None
+        best = math.inf if radius is None else radius * radius
+        closest = None
+        heap = [(0.0, 0, self._root)]
+        count = 1
+        while heap:
+            distance, _, quad = heapq.heappop(heap)
+            if distance >= best:
+                break
+            for item, box in quad.items.items():
+                if (distance := distance_2(box, x, y)) < best:
+                    best = distance
+                    closest = item
+            if quad.children is None:
+                continue
+            for child in quad.children:
+                box = (child.x0, child.y0, child.x0 + child.size, child.y0 + child.size)
+                if (distance := distance_2(box, x, y)) < best:
+                    heapq.heappush(heap, (distance, count, child))
+                    count += 1
+        return closest
+
+    def _rebuild(self):
+        boxes = self._boxes.values()
+        x0 = min(box[0] for box in boxes)
+        y0 = min(box[1] for box in boxes)
+        size = max(
+            max(box[2] for box in boxes) - x0,
+            max(box[3] for box in boxes) - y0,
+            1.0,
+        )
+        # Margins amortize rebuilds of growing extents
+        self._root = Quad(x0 - size / 2, y0 - size / 2, size * 2)
+        self._quads = {}
+        for item, box in self._boxes.items():
+            self._place(item, box)
+
+    def _place(self, item: Any, box: Box):
+        quad = self._root
+        depth = 0
+        while True:
+            if quad.children is None:
+                if len(quad.items) < CAPACITY or depth >= MAX_DEPTH:
+                    break
+                quad.split(self._quads)
+            if (child := quad.child(box)) is None:
+                break
+            quad = child
+            depth += 1
+        quad.items[item] = box
+        self._quads[item] = quad
+
+
+class SpatialState:
+    """
+    Shared state of :code:`SpatialIndex`.
+
+    Attributes
+    ----------
+    shapes : dict[etree.Element, tuple | None]
+        Indexed nodes mapped to their parent node, inverse matrix and
+        geometry; :code:`None` until computed
+    layers : dict[etree.Element, Quadtree]
+        Quadtrees of bounding boxes in coordinates of parent nodes
+    dirty : set[etree.Element]
+        Indexed nodes whose geometry must be computed again
+    surface : tuple[int, etree.Element | None] | None
+        Surface element and revision of the structure of the document when
+        it was found (see :code:`TrackingTree.structure`)
+    frames : dict[etree.Element, tuple]
+        Parent nodes mapped to the revision of the document and the extent of
+        their quadtree when computed, the inverse matrix from coordinates of
+        the surface and the extent of their quadtree in coordinates of the
+        surface
+    """
+
+    __slots__ = "shapes", "layers", "dirty", "surface", "frames"
+
+    def __init__(self):
+        self.shapes = {}
+        self.layers = {}
+        self.dirty = set()
+        self.surface = None
+        self.frames = {}
+
+    def fork(self, session: Session) -> "SpatialState":
+        """
+        Returns a state indexing the same nodes of the session; geometries
+        are computed on the next query.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        SpatialState
+            Spatial state of the session
+        """
+        state = SpatialState()
+        state.shapes = {session.node(node): None for node in self.shapes}
+        state.dirty = set(state.shapes)
+        return state
+
+
+class SpatialIndex:
+    """
+    Server-side spatial index over the geometry of circles, ellipses,
+    rectangles, polygons, polylines and paths, which resolves the target of
+    mouse events from their coordinates only.
+
+    Nodes are indexed in quadtrees, one per parent node, in the coordinates
+    of their parent: transformations of containers (e.g. zoom) are applied on
+    the pointer at query time instead of moving every box. Writes of geometry
+    attributes through :code:`LiveSelection` mark nodes as dirty; their
+    geometry is computed again on the next query.
+
+    Hit testing follows the fill of elements (strokes are ignored), curves
+    and arcs of paths are flattened. When several elements contain the
+    pointer, the last one in document order (painted on top) is the target;
+    elements with :code:`pointer-events="none"` or :code:`display="none"`
+    are skipped.
+
+    Once nodes are added, this object can be used globally without further
+    configuration.
+    """
+
+    __state = SpatialState()
+
+    @property
+    def _state(self) -> SpatialState:
+        if (session := get_session()) is None:
+            return self.__state
+        return session.state(SpatialIndex, self.__state.fork)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Returns :code:`True` if at least one node is indexed.
+
+        Returns
+        -------
+        bool
+            Index status
+        """
+        return bool(self._state.shapes)
+
+    def __contains__(self, node: etree.Element) -> bool:
+        return node in self._state.shapes
+
+    def add(self, nodes: Iterable[etree.Element]):
+        """
+        Adds nodes to the index.
+
+        Parameters
+        ----------
+        nodes : Iterable[etree.Element]
+            Node elements
+        """
+        state = self._state
+        for node in nodes:
+            state.shapes.setdefault(node, None)
+            state.dirty.add(node)
+
+    def discard(self, nodes: Iterable[etree.Element]):
+        """
+        Removes nodes from the index.
+
+        Parameters
+        ----------
+        nodes : Iterable[etree.Element]
+            Node elements
+        """
+        state = self._state
+        for node in nodes:
+            if (shape := state.shapes.pop(node, None)) is not None:
+                state.layers[shape[0]].remove(node)
+            state.dirty.discard(node)
+
+    def clear(self):
+        """
+        Removes all nodes from the index.
+        """
+        state = self._state
+        state.shapes.clear()
+        state.layers.clear()
+        state.dirty.clear()
+        state.frames.clear()
+
+    def invalidate(self, nodes: Iterable[etree.Element]):
+        """
+        Marks the geometry of indexed nodes as outdated.
+
+        Parameters
+        ----------
+        nodes : Iterable[etree.Element]
+            Written nodes
+        """
+        state = self._state
+        shapes = state.shapes
+        state.dirty.update(node for node in nodes if node in shapes)
+
+    def surface(self) -> etree.Element | None:
+        """
+        Returns the SVG element in whose coordinates pointers are sent by the
+        client (the first :code:`svg` element of the document). It is searched
+        again after structural edits only.
+
+        Returns
+        -------
+        etree.Element | None
+            SVG element
+        """
+        state = self._state
+        ttree = TrackingTree()
+        structure = ttree.structure
+        if state.surface is not None and state.surface[0] == structure:
+            return state.surface[1]
+        surface = None
+        if (root := ttree.root) is not None:
+            surface = next(
+                (
+                    node
+                    for node in root.iter(etree.Element)
+                    if etree.QName(node).localname == "svg"
+                ),
+                None,
+            )
+        state.surface = (structure, surface)
+        return surface
+
+    def resolves(self, nodes: Iterable[etree.Element]) -> bool:
+        """
+        Returns :code:`True` if the targets of events can be resolved by the
+        index only: all nodes are indexed or are the surface (see
+        :code:`surface`).
+
+        Parameters
+        ----------
+        nodes : Iterable[etree.Element]
+            Nodes having listeners
+
+        Returns
+        -------
+        bool
+            :code:`True` if resolved by coordinates
+        """
+        if not self.enabled:
+            return False
+        surface = self.surface()
+        return all(node in self or node is surface for node in nodes)
+
+    def find(self, x: float, y: float) -> etree.Element | None:
+        """
+        Returns the topmost indexed node which contains the point, given in
+        coordinates of the surface (see :code:`surface`).
+
+        Parameters
+        ----------
+        x : float
+            X-coordinate
+        y : float
+            Y-coordinate
+
+        Returns
+        -------
+        etree.Element | None
+            Node element if found
+        """
+        self._update()
+        state = self._state
+        surface = self.surface()
+        revision = TrackingTree().revision
+        frames = state.frames
+        hits = []
+        for parent, layer in list(state.layers.items()):
+            if not len(layer):
+                continue
+            extent = layer.extent
+            frame = frames.get(parent)
+            if frame is None or frame[0] != revision or frame[1] != extent:
+                frame = frames[parent] = (
+                    revision,
+                    extent,
+                    *self._frame(parent, surface, extent),
+                )
+            _, _, matrix, (x0, y0, x1, y1) = frame
+            # Layers whose extent does not contain the point are skipped
+            if matrix is None or not (x0 <= x <= x1 and y0 <= y <= y1):
+                continue
+            px, py = apply(matrix, x, y)
+            for node in layer.query(px, py):
+                _, inverse, kind, parameters = state.shapes[node]
+                if node.getparent() is not parent:  # Moved or removed since
+                    state.dirty.add(node)
+                    continue
+                if (
+                    node.get("pointer-events") == "none"
+                    or node.get("display") == "none"
+                ):
+                    continue
+                if contains(kind, parameters, *apply(inverse, px, py)):
+                    hits.append(node)
+        if state.dirty:
+            return self.find(x, y)
+        if len(hits) > 1:
+            return max(hits, key=self._order)
+        return hits[0] if hits else None
+
+    def _update(self):
+        """
+        Computes again the geometry of dirty nodes.
+        """
+        state = self._state
+        if not state.dirty:
+            return
+        ttree = TrackingTree()
+        dirty = state.dirty
+        state.dirty = set()
+        for node in dirty:
+            if (shape := state.shapes.get(node)) is not None:
+                state.layers[shape[0]].remove(node)
+            if node not in state.shapes:
+                continue
+            parent = node.getparent()
+            if parent is None or get_root(parent) is not ttree.root:
+                # Detached nodes are indexed again once inserted
+                state.shapes[node] = None
+                continue
+            matrix = parse_transform(node.get("transform"))
+            if (found := geometry(node)) is None or (
+                inverse := invert(matrix)
+            ) is None:
+                state.shapes[node] = None
+                continue
+            kind, parameters, box = found
+            state.shapes[node] = (parent, inverse, kind, parameters)
+            state.layers.setdefault(parent, Quadtree()).insert(
+                node, transform_box(matrix, box)
+            )
+
+    @staticmethod
+    def _frame(
+        parent: etree.Element, surface: etree.Element | None, extent: Box
+    ) -> tuple[Matrix | None, Box]:
+        """
+        Returns the inverse matrix from coordinates of the surface to
+        coordinates of :code:`parent` and the extent in coordinates of the
+        surface; the matrix is :code:`None` when :code:`parent` is outside of
+        the surface.
+        """
+        matrix = IDENTITY
+        node = parent
+        while node is not surface:
+            if node is None:
+                return None, extent
+            matrix = multiply(parse_transform(node.get("transform")), matrix)
+            node = node.getparent()
+        return invert(matrix), transform_box(matrix, extent)
+
+    @staticmethod
+    def _order(node: etree.Element) -> list[int]:
+        """
+        Returns the position of the node in document order.
+        """
+        order = []
+        parent = node.getparent()
+        while parent is not None:
+            order.append(parent.index(node))
+            node = parent
+            parent = node.getparent()
+        return order[::-1]
@@ -1,11 +1,18 @@
 import logging
+import re
+from collections.abc import Iterable
+from itertools import islice, zip_longest
 
 from lxml import etree
 
-from .utils import get_root
+from .session import Session, get_session
+from .utils import NODE_ID, get_root, xpath_to_query_selector
 
 log = logging.getLogger(__name__)
 
+# Step of a path such as `g` or `g[2]`
+PATH_STEP = re.compile(r"([^\[\]/]+)(?:\[(\d+)\])?")
+
 
 class CacheTree:
     __slots__ = "__root", "__tree"
@@ -25,22 +32,155 @@ class CacheTree:
         return self.__tree
 
 
+class CacheIds:
+    __slots__ = "enabled", "count", "ids", "nodes"
+
+    def __init__(self):
+        self.enabled = False
+        self.count = 0
+        self.ids = {}
+        self.nodes = {}
+
+    def clear(self):
+        self.count = 0
+        self.ids.clear()
+        self.nodes.clear()
+
+
+class CacheIndex:
+    """
+    Positional indexes of the tree: children of each parent grouped by tags
+    in document order, built lazily and updated after structural edits, and
+    paths of nodes relative to the root (without the index of unique
+    steps).
+    """
+
+    __slots__ = "children", "positions", "inner", "keys", "hits", "misses", "rebuilds"
+
+    def __init__(self):
+        self.children = {}
+        self.positions = {}
+        self.inner = {}
+        self.keys = {}
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+
+    def clear(self):
+        self.children.clear()
+        self.positions.clear()
+        self.inner.clear()
+        self.keys.clear()
+
+
+class TreeState:
+    __slots__ = "tree", "path", "node", "ids", "index", "revision", "structure"
+
+    def __init__(self):
+        self.tree = CacheTree()
+        self.path = {}
+        self.node = {}
+        self.ids = CacheIds()
+        self.index = CacheIndex()
+        self.revision = 0
+        self.structure = 0
+
+    def fork(self, session: Session) -> "TreeState":
+        """
+        Returns a copy of this state for the document of the session; numeric
+        ids are kept.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        TreeState
+            Tree state of the session
+        """
+        state = TreeState()
+        state.tree.set_root(session.root)
+        root = state.tree.get_root()
+        state.path[root] = root.tag
+        state.ids.enabled = self.ids.enabled
+        state.ids.count = self.ids.count
+        for node, node_id in self.ids.ids.items():
+            node = session.node(node)
+            state.ids.ids[node] = node_id
+            state.ids.nodes[node_id] = node
+        return state
+
+
 class TrackingTree:
     """
     Tracking Tree object which helps to get :code:`etree.Element` given a path
-    (example : `body/g/g[1]/rect[8]`) and vice-versa.
+    (example : `body/g/g[1]/rect[8]`) or a numeric id and vice-versa.
+
+    Paths are resolved with positional indexes (children of each parent
+    grouped by tags) instead of XPath queries. Structural edits of
+    :code:`LiveSelection` update these indexes and only forget cached paths
+    of nodes whose position changed (see :code:`insert`, :code:`update` and
+    :code:`release`).
 
     Once the root element is set, this object can be used globally without
     futher configuration.
     """
 
-    __cache_tree = CacheTree()
-    __cache_path = {}
-    __cache_node = {}
+    __state = TreeState()
 
-    def __init__(self):
-        self.__root = self.__cache_tree.get_root()
-        self.__tree = self.__cache_tree.get_tree()
+    @property
+    def _state(self) -> TreeState:
+        if (session := get_session()) is None:
+            return self.__state
+        return self.fork(session)
+
+    def fork(self, session: Session) -> TreeState:
+        """
+        Returns the state of the tree in the session; it is forked from the
+        global state on first access. Sessions used from other threads must
+        fork it beforehand, on the event loop.
+
+        Parameters
+        ----------
+        session : Session
+            Session
+
+        Returns
+        -------
+        TreeState
+            Tree state of the session
+        """
+        return session.state(TrackingTree, self.__state.fork)
+
+    @property
+    def __cache_tree(self) -> CacheTree:
+        return self._state.tree
+
+    @property
+    def __cache_path(self) -> dict[etree.Element, str]:
+        return self._state.path
+
+    @property
+    def __cache_node(self) -> dict[str, etree.Element]:
+        return self._state.node
+
+    @property
+    def __cache_ids(self) -> CacheIds:
+        return self._state.ids
+
+    @property
+    def __cache_index(self) -> CacheIndex:
+        return self._state.index
+
+    @property
+    def __root(self) -> etree.Element | None:
+        return self._state.tree.get_root()
+
+    @property
+    def __tree(self) -> etree.ElementTree | None:
+        return self._state.tree.get_tree()
 
     def set_root(self, node: etree.Element):
         """
@@ -53,13 +193,352 @@ class TrackingTree:
             Node element
         """
         self.__cache_tree.set_root(node)
-        self.__root = self.__cache_tree.get_root()
-        self.__tree = self.__cache_tree.get_tree()
-        path = self.__root.tag
+        self.__cache_ids.enabled = False
+        self.__cache_ids.clear()
+        self.invalidate()
+        index = self.__cache_index
+        index.hits = index.misses = index.rebuilds = 0
+
+    def invalidate(self):
+        """
+        Clears cached paths, nodes and positional indexes. Structural edits
+        made by :code:`LiveSelection` update them incrementally; this method
+        is meant for edits made directly on :code:`etree.Element` objects.
+        """
         self.__cache_path.clear()
         self.__cache_node.clear()
-        self.__cache_path[node] = path
-        self.__cache_node[path] = node
+        self.__cache_index.clear()
+        self.touch(structural=True)
+        if (root := self.__root) is not None:
+            self.__cache_path[root] = root.tag
+
+    @property
+    def revision(self) -> int:
+        """
+        Returns the revision of the document, incremented by each write or
+        structural edit made through :code:`LiveSelection`.
+
+        Returns
+        -------
+        int
+            Revision of the document
+        """
+        return self._state.revision
+
+    @property
+    def structure(self) -> int:
+        """
+        Returns the revision of the structure of the document, incremented by
+        each structural edit made through :code:`LiveSelection`.
+
+        Returns
+        -------
+        int
+            Revision of the structure
+        """
+        return self._state.structure
+
+    def touch(self, structural: bool = False):
+        """
+        Increments the revision of the document; copies of the document made
+        at a previous revision are outdated (see :code:`Offloader`).
+
+        Parameters
+        ----------
+        structural : bool
+            :code:`True` when nodes were inserted, removed or moved
+        """
+        state = self._state
+        state.revision += 1
+        if structural:
+            state.structure += 1
+
+    @property
+    def hits(self) -> int:
+        """
+        Returns the number of paths and nodes found in cache.
+
+        Returns
+        -------
+        int
+            Number of hits
+        """
+        return self.__cache_index.hits
+
+    @property
+    def misses(self) -> int:
+        """
+        Returns the number of paths and nodes computed from positional
+        indexes.
+
+        Returns
+        -------
+        int
+            Number of misses
+        """
+        return self.__cache_index.misses
+
+    @property
+    def rebuilds(self) -> int:
+        """
+        Returns the number of positional indexes (children of a tag of a
+        parent) built or rebuilt from the tree.
+
+        Returns
+        -------
+        int
+            Number of rebuilds
+        """
+        return self.__cache_index.rebuilds
+
+    def _siblings(self, parent: etree.Element, tag: str) -> list[etree.Element]:
+        """
+        Returns children of a tag of a parent, building the index if needed.
+        """
+        index = self.__cache_index
+        if (by_tags := index.children.get(parent)) is None:
+            by_tags = index.children[parent] = {}
+        if (siblings := by_tags.get(tag)) is None:
+            siblings = by_tags[tag] = list(parent.iterchildren(tag))
+            positions = index.positions
+            for i, sibling in enumerate(siblings):
+                positions[sibling] = i
+            index.rebuilds += 1
+        return siblings
+
+    def _inner(self, node: etree.Element) -> str:
+        """
+        Returns the path of a node where steps are indexed only when the
+        parent has several children of the same tag.
+        """
+        index = self.__cache_index
+        if (path := index.inner.get(node)) is not None:
+            return path
+        parent = node.getparent()
+        if parent is None:
+            if node is not self.__root:
+                raise ValueError(f"{node} is not in the tree.")
+            path = node.tag
+        else:
+            tag = node.tag
+            siblings = self._siblings(parent, tag)
+            if len(siblings) > 1:
+                tag = f"{tag}[{index.positions[node] + 1}]"
+            path = f"{self._inner(parent)}/{tag}"
+        index.inner[node] = path
+        return path
+
+    def _cache(self, node: etree.Element, key: str):
+        self.__cache_node[key] = node
+        self.__cache_index.keys.setdefault(node, []).append(key)
+
+    def _forget(self, node: etree.Element):
+        """
+        Forgets cached paths of a node and its descendants.
+        """
+        index = self.__cache_index
+        if index.inner.pop(node, None) is None:
+            # Paths of descendants are cached only with the one of the node
+            return
+        self.__cache_path.pop(node, None)
+        cache_node = self.__cache_node
+        for key in index.keys.pop(node, ()):
+            if cache_node.get(key) is node:
+                del cache_node[key]
+        for child in node.iterchildren(etree.Element):
+            self._forget(child)
+
+    def insert(self, nodes: Iterable[etree.Element]):
+        """
+        Updates positional indexes after the insertion of nodes. Nodes
+        appended after their siblings of the same tag are indexed in constant
+        time; otherwise, siblings are indexed again.
+
+        Parameters
+        ----------
+        nodes : Iterable[etree.Element]
+            Inserted nodes
+        """
+        self.touch(structural=True)
+        index = self.__cache_index
+        inserted = {}
+        for node in nodes:
+            if node is not None and (parent := node.getparent()) is not None:
+                inserted.setdefault((parent, node.tag), []).append(node)
+        for (parent, tag), added in inserted.items():
+            if (siblings := index.children.get(parent, {}).get(tag)) is None:
+                continue
+            tail = list(islice(parent.iterchildren(tag, reversed=True), len(added)))
+            tail.reverse()
+            if tail != added:
+                self.update(parent, tag)
+                continue
+            if len(siblings) == 1:
+                # The step of the single sibling becomes indexed
+                self._forget(siblings[0])
+            positions = index.positions
+            for node in added:
+                positions[node] = len(siblings)
+                siblings.append(node)
+
+    def update(self, parent: etree.Element, tag: str):
+        """
+        Updates the positional index of children of a tag of a parent after
+        they were inserted, removed or moved; cached paths of children whose
+        position changed are forgotten.
+
+        Parameters
+        ----------
+        parent : etree.Element
+            Parent node
+        tag : str
+            Tag of edited children
+        """
+        self.touch(structural=True)
+        index = self.__cache_index
+        if (by_tags := index.children.get(parent)) is None or tag not in by_tags:
+            return
+        old = by_tags.pop(tag)
+        new = self._siblings(parent, tag)
+        if (len(old) > 1) != (len(new) > 1):
+            # Steps of all children gain or lose their index
+            changed = old + new
+        else:
+            changed = [
+                node
+                for previous, current in zip_longest(old, new)
+                if previous is not current
+                for node in (previous, current)
+                if node is not None
+            ]
+        for node in changed:
+            self._forget(node)
+
+    @property
+    def ids_enabled(self) -> bool:
+        """
+        Returns :code:`True` if nodes are referenced by numeric ids.
+
+        Returns
+        -------
+        bool
+            Numeric ids status
+        """
+        return self.__cache_ids.enabled
+
+    def enable_ids(self, enabled: bool = True):
+        """
+        Enables or disables numeric ids. When enabled, each node of the tree
+        gets an integer id stored in its :code:`data-detroit-id` attribute;
+        this id is used as reference instead of a query selector.
+
+        Parameters
+        ----------
+        enabled : bool
+            :code:`True` for enabling numeric ids
+        """
+        self.__cache_ids.enabled = enabled
+        if enabled:
+            self.assign_ids()
+
+    def assign_ids(self, node: etree.Element | None = None):
+        """
+        Assigns numeric ids to the specified node and its descendants which do
+        not have one yet.
+
+        Parameters
+        ----------
+        node : etree.Element | None
+            Starting node; the root node by default
+        """
+        node = self.__cache_tree.get_root() if node is None else node
+        if node is None:
+            return
+        ids = self.__cache_ids.ids
+        for element in node.iter(etree.Element):
+            if element not in ids:
+                self.get_id(element)
+
+    def get_id(self, node: etree.Element) -> int:
+        """
+        Gets the numeric id of the specified node; a new id is assigned if the
+        node does not have one.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Node element
+
+        Returns
+        -------
+        int
+            Numeric id of the node
+        """
+        cache = self.__cache_ids
+        if (node_id := cache.ids.get(node)) is not None:
+            return node_id
+        node_id = cache.count = cache.count + 1
+        cache.ids[node] = node_id
+        cache.nodes[node_id] = node
+        node.set(NODE_ID, str(node_id))
+        return node_id
+
+    def release(self, node: etree.Element, ids: bool = True):
+        """
+        Releases cached paths and numeric ids of the specified node and its
+        descendants; called when the node is removed from the tree.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Removed node
+        ids : bool
+            :code:`False` for keeping numeric ids, released later with
+            :code:`TrackingTree.release_ids`
+        """
+        self.touch(structural=True)
+        self._forget(node)
+        index = self.__cache_index
+        for element in node.iter(etree.Element):
+            index.children.pop(element, None)
+            index.positions.pop(element, None)
+        if ids:
+            self.release_ids(node)
+
+    def release_ids(self, node: etree.Element):
+        """
+        Releases numeric ids of the specified node and its descendants.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Removed node
+        """
+        cache = self.__cache_ids
+        for element in node.iter(etree.Element):
+            if (node_id := cache.ids.pop(element, None)) is not None:
+                cache.nodes.pop(node_id, None)
+                element.attrib.pop(NODE_ID, None)
+
+    def get_reference(self, node: etree.Element) -> int | str:
+        """
+        Gets the reference of the specified node used by the client to find
+        the corresponding element: its numeric id when enabled, else its query
+        selector.
+
+        Parameters
+        ----------
+        node : etree.Element
+            Node element
+
+        Returns
+        -------
+        int | str
+            Reference of the node
+        """
+        if self.__cache_ids.enabled:
+            return self.get_id(node)
+        return xpath_to_query_selector(self.get_path(node))
 
     @property
     def root(self) -> etree.Element | None:
@@ -87,47 +566,69 @@ class TrackingTree:
         str
            Path in the tree of the specified node
         """
-        if node in self.__cache_path:
-            return self.__cache_path[node]
-        path = self.__tree.getelementpath(node)
-        path = (
-            f"{self.root.tag}/{path}[1]"
-            if path[-1] != "]"
-            else f"{self.root.tag}/{path}"
-        )
+        index = self.__cache_index
+        if (path := self.__cache_path.get(node)) is not None:
+            index.hits += 1
+            return path
+        index.misses += 1
+        path = self._inner(node)
+        if path[-1] != "]":
+            path = f"{path}[1]"
         self.__cache_path[node] = path
-        self.__cache_node[path] = node
+        self._cache(node, path.split(self.__root.tag, 1)[1])
         return path
 
-    def get_node(self, path: str) -> etree.Element | None:
+    def get_node(self, path: str | int) -> etree.Element | None:
         """
-        Gets the node element given a path in the tree.
+        Gets the node element given a path in the tree or a numeric id.
 
         Parameters
         ----------
-        path : str
-            Path in the tree of the specified node
+        path : str | int
+            Path in the tree of the specified node or its numeric id
 
         Returns
         -------
         etree.Element | None
             Node element
         """
+        if isinstance(path, int):
+            return self.__cache_ids.nodes.get(path)
         root_tag = self.__root.tag
         if root_tag in path:
             path = path.split(root_tag)[1]  # or root_tag
         if path == "":
             return self.__root
-        if path in self.__cache_node:
-            return self.__cache_node[path]
-        if path == f"/{root_tag}":
-            node = self.__tree.xpath(path)[0]
-        else:
-            try:
-                node = self.__tree.xpath(f"/{root_tag}/{path}")[0]
-            except IndexError:
-                log.warning(f"{path!r} not found in XML tree (root={root_tag}).")
-                node = None
-        self.__cache_node[path] = node
-        self.__cache_path[node] = path
+        index = self.__cache_index
+        if (node := self.__cache_node.get(path)) is not None:
+            index.hits += 1
+            return node
+        index.misses += 1
+        node = self._resolve(path)
+        if node is None:
+            log.warning(f"{path!r} not found in XML tree (root={root_tag}).")
+            return None
+        # Cached paths of nodes are forgotten with the one of their parents
+        self._inner(node)
+        self._cache(node, path)
+        return node
+
+    def _resolve(self, path: str) -> etree.Element | None:
+        """
+        Finds a node by following steps of a path from the root with
+        positional indexes; unusual paths are resolved by XPath.
+        """
+        node = self.__root
+        for step in path.split("/"):
+            if not step or step[0] == ".":
+                continue
+            if (match := PATH_STEP.fullmatch(step)) is None:
+                found = self.__tree.xpath(f"/{self.__root.tag}/{path}")
+                return found[0] if found else None
+            tag, position = match.groups()
+            siblings = self._siblings(node, tag)
+            position = 0 if position is None else int(position) - 1
+            if not 0 <= position < len(siblings):
+                return None
+            node = siblings[position]
         return node
@@ -135,7 +135,7 @@ class MouseEvent(Event):
     ctrl_key: bool
     shift_key: bool
     alt_key: bool
-    element_id: str
+    element_id: str | int
     rect_top: int
     rect_left: int
 
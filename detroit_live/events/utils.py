@@ -7,6 +7,8 @@ from lxml import etree
 
 from ..types import U, V
 
+NODE_ID = "data-detroit-id"
+
 
 def get_root(node: etree.Element) -> etree.Element:
     """
@@ -136,11 +138,33 @@ def node_attribs(node: etree.Element, with_inner_html: bool = False) -> dict[str
         Attributes of the node
     """
     attribs = dict(node.attrib)
+    attribs.pop(NODE_ID, None)
     if with_inner_html:
         attribs["innerHTML"] = node.text or inner_html(node)
     return attribs
 
 
+def get_attribute(node: etree.Element, key: str) -> str | None:
+    """
+    Gets a single attribute of a node, :code:`"innerHTML"` included.
+
+    Parameters
+    ----------
+    node : etree.Element
+        Node
+    key : str
+        Attribute name or :code:`"innerHTML"`
+
+    Returns
+    -------
+    str | None
+        Attribute value if found
+    """
+    if key == "innerHTML":
+        return node.text or inner_html(node)
+    return node.get(key)
+
+
 def search(mapping: dict[U, ...] | V, keys: list[Any], depth: int = 0) -> Iterator[V]:
     if depth + 1 > len(keys):  # max depth
         if isinstance(mapping, dict):
@@ -83,7 +83,8 @@ class LiveForceSimulation(ForceSimulation):
         listener : Callable[[LiveForceSimulation], None]
             Listener
         extra_nodes : list[etree.Element] | None
-            Extra nodes to update when the listener is called
+            Extra nodes to update when the listener is called; when
+            :code:`None`, extra nodes of previous calls are kept
 
         Returns
         -------
@@ -99,12 +100,15 @@ class LiveForceSimulation(ForceSimulation):
         velocities inside a tick event listener.
         """
         self._event.on(typename, listener)
-        self._event_producers.remove_timer(self._stepper)
-        self._stepper = self._event_producers.add_timer(self._step, extra_nodes)
+        if extra_nodes is not None:
+            self._event_producers.remove_timer(self._stepper)
+            self._stepper = self._event_producers.add_timer(self._step, extra_nodes)
         return self
 
 
-def force_simulation(nodes: list[SimulationNode] | None = None) -> LiveForceSimulation:
+def force_simulation(
+    nodes: list[SimulationNode] | None = None, backend: str = "python"
+) -> LiveForceSimulation:
     """
     A force simulation implements a velocity Verlet numerical integrator for
     simulating physical forces on particles (nodes). The simulation assumes a
@@ -118,6 +122,14 @@ def force_simulation(nodes: list[SimulationNode] | None = None) -> LiveForceSimu
     ----------
     nodes : list[SimulationNode] | None
         List of nodes
+    backend : str
+        :code:`"python"` or :code:`"numpy"`; the NumPy backend stores
+        positions and velocities in arrays and vectorizes link, many-body,
+        center and collide forces, which suits graphs of thousands of nodes
+        (see :code:`VectorizedForceSimulation`). It requires :code:`numpy`.
+        Above 1000 links, links are applied all at once instead of one after
+        another: layouts converge alike but positions drift from the Python
+        backend, by tens of pixels after one tick on hundreds of random nodes.
 
     Returns
     -------
@@ -126,4 +138,14 @@ def force_simulation(nodes: list[SimulationNode] | None = None) -> LiveForceSimu
     """
     if nodes is None:
         nodes = []
-    return LiveForceSimulation(nodes)
+    if backend == "python":
+        return LiveForceSimulation(nodes)
+    if backend == "numpy":
+        try:
+            from .vectorized import VectorizedForceSimulation
+        except ImportError as error:
+            raise ImportError(
+                "The NumPy backend requires numpy: pip install detroit-live[numpy]"
+            ) from error
+        return VectorizedForceSimulation(nodes)
+    raise ValueError(f"Unknown backend: {backend!r}")
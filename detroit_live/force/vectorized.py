@@ -0,0 +1,678 @@
+from collections.abc import Callable
+from math import ceil, inf, log, nan, sqrt
+from typing import TypeVar
+
+import numpy as np
+from detroit.force.center import ForceCenter
+from detroit.force.collide import ForceCollide
+from detroit.force.link import ForceLink
+from detroit.force.many_body import ForceManyBody
+from detroit.types import Force, SimulationNode
+
+from ..dispatch import parse_typenames
+from ..timer import TimerEvent
+from .simulation import LiveForceSimulation
+
+TVectorizedForceSimulation = TypeVar(
+    "VectorizedForceSimulation", bound="VectorizedForceSimulation"
+)
+
+# Maximum depth of the quadtree used by the many-body force
+MAX_DEPTH = 16
+# Maximum number of links applied one after another, as done by `ForceLink`
+SEQUENTIAL_LINKS = 1000
+
+
+def jiggle(values: np.ndarray, random: Callable[[], float]):
+    """
+    Replaces zero values by tiny random values in place, as :code:`jiggle`
+    does for scalar values.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values
+    random : Callable[[], float]
+        Random source
+    """
+    for i in np.flatnonzero(values == 0):
+        values[i] = (random() - 0.5) * 1e-6
+
+
+def expand(
+    keys: np.ndarray, begins: np.ndarray, ends: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Expands each key over its range of positions :code:`[begin, end)`.
+
+    Parameters
+    ----------
+    keys : np.ndarray
+        Keys
+    begins : np.ndarray
+        Beginning of each range
+    ends : np.ndarray
+        End of each range (excluded)
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        Repeated keys and positions of their ranges
+    """
+    counts = ends - begins
+    total = int(counts.sum())
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    positions = np.repeat(begins, counts) + np.arange(total) - offsets
+    return np.repeat(keys, counts), positions
+
+
+def interleave(values: np.ndarray) -> np.ndarray:
+    """
+    Spreads the 16 lowest bits of each value on even bits (Morton code).
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Integer values
+
+    Returns
+    -------
+    np.ndarray
+        Spread values
+    """
+    values = values.astype(np.int64) & 0xFFFF
+    values = (values | (values << 8)) & 0x00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F
+    values = (values | (values << 2)) & 0x33333333
+    return (values | (values << 1)) & 0x55555555
+
+
+class NodeArrays:
+    """
+    Positions, velocities and fixed positions of nodes stored in arrays.
+
+    Parameters
+    ----------
+    nodes : list[SimulationNode]
+        Nodes
+    """
+
+    __slots__ = ("x", "y", "vx", "vy", "fx", "fy")
+
+    def __init__(self, nodes: list[SimulationNode]):
+        size = len(nodes)
+        self.x = np.fromiter((node["x"] for node in nodes), float, size)
+        self.y = np.fromiter((node["y"] for node in nodes), float, size)
+        self.vx = np.fromiter((node["vx"] for node in nodes), float, size)
+        self.vy = np.fromiter((node["vy"] for node in nodes), float, size)
+        self.pin(nodes)
+
+    def pin(self, nodes: list[SimulationNode]):
+        """
+        Reads fixed positions of nodes (:code:`nan` when not fixed).
+
+        Parameters
+        ----------
+        nodes : list[SimulationNode]
+            Nodes
+        """
+        size = len(nodes)
+        self.fx = np.fromiter(
+            (nan if (fx := node.get("fx")) is None else fx for node in nodes),
+            float,
+            size,
+        )
+        self.fy = np.fromiter(
+            (nan if (fy := node.get("fy")) is None else fy for node in nodes),
+            float,
+            size,
+        )
+
+    def read(self, nodes: list[SimulationNode]):
+        """
+        Reads positions and velocities of nodes.
+
+        Parameters
+        ----------
+        nodes : list[SimulationNode]
+            Nodes
+        """
+        for i, node in enumerate(nodes):
+            self.x[i] = node["x"]
+            self.y[i] = node["y"]
+            self.vx[i] = node["vx"]
+            self.vy[i] = node["vy"]
+
+    def write(self, nodes: list[SimulationNode]):
+        """
+        Writes positions and velocities into nodes.
+
+        Parameters
+        ----------
+        nodes : list[SimulationNode]
+            Nodes
+        """
+        values = zip(
+            nodes, self.x.tolist(), self.y.tolist(), self.vx.tolist(), self.vy.tolist()
+        )
+        for node, x, y, vx, vy in values:
+            node["x"] = x
+            node["y"] = y
+            node["vx"] = vx
+            node["vy"] = vy
+
+
+def apply_link(
+    arrays: NodeArrays,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    distances: np.ndarray,
+    strengths: np.ndarray,
+    bias: np.ndarray,
+    iterations: int,
+    alpha: float,
+    random: Callable[[], float],
+):
+    """
+    Applies the link force. Up to :code:`SEQUENTIAL_LINKS` links, links are
+    applied one after another as :code:`ForceLink` does; above, they are
+    applied all at once and velocities are updated after all links are
+    evaluated, which makes positions drift from :code:`ForceLink`.
+    """
+    if len(sources) <= SEQUENTIAL_LINKS:
+        apply_link_sequentially(
+            arrays,
+            sources,
+            targets,
+            distances,
+            strengths,
+            bias,
+            iterations,
+            alpha,
+            random,
+        )
+        return
+    size = len(arrays.x)
+    for _ in range(iterations):
+        x = arrays.x[targets] + arrays.vx[targets] - arrays.x[sources]
+        x -= arrays.vx[sources]
+        y = arrays.y[targets] + arrays.vy[targets] - arrays.y[sources]
+        y -= arrays.vy[sources]
+        jiggle(x, random)
+        jiggle(y, random)
+        length = np.sqrt(x * x + y * y)
+        length = (length - distances) / length * alpha * strengths
+        x *= length
+        y *= length
+        arrays.vx -= np.bincount(targets, x * bias, size)
+        arrays.vy -= np.bincount(targets, y * bias, size)
+        arrays.vx += np.bincount(sources, x * (1 - bias), size)
+        arrays.vy += np.bincount(sources, y * (1 - bias), size)
+
+
+def apply_link_sequentially(
+    arrays: NodeArrays,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    distances: np.ndarray,
+    strengths: np.ndarray,
+    bias: np.ndarray,
+    iterations: int,
+    alpha: float,
+    random: Callable[[], float],
+):
+    """
+    Applies the link force on links one after another, each link reading
+    velocities updated by previous links as :code:`ForceLink` does.
+    """
+    x, y = arrays.x.tolist(), arrays.y.tolist()
+    vx, vy = arrays.vx.tolist(), arrays.vy.tolist()
+    links = list(
+        zip(
+            sources.tolist(),
+            targets.tolist(),
+            distances.tolist(),
+            strengths.tolist(),
+            bias.tolist(),
+        )
+    )
+    for _ in range(iterations):
+        for source, target, distance, strength, b in links:
+            dx = x[target] + vx[target] - x[source] - vx[source]
+            dx = dx or (random() - 0.5) * 1e-6
+            dy = y[target] + vy[target] - y[source] - vy[source]
+            dy = dy or (random() - 0.5) * 1e-6
+            length = sqrt(dx * dx + dy * dy)
+            length = (length - distance) / length * alpha * strength
+            dx *= length
+            dy *= length
+            vx[target] -= dx * b
+            vy[target] -= dy * b
+            vx[source] += dx * (1 - b)
+            vy[source] += dy * (1 - b)
+    arrays.vx[:] = vx
+    arrays.vy[:] = vy
+
+
+class Quadtree:
+    """
+    Quadtree built over arrays: points are sorted by Morton code so that each
+    cell of each level is a contiguous range of sorted points. Cells hold the
+    aggregated strength of their points and their center of strength.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        x-coordinates of points
+    y : np.ndarray
+        y-coordinates of points
+    strengths : np.ndarray
+        Strength of each point
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, strengths: np.ndarray):
+        size = len(x)
+        x0 = x.min()
+        y0 = y.min()
+        extent = max(x.max() - x0, y.max() - y0) or 1.0
+        self.depth = min(MAX_DEPTH, max(1, ceil(log(size, 4)) + 1 if size > 1 else 1))
+        self.size = extent
+        scale = (1 << self.depth) / extent
+        limit = (1 << self.depth) - 1
+        ix = np.minimum(((x - x0) * scale).astype(np.int64), limit)
+        iy = np.minimum(((y - y0) * scale).astype(np.int64), limit)
+        codes = interleave(ix) | (interleave(iy) << 1)
+        self.order = np.argsort(codes, kind="stable")
+        codes = codes[self.order]
+        weights = np.abs(strengths[self.order])
+        values = strengths[self.order]
+        wx = weights * x[self.order]
+        wy = weights * y[self.order]
+
+        # Per level: ranges of cells, aggregated values and centers
+        self.begins = []
+        self.ends = []
+        self.values = []
+        self.cx = []
+        self.cy = []
+        for level in range(self.depth + 1):
+            keys = codes >> (2 * (self.depth - level))
+            begins = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            ends = np.r_[begins[1:], size]
+            weight = np.add.reduceat(weights, begins)
+            safe = np.where(weight > 0, weight, 1.0)
+            self.begins.append(begins)
+            self.ends.append(ends)
+            self.values.append(np.add.reduceat(values, begins))
+            self.cx.append(np.add.reduceat(wx, begins) / safe)
+            self.cy.append(np.add.reduceat(wy, begins) / safe)
+
+    def children(self, level: int, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns ranges of the children (at :code:`level + 1`) of cells.
+
+        Parameters
+        ----------
+        level : int
+            Level of cells
+        cells : np.ndarray
+            Cell indices
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            Beginning and end of the ranges of children
+        """
+        begins = self.begins[level + 1]
+        return (
+            np.searchsorted(begins, self.begins[level][cells]),
+            np.searchsorted(begins, self.ends[level][cells]),
+        )
+
+
+def apply_many_body(
+    arrays: NodeArrays,
+    strengths: np.ndarray,
+    alpha: float,
+    theta2: float,
+    distance_min_2: float,
+    distance_max_2: float,
+    random: Callable[[], float],
+):
+    """
+    Applies the many-body force with the Barnes–Hut approximation. The
+    quadtree is traversed for all nodes at once, level by level: a frontier
+    of :code:`(node, cell)` pairs is either approximated by the cell, or
+    expanded into the children of the cell.
+    """
+    size = len(arrays.x)
+    if size == 0:
+        return
+    x = arrays.x
+    y = arrays.y
+    tree = Quadtree(x, y, strengths)
+    vx = np.zeros(size)
+    vy = np.zeros(size)
+
+    def accumulate(nodes: np.ndarray, dx: np.ndarray, dy: np.ndarray, value):
+        jiggle(dx, random)
+        jiggle(dy, random)
+        length = dx * dx + dy * dy
+        length = np.where(
+            length < distance_min_2, np.sqrt(distance_min_2 * length), length
+        )
+        weight = value * alpha / length
+        vx[:] += np.bincount(nodes, dx * weight, size)
+        vy[:] += np.bincount(nodes, dy * weight, size)
+
+    nodes = np.arange(size)
+    cells = np.zeros(size, dtype=np.int64)
+    for level in range(tree.depth + 1):
+        values = tree.values[level][cells]
+        keep = values != 0
+        nodes, cells, values = nodes[keep], cells[keep], values[keep]
+        begins = tree.begins[level][cells]
+        ends = tree.ends[level][cells]
+        dx = tree.cx[level][cells] - x[nodes]
+        dy = tree.cy[level][cells] - y[nodes]
+        length = dx * dx + dy * dy
+
+        # Cells holding a single point interact exactly
+        single = ends - begins == 1
+        width = tree.size / (1 << level)
+        far = ~single & (width * width / theta2 < length)
+        near = ~(single | far)
+        single &= tree.order[np.minimum(begins, size - 1)] != nodes
+        apply = (single | far) & (length < distance_max_2)
+        accumulate(nodes[apply], dx[apply], dy[apply], values[apply])
+
+        if level == tree.depth:
+            # Points of deepest cells interact pairwise
+            near &= length < distance_max_2
+            pairs, positions = expand(nodes[near], begins[near], ends[near])
+            others = tree.order[positions]
+            keep = others != pairs
+            pairs, others = pairs[keep], others[keep]
+            accumulate(
+                pairs,
+                x[others] - x[pairs],
+                y[others] - y[pairs],
+                strengths[others],
+            )
+            break
+        nodes, cells = expand(nodes[near], *tree.children(level, cells[near]))
+        if len(nodes) == 0:
+            break
+    arrays.vx += vx
+    arrays.vy += vy
+
+
+def apply_collide(
+    arrays: NodeArrays,
+    radii: np.ndarray,
+    strength: float,
+    iterations: int,
+    random: Callable[[], float],
+):
+    """
+    Applies the collide force on all pairs of overlapping nodes at once,
+    found with a uniform grid whose cells are as large as the largest
+    diameter. Unlike :code:`ForceCollide`, velocities are updated after all
+    pairs are evaluated.
+    """
+    size = len(arrays.x)
+    if size == 0 or (cell := 2 * radii.max()) <= 0:
+        return
+    for _ in range(iterations):
+        px = arrays.x + arrays.vx
+        py = arrays.y + arrays.vy
+        gx = ((px - px.min()) // cell).astype(np.int64)
+        gy = ((py - py.min()) // cell).astype(np.int64) + 1
+        height = int(gy.max()) + 2
+        keys = gx * height + gy
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        nodes = []
+        others = []
+        for ox in (-1, 0, 1):
+            for oy in (-1, 0, 1):
+                neighbors = keys + ox * height + oy
+                begins = np.searchsorted(sorted_keys, neighbors, "left")
+                ends = np.searchsorted(sorted_keys, neighbors, "right")
+                i, positions = expand(np.arange(size), begins, ends)
+                j = order[positions]
+                keep = j > i
+                nodes.append(i[keep])
+                others.append(j[keep])
+        i = np.concatenate(nodes)
+        j = np.concatenate(others)
+        ri = radii[i]
+        rj = radii[j]
+        r = ri + rj
+        x = px[i] - px[j]
+        y = py[i] - py[j]
+        overlap = x * x + y * y < r * r
+        i, j, ri, rj, r = i[overlap], j[overlap], ri[overlap], rj[overlap], r[overlap]
+        x, y = x[overlap], y[overlap]
+        jiggle(x, random)
+        jiggle(y, random)
+        length = np.sqrt(x * x + y * y)
+        length = (r - length) / length * strength
+        x *= length
+        y *= length
+        rj *= rj
+        ratio = rj / (ri * ri + rj)
+        arrays.vx += np.bincount(i, x * ratio, size)
+        arrays.vy += np.bincount(i, y * ratio, size)
+        arrays.vx -= np.bincount(j, x * (1 - ratio), size)
+        arrays.vy -= np.bincount(j, y * (1 - ratio), size)
+
+
+class VectorizedForceSimulation(LiveForceSimulation):
+    """
+    Force simulation whose positions and velocities are stored in NumPy
+    arrays. Link, many-body, center and collide forces are vectorized; other
+    forces run on nodes as usual, positions and velocities being written
+    into nodes before and read after them.
+
+    Results are written back into nodes lazily: before dispatching events
+    which have listeners and when nodes are read through :code:`get_nodes` or
+    :code:`find`. Fixed positions (:code:`fx` and :code:`fy`) are read from
+    nodes on each tick, therefore nodes can still be dragged.
+
+    Parameters
+    ----------
+    nodes : list[SimulationNode]
+        List of nodes
+    """
+
+    def __init__(self, nodes: list[SimulationNode]):
+        self._listeners = set()
+        super().__init__(nodes)
+
+    def _initialize_nodes(self):
+        super()._initialize_nodes()
+        self._arrays = NodeArrays(self._nodes)
+        self._links = {}
+        self._synced = True
+
+    def sync(self) -> TVectorizedForceSimulation:
+        """
+        Writes positions and velocities into nodes if they are outdated.
+
+        Returns
+        -------
+        VectorizedForceSimulation
+            Itself
+        """
+        if not self._synced:
+            self._arrays.write(self._nodes)
+            self._synced = True
+        return self
+
+    def tick(self, iterations: int | None = None) -> TVectorizedForceSimulation:
+        """
+        Manually steps the simulation by the specified number of iterations,
+        and returns the simulation. If :code:`iterations` is not specified, it
+        defaults to 1 (single step).
+
+        Parameters
+        ----------
+        iterations : int | None
+            Number of iterations
+
+        Returns
+        -------
+        VectorizedForceSimulation
+            Itself
+        """
+        if iterations is None:
+            iterations = 1
+        arrays = self._arrays
+        arrays.pin(self._nodes)
+        free_x = np.isnan(arrays.fx)
+        free_y = np.isnan(arrays.fy)
+        for _ in range(iterations):
+            self._alpha += (self._alpha_target - self._alpha) * self._alpha_decay
+            for force in self._forces.values():
+                self._apply(force, self._alpha)
+            arrays.vx *= np.where(free_x, self._velocity_decay, 0)
+            arrays.vy *= np.where(free_y, self._velocity_decay, 0)
+            arrays.x = np.where(free_x, arrays.x + arrays.vx, arrays.fx)
+            arrays.y = np.where(free_y, arrays.y + arrays.vy, arrays.fy)
+            self._synced = False
+        return self
+
+    def _apply(self, force: Force, alpha: float):
+        arrays = self._arrays
+        match force:
+            case ForceLink() if force._nodes is self._nodes:
+                sources, targets = self._link_indices(force)
+                apply_link(
+                    arrays,
+                    sources,
+                    targets,
+                    np.asarray(force._distances, dtype=float),
+                    np.asarray(force._strengths, dtype=float),
+                    np.asarray(force._bias, dtype=float),
+                    force._iterations,
+                    alpha,
+                    self._random,
+                )
+            case ForceManyBody() if force._nodes is self._nodes:
+                apply_many_body(
+                    arrays,
+                    np.asarray(force._strengths, dtype=float),
+                    alpha,
+                    force._theta2,
+                    force._distance_min_2,
+                    force._distance_max_2,
+                    self._random,
+                )
+            case ForceCenter() if len(self._nodes):
+                arrays.x -= arrays.x.mean() - force._x * force._strength
+                arrays.y -= arrays.y.mean() - force._y * force._strength
+            case ForceCollide() if force._nodes is self._nodes:
+                apply_collide(
+                    arrays,
+                    np.asarray(force._radii, dtype=float),
+                    force._strength,
+                    force._iterations,
+                    self._random,
+                )
+            case _:
+                self.sync()
+                force(alpha)
+                arrays.read(self._nodes)
+
+    def _link_indices(self, force: ForceLink) -> tuple[np.ndarray, np.ndarray]:
+        links = force._links
+        cached = self._links.get(id(force))
+        if cached is None or cached[0] is not links or cached[1] != len(links):
+            size = len(links)
+            sources = np.fromiter(
+                (link["source"]["index"] for link in links), np.int64, size
+            )
+            targets = np.fromiter(
+                (link["target"]["index"] for link in links), np.int64, size
+            )
+            cached = self._links[id(force)] = (links, size, sources, targets)
+        return cached[2], cached[3]
+
+    def _step(self, elapsed: float, timer_event: TimerEvent):
+        self.tick()
+        self._dispatch("tick")
+        if self._alpha < self._alpha_min:
+            timer_event.set()
+            self._dispatch("end")
+
+    def _dispatch(self, typename: str):
+        if any(listened == typename for listened, _ in self._listeners):
+            self.sync()
+        self._event(typename, self)
+
+    def on(
+        self,
+        typename: str,
+        listener: Callable[[TVectorizedForceSimulation], None] | None,
+        extra_nodes: list | None = None,
+    ) -> TVectorizedForceSimulation:
+        """
+        Sets the event listener for the specified typenames and returns this
+        simulation; nodes are synchronized before dispatching events of
+        typenames which have listeners.
+
+        Parameters
+        ----------
+        typename : str
+            Typename
+        listener : Callable[[VectorizedForceSimulation], None] | None
+            Listener
+        extra_nodes : list | None
+            Extra nodes to update when the listener is called; when
+            :code:`None`, extra nodes of previous calls are kept
+
+        Returns
+        -------
+        VectorizedForceSimulation
+            Itself
+        """
+        for typename_, name in parse_typenames(typename):
+            if listener is None:
+                self._listeners.discard((typename_, name))
+            else:
+                self._listeners.add((typename_, name))
+        return super().on(typename, listener, extra_nodes)
+
+    def find(
+        self, x: float, y: float, radius: float | None = None
+    ) -> SimulationNode | None:
+        """
+        Returns the node closest to the position :math:`(x,y)` with the given
+        search radius.
+
+        Parameters
+        ----------
+        x : float
+            x-coordinate value of the position
+        y : float
+            y-coordinate value of the position
+        radius : float | None
+            Radius value
+
+        Returns
+        -------
+        SimulationNode | None
+            Closest node
+        """
+        if len(self._nodes) == 0:
+            return None
+        distances = (self._arrays.x - x) ** 2 + (self._arrays.y - y) ** 2
+        closest = int(np.argmin(distances))
+        if distances[closest] >= (inf if radius is None else radius * radius):
+            return None
+        self.sync()
+        return self._nodes[closest]
+
+    def get_nodes(self) -> list[SimulationNode]:
+        return self.sync()._nodes
@@ -1,9 +1,12 @@
+from .canvas import CanvasSelection, Mark
 from .create import create
 from .select import select
 from .selection import LiveSelection
 
 __all__ = [
+    "CanvasSelection",
     "LiveSelection",
+    "Mark",
     "create",
     "select",
 ]
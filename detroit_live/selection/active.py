@@ -10,8 +10,6 @@ def set_active(
     active: bool,
 ) -> Callable[[etree.Element, str, str], None]:
     def set_active_event(typename: str, name: str, node: etree.Element):
-        for listeners in event_listeners.values():
-            for event_listener in listeners.search(node, typename, name):
-                event_listener.active = active
+        event_listeners.set_active(typename, name, node, active)
 
     return set_active_event
@@ -0,0 +1,454 @@
+from collections.abc import Callable, Iterator
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
+
+from detroit.array import argpass
+from detroit.types import Accessor, T
+from lxml import etree
+
+from ..dispatch import parse_typenames
+from ..events import DirtyTracker, Event, MouseEvent
+from ..events.marks import CanvasMarks, Marks
+from ..events.types import parse_event
+
+if TYPE_CHECKING:
+    from .selection import LiveSelection
+
+TCanvasSelection = TypeVar("CanvasSelection", bound="CanvasSelection")
+
+
+class Mark:
+    """
+    Handle of a mark drawn on a canvas; listeners of marks receive it as
+    node and :code:`d3.select(mark)` selects the mark.
+
+    Parameters
+    ----------
+    canvas : etree.Element
+        Canvas element
+    kind : str
+        Kind of the mark
+    index : int
+        Index of the mark
+    """
+
+    __slots__ = "canvas", "kind", "index"
+
+    def __init__(self, canvas: etree.Element, kind: str, index: int):
+        self.canvas = canvas
+        self.kind = kind
+        self.index = index
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Returns the value of an attribute of the mark.
+
+        Parameters
+        ----------
+        key : str
+            Attribute name
+        default : Any
+            Value returned when the attribute was never written
+
+        Returns
+        -------
+        Any
+            Value of the attribute
+        """
+        value = CanvasMarks().layer(self.canvas, self.kind).get(key, self.index)
+        return default if value is None else value
+
+    def __eq__(self, other: Any) -> bool:
+        return (
+            isinstance(other, Mark)
+            and other.canvas is self.canvas
+            and other.kind == self.kind
+            and other.index == self.index
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self.canvas), self.kind, self.index))
+
+    def __repr__(self) -> str:
+        return f"Mark(kind={self.kind!r}, index={self.index})"
+
+
+class CanvasSelection(Generic[T]):
+    """
+    Selection of marks drawn on a :code:`canvas` element, returned by
+    :code:`LiveSelection.select_all("circle")` (or :code:`"rect"`) on a
+    canvas. It supports the usual chain of a selection (:code:`data`,
+    :code:`join`, :code:`attr`, :code:`style`, :code:`on`, ...) but marks
+    are kept as columns of values on the server instead of elements (see
+    :code:`Marks`), which scales to hundreds of thousands of marks.
+
+    Written attributes are sent to the client as packed columns and drawn
+    by its canvas renderer. Circles use :code:`cx`, :code:`cy` and
+    :code:`r`, rectangles use :code:`x`, :code:`y`, :code:`width` and
+    :code:`height`; both use :code:`fill`, :code:`stroke`,
+    :code:`stroke-width` and :code:`opacity`.
+
+    Parameters
+    ----------
+    canvas : LiveSelection
+        Selection of the canvas element
+    kind : str
+        Kind of marks, :code:`"circle"` or :code:`"rect"`
+    indices : list[int] | None
+        Indices of selected marks; all marks when :code:`None`
+
+    Examples
+    --------
+
+    >>> canvas = body.append("canvas").attr("width", 960).attr("height", 500)
+    >>> circles = (
+    ...     canvas.select_all("circle")
+    ...     .data(points)
+    ...     .join("circle")
+    ...     .attr("cx", lambda d: x(d[0]))
+    ...     .attr("cy", lambda d: y(d[1]))
+    ...     .attr("r", 2)
+    ...     .on("click", clicked)
+    ... )
+    """
+
+    def __init__(
+        self,
+        canvas: "LiveSelection",
+        kind: str,
+        indices: list[int] | None = None,
+    ):
+        self._canvas = canvas
+        self._kind = kind
+        self._indices = indices
+        # Raises an error for unsupported kinds
+        CanvasMarks().layer(canvas.node(), kind)
+
+    @property
+    def _marks(self) -> Marks:
+        return CanvasMarks().layer(self._canvas.node(), self._kind)
+
+    def _selected(self) -> list[int] | range:
+        return range(self._marks.size) if self._indices is None else self._indices
+
+    def _record(self, keys: list[str]):
+        tracker = DirtyTracker()
+        if not tracker.recording:
+            return
+        marks = self._marks
+        if self._indices is None:
+            tracker.marks(marks, 0, marks.size, keys)
+        elif self._indices:
+            tracker.marks(marks, min(self._indices), max(self._indices) + 1, keys)
+
+    def data(self, values: list[T] | None = None) -> TCanvasSelection | list[T]:
+        """
+        Binds data to marks; the number of marks becomes the number of
+        values. Attributes of existing marks are kept. Without argument,
+        returns data of selected marks.
+
+        Parameters
+        ----------
+        values : list[T] | None
+            Data
+
+        Returns
+        -------
+        CanvasSelection | list[T]
+            Selection of all marks or data
+        """
+        marks = self._marks
+        if values is None:
+            return [marks.data[i] for i in self._selected()]
+        if self._indices is not None:
+            raise ValueError("Data can only be bound to all marks of a canvas.")
+        values = list(values)
+        marks.resize(len(values))
+        marks.data[:] = values
+        selection = CanvasSelection(self._canvas, self._kind)
+        selection._record(list(marks.columns))
+        return selection
+
+    def join(self, kind: str, *args: Any, **kwargs: Any) -> TCanvasSelection:
+        """
+        Returns itself; marks are created and removed by :code:`data`.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of marks, which must match the selected kind
+
+        Returns
+        -------
+        CanvasSelection
+            Itself
+        """
+        if kind != self._kind:
+            raise ValueError(f"Cannot join {kind!r} on a selection of {self._kind!r}.")
+        return self
+
+    def attr(
+        self, name: str, value: Accessor[T, Any] | list[Any] | Any | None = None
+    ) -> TCanvasSelection | Any:
+        """
+        Sets an attribute of selected marks from a constant, a sequence (or a
+        NumPy array) with one value per mark or a function called with
+        :code:`(d, i, selection)`. Without value, returns the value of the
+        first selected mark.
+
+        Parameters
+        ----------
+        name : str
+            Attribute name
+        value : Accessor[T, Any] | list[Any] | Any | None
+            Value
+
+        Returns
+        -------
+        CanvasSelection | Any
+            Itself or value of the attribute
+        """
+        marks = self._marks
+        selected = self._selected()
+        if value is None:
+            return marks.get(name, selected[0]) if len(selected) else None
+        marks.write(name, self._values(name, value, selected), self._indices)
+        self._record([name])
+        return self
+
+    def _values(self, name: str, value: Any, selected: list[int] | range) -> Any:
+        if callable(value):
+            accessor = argpass(value)
+            data = self._marks.data
+            return [accessor(data[i], j, self) for j, i in enumerate(selected)]
+        if isinstance(value, str) or not hasattr(value, "__len__"):
+            return [value] * len(selected)
+        if len(value) != len(selected):
+            raise ValueError(
+                f"Column {name!r} has {len(value)} values for {len(selected)} marks."
+            )
+        return value
+
+    def style(
+        self, name: str, value: Accessor[T, Any] | list[Any] | Any | None = None
+    ) -> TCanvasSelection | Any:
+        """
+        This method has no difference with :code:`CanvasSelection.attr`.
+
+        Parameters
+        ----------
+        name : str
+            Style name
+        value : Accessor[T, Any] | list[Any] | Any | None
+            Value
+
+        Returns
+        -------
+        CanvasSelection | Any
+            Itself or value of the style
+        """
+        return self.attr(name, value)
+
+    def attrs(self, columns: dict[str, Any]) -> TCanvasSelection:
+        """
+        Sets several attributes of selected marks at once (see
+        :code:`LiveSelection.attrs`).
+
+        Parameters
+        ----------
+        columns : dict[str, Any]
+            Values of each attribute name
+
+        Returns
+        -------
+        CanvasSelection
+            Itself
+        """
+        marks = self._marks
+        selected = self._selected()
+        for name, values in columns.items():
+            marks.write(name, self._values(name, values, selected), self._indices)
+        self._record(list(columns))
+        return self
+
+    def on(
+        self,
+        typename: str,
+        listener: Callable[[Event, T | None, Mark], None] | None = None,
+        active: bool = True,
+        in_flight: int | None = None,
+    ) -> TCanvasSelection:
+        """
+        Adds or removes a listener of mouse events on marks. The canvas
+        receives the events and the target mark is found from the pointer
+        coordinates (the topmost mark, last drawn, wins); the listener is
+        called with the event, the data of the mark and the mark (see
+        :code:`Mark`). Events which hit no mark are ignored.
+
+        Parameters
+        ----------
+        typename : str
+            Typename of mouse events with an optional name
+            (e.g. :code:`"click.foo"`)
+        listener : Callable[[Event, T | None, Mark], None] | None
+            Listener; :code:`None` removes the listener
+        active : bool
+            :code:`True` for activating the listener
+        in_flight : int | None
+            Maximum number of unacknowledged events (see
+            :code:`LiveSelection.on`)
+
+        Returns
+        -------
+        CanvasSelection
+            Itself
+        """
+        kind = self._kind
+        for event_type, name in parse_typenames(typename):
+            if parse_event(event_type) is not MouseEvent:
+                raise ValueError(
+                    f"Only mouse events are supported on marks, not {event_type!r}."
+                )
+            full_typename = f"{event_type}.marks-{kind}" + (f"-{name}" if name else "")
+            if listener is None:
+                self._canvas.on(full_typename, None)
+                continue
+
+            def hit(
+                event: MouseEvent,
+                d: Any,
+                node: etree.Element,
+                listener: Callable[[Event, T | None, Mark], None] = listener,
+            ) -> Any:
+                marks = CanvasMarks().layer(node, kind)
+                index = marks.find(
+                    event.client_x - event.rect_left, event.client_y - event.rect_top
+                )
+                if index is None:
+                    return None
+                return listener(event, marks.data[index], Mark(node, kind, index))
+
+            self._canvas.on(full_typename, hit, active=active, in_flight=in_flight)
+        return self
+
+    def remove(self) -> TCanvasSelection:
+        """
+        Removes selected marks.
+
+        Returns
+        -------
+        CanvasSelection
+            Empty selection
+        """
+        marks = self._marks
+        if self._indices is None:
+            marks.resize(0)
+        else:
+            marks.delete(self._indices)
+        tracker = DirtyTracker()
+        if tracker.recording:
+            tracker.marks(marks, 0, marks.size, list(marks.columns))
+        return CanvasSelection(self._canvas, self._kind, [])
+
+    def filter(self, predicate: Accessor[T, bool]) -> TCanvasSelection:
+        """
+        Returns marks for which :code:`predicate(d, i, selection)` is true.
+
+        Parameters
+        ----------
+        predicate : Accessor[T, bool]
+            Predicate
+
+        Returns
+        -------
+        CanvasSelection
+            Filtered selection
+        """
+        accessor = argpass(predicate)
+        data = self._marks.data
+        indices = [
+            i for j, i in enumerate(self._selected()) if accessor(data[i], j, self)
+        ]
+        return CanvasSelection(self._canvas, self._kind, indices)
+
+    def each(
+        self, callback: Callable[[Mark, T | None, int, Any], None]
+    ) -> TCanvasSelection:
+        """
+        Calls :code:`callback(mark, d, i, selection)` for each selected mark.
+
+        Parameters
+        ----------
+        callback : Callable[[Mark, T | None, int, Any], None]
+            Callback
+
+        Returns
+        -------
+        CanvasSelection
+            Itself
+        """
+        callback = argpass(callback)
+        for mark, d, j in zip(self.nodes(), self.data(), range(self.size())):
+            callback(mark, d, j, self)
+        return self
+
+    def call(self, func: Callable[..., Any], *args: Any) -> TCanvasSelection:
+        """
+        Calls :code:`func(selection, *args)` and returns itself.
+
+        Parameters
+        ----------
+        func : Callable[..., Any]
+            Function
+        *args : Any
+            Arguments
+
+        Returns
+        -------
+        CanvasSelection
+            Itself
+        """
+        func(self, *args)
+        return self
+
+    def nodes(self) -> list[Mark]:
+        """
+        Returns handles of selected marks.
+
+        Returns
+        -------
+        list[Mark]
+            Marks
+        """
+        canvas = self._canvas.node()
+        return [Mark(canvas, self._kind, i) for i in self._selected()]
+
+    def node(self) -> Mark | None:
+        """
+        Returns the handle of the first selected mark.
+
+        Returns
+        -------
+        Mark | None
+            Mark
+        """
+        selected = self._selected()
+        if not len(selected):
+            return None
+        return Mark(self._canvas.node(), self._kind, selected[0])
+
+    def size(self) -> int:
+        """
+        Returns the number of selected marks.
+
+        Returns
+        -------
+        int
+            Number of marks
+        """
+        return len(self._selected())
+
+    def __iter__(self) -> Iterator[Mark]:
+        return iter(self.nodes())
+
+    def __repr__(self) -> str:
+        return f"CanvasSelection(kind={self._kind!r}, size={self.size()})"
@@ -1,10 +1,11 @@
 from collections.abc import Callable
+from concurrent.futures import Executor
 from typing import Optional
 
 from detroit.types import T
 from lxml import etree
 
-from ..events import ContextListener, Event, EventListener, EventListeners
+from ..events import ContextListener, Event, EventListener, EventListeners, Offloader
 
 
 def on_add(
@@ -15,7 +16,12 @@ def on_add(
     html_nodes: list[etree.Element],
     active: bool,
     target: str | None,
+    in_flight: int | None,
+    executor: Executor | None = None,
 ) -> Callable[[str, str, etree.Element], None]:
+    if executor is not None:
+        listener = Offloader().listener(listener, executor)
+
     def on(typename: str, name: str, node: etree.Element):
         updated_nodes = [node] + extra_nodes
         event_listeners.add_event_listener(
@@ -30,6 +36,7 @@ def on_add(
                 ),
                 active,
                 target,
+                in_flight,
             )
         )
 
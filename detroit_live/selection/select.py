@@ -1,16 +1,17 @@
 from lxml import etree
 
+from .canvas import CanvasSelection, Mark
 from .selection import LiveSelection
 
 
-def select(node: etree.Element) -> LiveSelection:
+def select(node: etree.Element | Mark) -> LiveSelection | CanvasSelection:
     """
     Returns a selection object given a node
 
     Parameters
     ----------
-    node : etree.Element
-        Node
+    node : etree.Element | Mark
+        Node or mark drawn on a canvas (see :code:`CanvasSelection`)
     ref_selection : LiveSelection | None
         Reference selection for sharing data, tree and events attributes
 
@@ -19,4 +20,7 @@ def select(node: etree.Element) -> LiveSelection:
     LiveSelection
         Selection object
     """
+    if isinstance(node, Mark):
+        canvas = LiveSelection([[node.canvas]], [node.canvas])
+        return CanvasSelection(canvas, node.kind, [node.index])
     return LiveSelection([[node]], [node])
@@ -1,18 +1,34 @@
 import asyncio
+import warnings
 from collections.abc import Callable, Iterator
+from concurrent.futures import Executor
 from typing import Any, Optional, TypeVar
+from weakref import WeakKeyDictionary
 
 import orjson
 from detroit.selection import Selection
 from detroit.selection.enter import EnterNode
+from detroit.selection.namespace import namespace
 from detroit.types import Accessor, EtreeFunction, Number, T
 from lxml import etree
 from quart import websocket
 
 from ..dispatch import parse_typenames
-from ..events import Event, TrackingTree
+from ..events import (
+    BinaryEncoder,
+    Broadcaster,
+    DiffCoalescer,
+    Event,
+    EventListeners,
+    Session,
+    TrackingTree,
+    get_session,
+)
+from ..events.marks import KINDS, CanvasMarks
+from ..events.spatial import GEOMETRY_KEYS
 from .active import set_active
 from .app import App
+from .canvas import CanvasSelection
 from .on import on_add, on_remove
 from .shared import SharedState
 
@@ -126,9 +142,131 @@ class LiveSelection(Selection[T]):
     ):
         super().__init__(groups, parents, enter, exit, self._shared.data)
         self._shared.set_tree_root(self._parents)
-        self.event_listeners = self._shared.event_listeners
         self.event_producers = self._shared.event_producers
         self._tree = self._shared.tree
+        self._tracker = self._shared.tracker
+        self._index = self._shared.index
+
+    # Inside a session (see :code:`create_app(sessions=True)`), selected nodes
+    # are mapped to the nodes of the document copy of the session. Mapped
+    # lists are built once per session; in-place changes made on them only
+    # apply to this session.
+
+    def _session_view(self, session: Session) -> dict[str, Any]:
+        if (views := self.__views) is None:
+            views = self.__views = WeakKeyDictionary()
+        if (view := views.get(session)) is None:
+            view = views[session] = {}
+        return view
+
+    @property
+    def _groups(self) -> list[list[etree.Element]]:
+        if (session := get_session()) is None:
+            return self.__groups
+        view = self._session_view(session)
+        if (groups := view.get("groups")) is None:
+            node = session.node
+            groups = view["groups"] = [
+                [None if element is None else node(element) for element in group]
+                for group in self.__groups
+            ]
+        return groups
+
+    @_groups.setter
+    def _groups(self, groups: list[list[etree.Element]]):
+        self.__groups = groups
+        self.__views = None
+
+    @property
+    def _parents(self) -> list[etree.Element]:
+        if (session := get_session()) is None:
+            return self.__parents
+        view = self._session_view(session)
+        if (parents := view.get("parents")) is None:
+            parents = view["parents"] = list(map(session.node, self.__parents))
+        return parents
+
+    @_parents.setter
+    def _parents(self, parents: list[etree.Element]):
+        self.__parents = parents
+        self.__views = None
+
+    @property
+    def _exit(self) -> list[etree.Element] | None:
+        if (session := get_session()) is None or self.__exit is None:
+            return self.__exit
+        view = self._session_view(session)
+        if (exit := view.get("exit")) is None:
+            exit = view["exit"] = list(map(session.node, self.__exit))
+        return exit
+
+    @_exit.setter
+    def _exit(self, exit: list[etree.Element] | None):
+        self.__exit = exit
+        self.__views = None
+
+    @property
+    def _data(self) -> dict[etree.Element, T]:
+        if (session := get_session()) is None:
+            return self.__data
+        return session.data
+
+    @_data.setter
+    def _data(self, data: dict[etree.Element, T]):
+        self.__data = data
+
+    @property
+    def event_listeners(self) -> EventListeners:
+        return self._shared.event_listeners
+
+    def _record(self, key: str):
+        """
+        Records the original value of :code:`key` for each selected node when
+        dirty tracking is recording writes, increments the revision of the
+        document (see :code:`TrackingTree.touch`) and marks the geometry of
+        indexed nodes as outdated (see :code:`spatial_index`).
+
+        Parameters
+        ----------
+        key : str
+            Attribute name or :code:`"innerHTML"`
+        """
+        self._tree.touch()
+        if self._tracker.recording:
+            self._tracker.record(
+                (
+                    node._parent if isinstance(node, EnterNode) else node
+                    for group in self._groups
+                    for node in group
+                    if node is not None
+                ),
+                key,
+            )
+        if key in GEOMETRY_KEYS and self._index.enabled:
+            self._index.invalidate(
+                node for group in self._groups for node in group if node is not None
+            )
+
+    def _record_insert(self, nodes: Iterator[etree.Element]):
+        """
+        Records the insertion of appended nodes when writes are recorded.
+
+        Parameters
+        ----------
+        nodes : Iterator[etree.Element]
+            Appended nodes
+        """
+        tracker = self._tracker
+        references = {}
+        for node in nodes:
+            parent = node.getparent()
+            if parent is None or tracker.covered(node):
+                continue
+            if (parent_id := references.get(parent)) is None:
+                if not tracker.attached(parent):
+                    continue
+                parent_id = references[parent] = tracker.reference(parent)
+            tracker.insert(node, parent_id, None)
 
     def select(self, selection: str | None = None) -> TLiveSelection:
         """
@@ -215,10 +353,16 @@ class LiveSelection(Selection[T]):
         selection = super().select(selection)
         return LiveSelection(selection._groups, selection._parents)
 
-    def select_all(self, selection: str | None = None) -> TLiveSelection:
+    def select_all(
+        self, selection: str | None = None
+    ) -> TLiveSelection | CanvasSelection:
         """
         Selects all elements that match the specified :code:`selection` string.
 
+        On a selection of a single :code:`canvas` element, :code:`"circle"`
+        and :code:`"rect"` select marks drawn on the canvas instead (see
+        :code:`CanvasSelection`).
+
         Supported forms are:
 
         - :code:`{tag_name}{.class_name}{:last-of-type}`
@@ -298,6 +442,10 @@ class LiveSelection(Selection[T]):
             data={},
         )
         """
+        if selection in KINDS:
+            nodes = self.nodes()
+            if len(nodes) == 1 and etree.QName(nodes[0]).localname == "canvas":
+                return CanvasSelection(self, selection)
         selection = super().select_all(selection)
         return LiveSelection(selection._groups, selection._parents)
 
@@ -528,6 +676,9 @@ class LiveSelection(Selection[T]):
         </svg>
         """
         selection = super().append(name)
+        self._tree.insert(node for group in selection._groups for node in group)
+        if self._tracker.recording:
+            self._record_insert(node for group in selection._groups for node in group)
         return LiveSelection(
             selection._groups,
             selection._parents,
@@ -602,6 +753,13 @@ class LiveSelection(Selection[T]):
           <g class="labels" transform="translate(20, 10)"/>
         </svg>
         """
+        if value is not None:
+            fullname = namespace(name)
+            self._record(
+                f"{{{fullname['space']}}}{fullname['local']}"
+                if isinstance(fullname, dict)
+                else fullname
+            )
         selection = super().attr(name, value)
         return LiveSelection(
             selection._groups,
@@ -610,6 +768,117 @@ class LiveSelection(Selection[T]):
             exit=selection._exit,
         )
 
+    def attrs(self, columns: dict[str, Any]) -> TLiveSelection:
+        """
+        Sets several attributes on all selected elements at once from columns
+        of values, one value per selected element in order (see
+        :code:`nodes`). A column can be a NumPy array, which is formatted in a
+        single call, any sequence or a single value shared by all elements.
+
+        Unlike :code:`attr`, no function is called per element and, when
+        writes are recorded by the dirty tracker, they are sent as a single
+        columnar operation instead of one difference per element. This suits
+        :code:`tick` listeners moving thousands of elements.
+
+        Parameters
+        ----------
+        columns : dict[str, Any]
+            Values of each attribute name
+
+        Returns
+        -------
+        LiveSelection
+            Itself
+
+        Examples
+        --------
+
+        >>> svg = d3.create("svg")
+        >>> circles = svg.select_all("circle").data([1, 2]).join("circle")
+        >>> print(circles.attrs({"cx": [10, 20], "cy": 5}).to_string())
+        <svg xmlns="http://www.w3.org/2000/svg">
+          <circle cx="10" cy="5"/>
+          <circle cx="20" cy="5"/>
+        </svg>
+        """
+        nodes = [
+            node
+            for group in self._groups
+            for node in group
+            if node is not None and not isinstance(node, EnterNode)
+        ]
+        formatted = {}
+        for name, values in columns.items():
+            fullname = namespace(name)
+            key = (
+                f"{{{fullname['space']}}}{fullname['local']}"
+                if isinstance(fullname, dict)
+                else fullname
+            )
+            if isinstance(values, str) or not hasattr(values, "__len__"):
+                strings = [str(values)] * len(nodes)
+            elif hasattr(values, "dtype"):
+                # float32 values are formatted with their own shortest repr
+                if values.dtype.kind == "f" and values.dtype.itemsize < 8:
+                    strings = values.astype(str).tolist()
+                else:
+                    strings = list(map(str, values.tolist()))
+            else:
+                strings = [str(value) for value in values]
+            if len(strings) != len(nodes):
+                raise ValueError(
+                    f"Column {name!r} has {len(strings)} values for "
+                    f"{len(nodes)} elements."
+                )
+            for node, value in zip(nodes, strings):
+                node.set(key, value)
+            formatted[key] = strings
+        self._tree.touch()
+        if self._tracker.recording:
+            self._tracker.columns(nodes, formatted)
+        if self._index.enabled and not GEOMETRY_KEYS.isdisjoint(formatted):
+            self._index.invalidate(nodes)
+        return self
+
+    def spatial_index(self, enabled: bool = True) -> TLiveSelection:
+        """
+        Adds selected elements to (or removes them from) the server-side
+        spatial index (see :code:`SpatialIndex`). Circles, ellipses,
+        rectangles, polygons, polylines and paths are supported; their
+        geometry follows writes made through :code:`attr` and :code:`attrs`.
+
+        When every element having mouse listeners of a typename is indexed
+        (the first :code:`svg` element being allowed as well), the client
+        only sends coordinates of these events and the server resolves their
+        target itself. Elements must be indexed before the app is created.
+
+        Parameters
+        ----------
+        enabled : bool
+            :code:`False` removes selected elements from the index
+
+        Returns
+        -------
+        LiveSelection
+            Itself
+
+        Examples
+        --------
+
+        >>> circles.spatial_index().on("click", clicked)
+        """
+        nodes = (
+            node
+            for group in self._groups
+            for node in group
+            if node is not None and not isinstance(node, EnterNode)
+        )
+        if enabled:
+            self._index.add(nodes)
+        else:
+            self._index.discard(nodes)
+        return self
+
     def property(
         self, name: str, value: Accessor[T, Any] | list[Any] | Any | None = None
     ) -> TLiveSelection:
@@ -683,6 +952,8 @@ class LiveSelection(Selection[T]):
           <text style="fill:black;stroke:none;"/>
         </svg>
         """
+        if value is not None:
+            self._record("style")
         selection = super().style(name, value)
         return LiveSelection(
             selection._groups,
@@ -736,6 +1007,8 @@ class LiveSelection(Selection[T]):
         </svg>
 
         """
+        if value is not None:
+            self._record("innerHTML")
         selection = super().text(value)
         return LiveSelection(
             selection._groups,
@@ -832,6 +1105,8 @@ class LiveSelection(Selection[T]):
         >>> str(svg)
         '<svg xmlns="http://www.w3.org/2000/svg"><g class="myclass"/><g/></svg>'
         """
+        if value is not None:
+            self._record("class")
         selection = super().classed(names, value)
         return LiveSelection(
             selection._groups,
@@ -969,13 +1244,37 @@ class LiveSelection(Selection[T]):
         LiveSelection
             Itself
         """
-        selection = super().order()
-        return LiveSelection(
-            selection._groups,
-            selection._parents,
-            enter=selection._enter,
-            exit=selection._exit,
-        )
+        tracker = self._tracker
+        recording = tracker.recording
+        moved = set()
+        for group in self._groups:
+            next_node = None
+            for node in reversed(group):
+                if node is None or isinstance(node, EnterNode):
+                    continue
+                parent = node.getparent()
+                if (
+                    next_node is not None
+                    and parent is not None
+                    and parent is next_node.getparent()
+                    and not any(sibling is next_node for sibling in node.itersiblings())
+                ):
+                    if (
+                        recording
+                        and tracker.attached(parent)
+                        and not tracker.covered(node)
+                    ):
+                        tracker.move(
+                            tracker.reference(node),
+                            tracker.reference(parent),
+                            tracker.reference(next_node),
+                        )
+                    next_node.addprevious(node)
+                    moved.add((parent, node.tag))
+                next_node = node
+        for parent, tag in moved:
+            self._tree.update(parent, tag)
+        return self
 
     def join(
         self,
@@ -1210,7 +1509,21 @@ class LiveSelection(Selection[T]):
           </g>
         </svg>
         """
+        tracker = self._tracker
+        anchors = None
+        if tracker.recording:
+            anchors = [
+                (tracker.reference(group[0].getparent()), tracker.reference(group[0]))
+                if group and tracker.attached(group[0]) and not tracker.covered(group[0])
+                else None
+                for group in super().select_all(before)._groups
+            ]
         selection = super().insert(name, before)
+        self._tree.insert(node for group in selection._groups for node in group)
+        if anchors is not None:
+            for references, group in zip(anchors, selection._groups):
+                if references is not None and group:
+                    tracker.insert(group[0], *references)
         return LiveSelection(
             selection._groups,
             selection._parents,
@@ -1271,7 +1584,36 @@ class LiveSelection(Selection[T]):
         >>> print(svg.to_string())
         <svg xmlns="http://www.w3.org/2000/svg"/>
         """
+        tracker = self._tracker
+        nodes = [
+            node
+            for group in self._groups
+            for node in group
+            if node is not None
+            and not isinstance(node, EnterNode)
+            and node.getparent() is not None
+        ]
+        element_ids = None
+        pending = ()
+        if tracker.recording:
+            element_ids = [
+                tracker.reference(node)
+                for node in nodes
+                if tracker.attached(node) and not tracker.covered(node)
+            ]
+            pending = {node for node in nodes if tracker.pending(node)}
+        edited = {(node.getparent(), node.tag) for node in nodes}
         selection = super().remove()
+        for node in nodes:
+            if node in pending:
+                self._tree.release(node, ids=False)
+                tracker.release(node)
+            else:
+                self._tree.release(node)
+        for parent, tag in edited:
+            self._tree.update(parent, tag)
+        if element_ids:
+            tracker.remove(element_ids)
         return LiveSelection(
             selection._groups,
             selection._parents,
@@ -1340,9 +1682,40 @@ class LiveSelection(Selection[T]):
             Clone of itself
         """
         selection = super().clone(deep)
+        pairs = [
+            (node, cloned)
+            for group, clones in zip(self._groups, selection._groups)
+            for node, cloned in zip(group, clones)
+            if node is not None
+            and not isinstance(node, EnterNode)
+            and node.getparent() is not None
+        ]
+        tracker = self._tracker
+        inserts = None
+        if tracker.recording:
+            inserts = [
+                (
+                    cloned,
+                    tracker.reference(node.getparent()),
+                    tracker.reference(node.getnext()),
+                )
+                for node, cloned in pairs
+                if tracker.attached(node)
+            ]
+        data = self._data
+        for node, cloned in pairs:
+            node.addnext(cloned)
+            if cloned in selection._data:
+                data[cloned] = selection._data[cloned]
+        self._tree.insert(cloned for _, cloned in pairs)
+        if inserts:
+            # Recorded backwards: references computed before the insertions
+            # stay valid when the client applies them
+            for cloned, parent_id, anchor_id in reversed(inserts):
+                tracker.insert(cloned, parent_id, anchor_id)
         return LiveSelection(
             selection._groups,
-            selection._parents,
+            self._parents,
             enter=selection._enter,
             exit=selection._exit,
         )
@@ -1442,6 +1815,8 @@ class LiveSelection(Selection[T]):
         html_nodes: list[etree.Element] | None = None,
         active: bool = True,
         target: str | None = None,
+        in_flight: int | None = None,
+        executor: Executor | None = None,
     ) -> TLiveSelection:
         """
         Adds a listener to each selected element for the specified event
@@ -1453,7 +1828,9 @@ class LiveSelection(Selection[T]):
         typename : str
             Event typename
         listener : Callable[[Event, T | None, Optional[etree.Element]], None] | None
-            Listener function
+            Listener function; it may be asynchronous (:code:`async def`), in
+            which case it is awaited while other events keep being processed
+            and its updated values are sent once it is done
         extra_nodes : list[etree.Element] | None
             Extra nodes to update when the listener is called
         active: bool
@@ -1463,6 +1840,17 @@ class LiveSelection(Selection[T]):
             was activated.
         target : str | None
             Javascript target on which the event listener is added.
+        in_flight : int | None
+            For :code:`"mousemove"`, :code:`"wheel"`, :code:`"touchmove"` and
+            :code:`"input"` typenames, the client coalesces events to the
+            latest one (wheel deltas are summed) and sends at most
+            :code:`in_flight` events not acknowledged yet by the server
+            (:code:`1` by default).
+        executor : Executor | None
+            Thread pool or process pool in which the listener runs for
+            CPU-heavy work. The listener gets a detached copy of its inputs
+            and its attribute writes are applied back as one batch once it is
+            done (see :code:`Offloader`).
 
         Returns
         -------
@@ -1484,6 +1872,8 @@ class LiveSelection(Selection[T]):
                 html_nodes,
                 active,
                 target,
+                in_flight,
+                executor,
             )
         )
         nodes = [node for group in self._groups for node in group]
@@ -1527,11 +1917,23 @@ class LiveSelection(Selection[T]):
         html: Callable[[TLiveSelection, str], str] | None = None,
         host: str | None = None,
         port: int | None = None,
+        dirty_tracking: bool = False,
+        frame_window: float = 16.0,
+        binary: bool = False,
+        queue_size: int = 16,
+        queue_policy: str = "merge",
+        sessions: bool = False,
+        broadcast: bool = False,
+        send_buffer: int = 64,
     ) -> App:
         """
         Creates an application for allowing interactivity.
         Use :code:`App.run` to start the application.
 
+        Each node of the tree gets a numeric id stored in its
+        :code:`data-detroit-id` attribute when the page is rendered; updates
+        sent through websocket reference nodes by these ids.
+
         This is best used for development only, see Hypercorn for production
         servers.
 
@@ -1550,6 +1952,48 @@ class LiveSelection(Selection[T]):
             0.0.0.0 to have the server listen externally.
         port : int | None
             Port number to listen on.
+        dirty_tracking : bool
+            :code:`True` for sending only attributes written through
+            :code:`LiveSelection` methods (:code:`attr`, :code:`style`,
+            :code:`text`, :code:`html`, :code:`classed` and
+            :code:`property`) during listeners and timer callbacks, instead
+            of comparing snapshots of all :code:`extra_nodes` before and
+            after each call. Required by viewport culling (see
+            :code:`Zoom.set_culling`).
+        frame_window : float
+            Duration in milliseconds during which updated values are gathered
+            and merged (the latest value wins for each attribute of each node)
+            before being sent as one message; :code:`0` sends merged values
+            of each event or timer tick right away. Empty frames are never
+            sent.
+        binary : bool
+            :code:`True` for sending updated values in a compact binary
+            format (see :code:`BinaryEncoder`) instead of JSON; attribute
+            names are interned per connection and numeric values are packed
+            as float32 or float64 runs.
+        queue_size : int
+            Maximum number of pending frames produced by timer callbacks and
+            not consumed yet by the websocket.
+        queue_policy : str
+            Policy applied when the queue of timer frames is full:
+            :code:`"block"` pauses timers until a slot is free,
+            :code:`"drop-oldest"` drops the oldest pending frame and
+            :code:`"merge"` merges values into the newest pending frame.
+        sessions : bool
+            :code:`True` for isolating websocket connections: each connection
+            gets its own copy of the document (bound data, states of
+            listeners, zoom and drag behaviors) and its own copies of timers
+            which are not started yet. Values held by data and closures are
+            shared between connections.
+        broadcast : bool
+            :code:`True` for sharing the document between all websocket
+            connections (e.g. dashboards watched by many clients): updated
+            values of each frame are computed and encoded once, then sent to
+            every connection. Incompatible with :code:`sessions`.
+        send_buffer : int
+            Maximum number of pending messages per connection in broadcast
+            mode; when a slow connection exceeds it, its pending messages are
+            replaced by a snapshot of the document.
 
         Returns
         -------
@@ -1558,19 +2002,70 @@ class LiveSelection(Selection[T]):
         """
         import logging
 
+        if sessions and broadcast:
+            raise ValueError("Sessions cannot be used in broadcast mode.")
         logging.basicConfig(
             format="%(asctime)s [%(process)d] [%(levelname)s] %(message)s",
             datefmt="[%Y-%m-%d %H:%M:%S %z]",
             level=logging.WARNING,
         )
         app = App("detroit-live" if name is None else name)
+        self._tracker.enable(dirty_tracking)
+        if self._tracker.culling and not dirty_tracking:
+            warnings.warn(
+                "Viewport culling (see 'Zoom.set_culling') has no effect without "
+                "dirty tracking, use 'create_app(dirty_tracking=True)'.",
+                category=UserWarning,
+                stacklevel=2,
+            )
+        self._tree.enable_ids()
+        self.event_producers.configure_queue(queue_size, queue_policy)
         script = self.event_listeners.into_script(host, port)
+        broadcaster = (
+            Broadcaster(frame_window, binary, send_buffer) if broadcast else None
+        )
 
         @app.websocket("/ws")
         async def ws():
+            if broadcaster is not None:
+                return await subscribe()
+            if not sessions:
+                return await run()
+            session = Session(self._tree.root, self._shared.data)
+            session.enter()
+            try:
+                await run()
+            finally:
+                self.event_producers.cancel_tasks()
+                session.exit()
+
+        async def subscribe():
+            subscriber = broadcaster.subscribe(websocket.send)
+            try:
+                while True:
+                    event = orjson.loads(await websocket.receive())
+                    for values in self.event_listeners(event):
+                        if isinstance(values, asyncio.Task):
+                            broadcaster.add_task(values)
+                        else:
+                            broadcaster.extend(values)
+                    broadcaster.acknowledge(subscriber, event.get("typename"))
+                    # Listeners may have restarted timers
+                    broadcaster.start()
+            finally:
+                broadcaster.unsubscribe(subscriber)
+
+        async def run():
+            # Updated values gathered during the current frame window
+            coalescer = DiffCoalescer()
+            frame = None
+            encode = BinaryEncoder().encode if binary else orjson.dumps
             # Create pending asynchronous tasks
             # Websocket task
             pending = {asyncio.create_task(websocket.receive())}
+            # Marks drawn on canvases are not part of the page
+            if marks := CanvasMarks().snapshot(self._tree.root):
+                await websocket.send(encode(marks))
             # Timer tasks for starting event producers (timers)
             if next_tasks := self.event_producers.next_tasks():
                 pending.update(next_tasks)
@@ -1587,14 +2082,28 @@ class LiveSelection(Selection[T]):
                     # Result from websocket task
                     if isinstance(result, str):
                         event = orjson.loads(result)
-                        for json in self.event_listeners(event):
-                            await websocket.send(orjson.dumps(json))
+                        for values in self.event_listeners(event):
+                            # Asynchronous listeners are awaited as tasks
+                            if isinstance(values, asyncio.Task):
+                                pending.add(values)
+                            else:
+                                coalescer.extend(values)
+                        coalescer.acknowledge(event.get("typename"))
                         pending.add(asyncio.create_task(websocket.receive()))
                         result = None
+                    # Result from asynchronous listeners
+                    elif isinstance(result, list):
+                        coalescer.extend(result)
                     # Result from event producers (timers)
                     elif isinstance(result, tuple):
                         _source, values = result
-                        await websocket.send(orjson.dumps(values))
+                        coalescer.extend(values)
+                    # End of the frame window
+                    elif result is coalescer:
+                        frame = None
+                        if values := coalescer.flush():
+                            await websocket.send(encode(values))
+                        continue
 
                     # Updates next tasks and queue tasks from event producers
                     if next_tasks := self.event_producers.next_tasks(result):
@@ -1604,8 +2113,19 @@ class LiveSelection(Selection[T]):
                             queue_added = True
                             pending.add(queue)
 
+                # Sends merged values once per frame window
+                if coalescer and frame is None:
+                    if frame_window > 0:
+                        frame = asyncio.create_task(
+                            asyncio.sleep(frame_window / 1000, result=coalescer)
+                        )
+                        pending.add(frame)
+                    else:
+                        await websocket.send(encode(coalescer.flush()))
+
         @app.route("/")
         async def index():
+            self._tree.assign_ids()
             return default_html(self, script) if html is None else html(self, script)
 
         app._host = host
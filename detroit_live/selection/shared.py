@@ -2,16 +2,39 @@ from typing import Generic
 
 from lxml import etree
 
-from ..events import EventListeners, EventProducers, TrackingTree
+from ..events import (
+    DirtyTracker,
+    EventListeners,
+    EventProducers,
+    Offloader,
+    SpatialIndex,
+    TrackingTree,
+)
+from ..events.session import get_session
 from ..types import T
 
 
 class SharedState(Generic[T]):
     def __init__(self):
-        self.data: dict[etree.Element, T] = {}
-        self.event_listeners: EventListeners = EventListeners()
+        self.__data: dict[etree.Element, T] = {}
+        self.__event_listeners: EventListeners = EventListeners()
         self.event_producers: EventProducers = EventProducers()
         self.tree: TrackingTree = TrackingTree()
+        self.tracker: DirtyTracker = DirtyTracker()
+        self.index: SpatialIndex = SpatialIndex()
+        Offloader().set_data(self.__data)
+
+    @property
+    def data(self) -> dict[etree.Element, T]:
+        if (session := get_session()) is None:
+            return self.__data
+        return session.data
+
+    @property
+    def event_listeners(self) -> EventListeners:
+        if (session := get_session()) is None:
+            return self.__event_listeners
+        return session.state(EventListeners, self.__event_listeners.fork)
 
     def set_tree_root(self, nodes: list[etree.Element]):
         if self.tree.root is None and len(nodes) > 0:
@@ -1,11 +1,14 @@
 from .interval import Interval, interval
+from .scheduler import FrameScheduler, frame_scheduler
 from .timeout import timeout
 from .timer import Timer, TimerEvent, now, timer
 
 __all__ = [
+    "FrameScheduler",
     "Interval",
     "Timer",
     "TimerEvent",
+    "frame_scheduler",
     "interval",
     "now",
     "timeout",
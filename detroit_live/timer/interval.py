@@ -1,10 +1,17 @@
 import asyncio
 from collections.abc import Callable
+from typing import Any
 
+from .scheduler import FrameScheduler
 from .timer import Timer, TimerEvent, now
 
 
 class Interval(Timer):
+    def __init__(self):
+        super().__init__()
+        self._delay = 0
+        self._next = None
+
     async def restart(
         self,
         callback: Callable[[float, TimerEvent], None],
@@ -13,23 +20,39 @@ class Interval(Timer):
     ) -> int:
         try:
             starting_time = now() if starting_time is None else starting_time
-            delay = 0 if delay is None else delay * 1e-3
-            difftime = (starting_time - now()) * 1e-3 + delay
-            frame_freq = 504 * 1e-6
-            if difftime > 0:
-                await asyncio.sleep(difftime)
-
-            self._start = now()
+            self._delay = 0 if delay is None else delay * 1e-3
+            self._start = starting_time
+            self._next = starting_time + self._delay
             self._time_event = TimerEvent()
             self._callback = callback
-
-            while not self._time_event.is_set():
-                await asyncio.sleep(frame_freq + delay)
-                self._callback((now() - self._start) * 1e3, self._time_event)
+            await FrameScheduler().schedule(self)
             return id(self)
         except asyncio.CancelledError:
             return id(self)
 
+    def tick(self, frame_time: float) -> Any:
+        """
+        Calls the callback with the elapsed time in milliseconds every
+        :code:`delay` milliseconds; called by :code:`FrameScheduler` at each
+        frame.
+
+        Parameters
+        ----------
+        frame_time : float
+            Time of the current frame
+
+        Returns
+        -------
+        Any
+            Result of the callback
+        """
+        if frame_time < self._next:
+            return
+        self._next += self._delay
+        if self._next <= frame_time:
+            self._next = frame_time + self._delay
+        return self._callback((frame_time - self._start) * 1e3, self._time_event)
+
 
 async def interval(
     callback: Callable[[float, TimerEvent], None],
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from contextvars import copy_context
+from functools import partial
+from inspect import isawaitable
+from typing import Any, Protocol
+
+
+class Tickable(Protocol):
+    def tick(self, frame_time: float) -> Any: ...
+
+    def is_stopped(self) -> bool: ...
+
+
+class SchedulerState:
+    """
+    Shared state of :code:`FrameScheduler`.
+
+    Attributes
+    ----------
+    frame_rate : float
+        Number of frames per second
+    timers : dict[Tickable, tuple[asyncio.Future, Context]]
+        Active timers mapped to futures resolved when they stop and to the
+        contexts in which they were scheduled
+    task : asyncio.Task | None
+        Task running frames
+    clock : float | None
+        Time of the current frame; :code:`None` outside of a frame
+    """
+
+    __slots__ = "frame_rate", "timers", "task", "clock"
+
+    def __init__(self):
+        self.frame_rate = 60.0
+        self.timers = {}
+        self.task = None
+        self.clock = None
+
+
+class FrameScheduler:
+    """
+    Frame scheduler which drives all active timers: at each frame, callbacks of
+    all timers are called in one pass with the same frame time; therefore, any
+    number of timers costs one wakeup of the event loop per frame. A timer
+    whose callback returns an awaitable is paused until the awaitable is done
+    while other timers keep ticking.
+
+    The scheduler runs only while timers are active. Once configured, this
+    object can be used globally without futher configuration.
+    """
+
+    __state = SchedulerState()
+
+    @property
+    def frame_rate(self) -> float:
+        """
+        Returns the number of frames per second.
+
+        Returns
+        -------
+        float
+            Frame rate
+        """
+        return self.__state.frame_rate
+
+    @frame_rate.setter
+    def frame_rate(self, frame_rate: float):
+        if frame_rate <= 0:
+            raise ValueError(f"Invalid frame rate: {frame_rate}")
+        self.__state.frame_rate = frame_rate
+
+    @property
+    def clock(self) -> float | None:
+        """
+        Returns the time of the current frame or :code:`None` outside of a
+        frame.
+
+        Returns
+        -------
+        float | None
+            Frame time
+        """
+        return self.__state.clock
+
+    async def schedule(self, timer: Tickable):
+        """
+        Adds the timer to active timers and waits until it stops. The timer
+        is ticked in the context of the caller (e.g. the session of a
+        websocket connection).
+
+        Parameters
+        ----------
+        timer : Tickable
+            Timer
+        """
+        state = self.__state
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        state.timers[timer] = (future, copy_context())
+        task = state.task
+        if task is None or task.done() or task.get_loop() is not loop:
+            state.task = asyncio.create_task(self._run())
+        try:
+            await future
+        finally:
+            state.timers.pop(timer, None)
+
+    async def _run(self):
+        state = self.__state
+        timers = state.timers
+        loop = asyncio.get_running_loop()
+        # Drops timers left by a closed event loop
+        for timer, (future, _) in list(timers.items()):
+            if future.get_loop() is not loop:
+                timers.pop(timer)
+        # Timers paused until their awaitable (asynchronous callback or full
+        # queue) is done; other timers keep ticking meanwhile
+        busy = {}
+        next_frame = time.perf_counter()
+        while timers:
+            delay = next_frame - time.perf_counter()
+            await asyncio.sleep(max(0.0, delay))
+            frame_time = state.clock = time.perf_counter()
+            try:
+                for timer, (future, context) in list(timers.items()):
+                    if future.done() or timer in busy:
+                        continue
+                    if not timer.is_stopped():
+                        try:
+                            result = context.run(timer.tick, frame_time)
+                        except Exception as exception:
+                            future.set_exception(exception)
+                            continue
+                        if isawaitable(result):
+                            task = context.run(asyncio.ensure_future, result)
+                            busy[timer] = task
+                            task.add_done_callback(
+                                partial(self._resume, busy, timer, future)
+                            )
+                            continue
+                    if timer.is_stopped():
+                        future.set_result(None)
+            finally:
+                state.clock = None
+            next_frame = max(frame_time + 1 / state.frame_rate, time.perf_counter())
+        for task in busy.values():
+            task.cancel()
+
+    @staticmethod
+    def _resume(
+        busy: dict[Tickable, asyncio.Task],
+        timer: Tickable,
+        future: asyncio.Future,
+        task: asyncio.Task,
+    ):
+        busy.pop(timer, None)
+        if future.done() or task.cancelled():
+            return
+        if (exception := task.exception()) is not None:
+            future.set_exception(exception)
+        elif timer.is_stopped():
+            future.set_result(None)
+
+
+def frame_scheduler() -> FrameScheduler:
+    """
+    Returns the frame scheduler which drives all active timers.
+
+    Returns
+    -------
+    FrameScheduler
+        Frame scheduler
+    """
+    return FrameScheduler()
@@ -1,6 +1,9 @@
 import asyncio
 import time
 from collections.abc import Callable
+from typing import Any
+
+from .scheduler import FrameScheduler
 
 
 def now() -> float:
@@ -10,16 +13,15 @@ def now() -> float:
     The current time is updated at the start of a frame; it is thus consistent
     during the frame, and any timers scheduled during the same frame will be
     synchronized. If this method is called outside of a frame, such as in
-    response to a user event, the current time is calculated and then fixed
-    until the next frame, again ensuring consistent timing during event
-    handling.
+    response to a user event, the current time is calculated.
 
     Returns
     -------
     float
         Current time value
     """
-    return time.perf_counter()
+    clock = FrameScheduler().clock
+    return time.perf_counter() if clock is None else clock
 
 
 class TimerEvent:
@@ -51,22 +53,36 @@ class Timer:
         try:
             starting_time = now() if starting_time is None else starting_time
             delay = 0 if delay is None else delay * 1e-3
-            difftime = (starting_time - now()) * 1e-3 + delay
-            frame_freq = 504 * 1e-6
-            if difftime > 0:
-                await asyncio.sleep(frame_freq)
-
-            self._start = now()
+            self._start = starting_time + delay
             self._time_event = TimerEvent()
             self._callback = callback
-
-            while not self._time_event.is_set():
-                await asyncio.sleep(frame_freq)
-                self._callback((now() - self._start) * 1e3, self._time_event)
+            await FrameScheduler().schedule(self)
             return id(self)
         except asyncio.CancelledError:
             return id(self)
 
+    def tick(self, frame_time: float) -> Any:
+        """
+        Calls the callback with the elapsed time in milliseconds if the timer
+        has started; called by :code:`FrameScheduler` at each frame.
+
+        Parameters
+        ----------
+        frame_time : float
+            Time of the current frame
+
+        Returns
+        -------
+        Any
+            Result of the callback
+        """
+        if frame_time < self._start:
+            return
+        return self._callback((frame_time - self._start) * 1e3, self._time_event)
+
+    def is_stopped(self) -> bool:
+        return self._time_event.is_set()
+
     def stop(self):
         self._time_event.set()
 
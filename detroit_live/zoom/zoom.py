@@ -1,15 +1,28 @@
+import json
 import warnings
+from bisect import bisect_right
 from collections.abc import Callable
 from math import hypot, inf, nan, sqrt
 from typing import TypeVar
 
+from detroit.ease import ease_cubic
 from detroit.interpolate import interpolate_zoom
 from detroit.types import Accessor, EtreeFunction
 from lxml import etree
 
 from ..dispatch import Dispatch, dispatch
-from ..events import Event, MouseEvent, WheelEvent, pointer
+from ..events import (
+    DirtyTracker,
+    Event,
+    EventProducers,
+    MouseEvent,
+    SessionAttribute,
+    TrackingTree,
+    WheelEvent,
+    pointer,
+)
 from ..selection import LiveSelection, select
+from ..timer import TimerEvent, now
 from ..types import EventFunction, Extent, T
 from .noevent import noevent
 from .transform import Transform, identity
@@ -83,8 +96,8 @@ def default_constrain(
 ) -> Transform:
     dx0 = transform.invert_x(extent[0][0]) - translate_extent[0][0]
     dx1 = transform.invert_x(extent[1][0]) - translate_extent[1][0]
-    dy0 = transform.invert_x(extent[0][1]) - translate_extent[0][1]
-    dy1 = transform.invert_x(extent[1][1]) - translate_extent[1][1]
+    dy0 = transform.invert_y(extent[0][1]) - translate_extent[0][1]
+    dy1 = transform.invert_y(extent[1][1]) - translate_extent[1][1]
     return transform.translate(
         (dx0 + dx1) * 0.5 if dx1 > dx0 else min(0, dx0) or max(0, dx1),
         (dy0 + dy1) * 0.5 if dy1 > dy0 else min(0, dy0) or max(0, dy1),
@@ -139,6 +152,7 @@ class Gesture:
         if self.touch1 and key != "touch":
             self.touch1[1] = transform.invert(self.touch1[0])
         self._shared.set_zoom(self._node, transform)
+        self._zoom._detail(self._node, transform)
         self.emit("zoom")
         return self
 
@@ -180,6 +194,19 @@ class Zoom:
 
     _shared = _zoom_state
 
+    # States of gestures are specific to each session
+    _touch_starting = SessionAttribute()
+    _touch_first = SessionAttribute()
+    _touch_ending = SessionAttribute()
+    _x0 = SessionAttribute()
+    _y0 = SessionAttribute()
+    _g = SessionAttribute()
+    _v = SessionAttribute()
+    _transitions = SessionAttribute()
+    _wheels = SessionAttribute()
+    _driving = SessionAttribute()
+    _driver = SessionAttribute()
+
     def __init__(self, extra_nodes: list[etree.Element] | None = None):
         self._extra_nodes = extra_nodes
         self._filter = default_filter
@@ -199,11 +226,21 @@ class Zoom:
         self._wheel_delay = 150
         self._click_distance2 = 0
         self._tap_distance = 10
+        self._culling = None
+        self._levels = []
+        self._level_of_detail = None
+        self._predictive = None
 
         self._x0 = nan
         self._y0 = nan
         self._g = None
         self._v = None
+        # Running transitions, wheel gestures and their driver, a timer ticked
+        # by the frame scheduler while at least one of them runs
+        self._transitions = {}
+        self._wheels = {}
+        self._driving = False
+        self._driver = None
 
     def __call__(self, selection: LiveSelection):
         """
@@ -218,6 +255,7 @@ class Zoom:
             Selection
         """
         selection.each(default_transform)
+        selection.each(self._viewport)
         (
             selection.on("wheel.zoom", self._wheeled, extra_nodes=self._extra_nodes)
             .on("mousedown.zoom", self._mouse_downed, extra_nodes=self._extra_nodes)
@@ -292,9 +330,41 @@ class Zoom:
                     .end()
                 )
 
-            # selection.interrupt
+            selection.each(self._interrupt)
             selection.each(each_func)
 
+    def transition(
+        self,
+        selection: LiveSelection,
+        transform: EtreeFunction[T, Transform] | Transform,
+        point: EtreeFunction[T, tuple[float, float]]
+        | tuple[float, float]
+        | None = None,
+        event: Event | None = None,
+    ):
+        """
+        Same as :code:`zoom.transform` but the transform is interpolated with
+        :code:`zoom.interpolate` over :code:`zoom.duration` milliseconds,
+        emitting a start event, a zoom event per frame and an end event.
+        Frames of all transitions are driven by a single timer of the frame
+        scheduler. A transition is interrupted by any gesture or transform
+        applied on the same element.
+
+        Parameters
+        ----------
+        selection : LiveSelection
+            Selection
+        transform : EtreeFunction[T, Transform] | Transform
+            Transform object or function which returns a tranform object
+        point : EtreeFunction[T, tuple[float, float]] | tuple[float, float] | None
+            2D point kept in place during the transition; the center of the
+            viewport extent by default
+        event : Event | None
+            Event
+        """
+        selection.each(default_transform)
+        self._schedule(selection, transform, point, event)
+
     def scale_by(
         self,
         selection: LiveSelection,
@@ -527,9 +597,134 @@ class Zoom:
         else:
             return Transform(transform.k, x, y)
 
-    def _schedule(transition, transform, point, event):
-        # TODO
-        pass
+    def _viewport(self, node: etree.Element):
+        if self._culling is not None:
+            DirtyTracker().set_viewport(node, self._extent, self._culling)
+        if self._level_of_detail is not None:
+            k = self._shared.get_zoom(node).k
+            self._shared.set_level(node, bisect_right(self._levels, k))
+        if self._predictive is not None:
+            select(node).event_listeners.set_script(
+                (Zoom, node), lambda: self._script(node)
+            )
+
+    def _script(self, node: etree.Element) -> str:
+        ttree = TrackingTree()
+        transform = self._shared.get_zoom(node) or identity
+        options = {
+            "z": [transform.k, transform.x, transform.y],
+            "k": self._scale_extent,
+            "e": self._extent(node),
+            "t": self._translate_extent,
+            "d": self._wheel_delay,
+        }
+        viewport = json.dumps(ttree.get_reference(node))
+        target = json.dumps(ttree.get_reference(self._predictive))
+        return f"Z({viewport}, {target}, {json.dumps(options)});"
+
+    def _detail(self, node: etree.Element, transform: Transform):
+        if self._level_of_detail is None:
+            return
+        level = bisect_right(self._levels, transform.k)
+        if level == self._shared.get_level(node):
+            return
+        self._shared.set_level(node, level)
+        self._level_of_detail(level, transform, node)
+
+    def _schedule(
+        self,
+        selection: LiveSelection,
+        transform: EtreeFunction[T, Transform] | Transform,
+        point: EtreeFunction[T, tuple[float, float]] | tuple[float, float] | None,
+        event: Event,
+    ):
+        def each_func(node: etree.Element, d: T, i: int, group: list[etree.Element]):
+            self._interrupt(node)
+            g = self._gesture(node).event(event).start()
+            e = self._extent(node)
+            p = point(node, d, i, group) if callable(point) else point
+            p = centroid(e) if p is None else p
+            w = max(e[1][0] - e[0][0], e[1][1] - e[0][1])
+            a = self._shared.get_zoom(node)
+            b = (
+                transform
+                if isinstance(transform, Transform)
+                else transform(node, d, i, group)
+            )
+            interpolate = self._interpolate(
+                [*a.invert(p), w / a.k], [*b.invert(p), w / b.k]
+            )
+
+            def tween(t: float):
+                if t >= 1:  # Avoids rounding errors at the end
+                    g.zoom(None, b)
+                    return
+                view = interpolate(ease_cubic(t))
+                k = w / view[2]
+                g.zoom(None, Transform(k, p[0] - view[0] * k, p[1] - view[1] * k))
+
+            self._transitions[node] = (now(), g, tween)
+
+        selection.each(each_func)
+        if self._transitions:
+            self._drive()
+
+    def _drive(self):
+        if self._driving:
+            return
+        self._driving = True
+        if self._driver is None:
+            self._driver = EventProducers().add_timer(self._tick, self._extra_nodes)
+        else:
+            self._driver.restart(self._tick)
+
+    def _tick(self, elapsed: float, timer_event: TimerEvent):
+        clock = now()
+        transitions = self._transitions
+        for node, transition in list(transitions.items()):
+            # Listeners may interrupt other transitions
+            if transitions.get(node) is not transition:
+                continue
+            start, g, tween = transition
+            t = (clock - start) * 1e3 / self._duration if self._duration > 0 else 1
+            tween(min(1, t))
+            if t >= 1 and transitions.get(node) is transition:
+                del transitions[node]
+                g.end()
+        # Wheel deltas received since the last frame make a single zoom step
+        wheels = self._wheels
+        for node, g in list(wheels.items()):
+            delta, last = g.wheel
+            if delta:
+                g.wheel[0] = 0.0
+                t = self._shared.get_zoom(node)
+                k = max(
+                    self._scale_extent[0],
+                    min(self._scale_extent[1], t.k * pow(2, delta)),
+                )
+                g.zoom(
+                    "mouse",
+                    self._constrain(
+                        self._translate(self._scale(t, k), g.mouse[0], g.mouse[1]),
+                        g.extent,
+                        self._translate_extent,
+                    ),
+                )
+            elif (clock - last) * 1e3 >= self._wheel_delay:
+                del wheels[node]
+                g.wheel = None
+                g.end()
+        if not (transitions or wheels):
+            self._driving = False
+            timer_event.set()
+
+    def _interrupt(self, node: etree.Element):
+        if (transition := self._transitions.pop(node, None)) is None:
+            return
+        transition[1].end()
+        if not (self._transitions or self._wheels) and self._driving:
+            self._driving = False
+            self._driver.stop()
 
     def _gesture(self, node: etree.Element, clean: bool = False) -> Gesture:
         return (None if clean else self._shared.get_zooming(node)) or Gesture(
@@ -544,41 +739,31 @@ class Zoom:
             return
         g = self._gesture(node).event(event)
         t = self._shared.get_zoom(node)
-        k = max(
-            self._scale_extent[0],
-            min(self._scale_extent[1], t.k * pow(2, self._wheel_delta(event))),
-        )
+        delta = self._wheel_delta(event)
         p = pointer(event)
 
         if g.wheel:
             if g.mouse[0][0] != p[0] or g.mouse[0][1] != p[1]:
                 g.mouse[0] = p
                 g.mouse[1] = t.invert(p)
-            # clearTimeout(g.wheel)
-        elif t.k == k:
+        elif t.k == max(
+            self._scale_extent[0],
+            min(self._scale_extent[1], t.k * pow(2, delta)),
+        ):
             return
         else:
             g.mouse = [p, t.invert(p)]
-            # interrupt(node)
+            self._interrupt(node)
             g.start()
+            # Sum of wheel deltas not applied yet and time of the last event;
+            # the gesture ends after `wheel_delay` milliseconds of inactivity
+            g.wheel = [0.0, 0.0]
+            self._wheels[node] = g
 
         noevent(event, d, node)
-        # def wheel_idled():
-        #     ._wheel = None
-        #     g.end()
-        # g.wheel = setTimeout(wheel_idled, self._wheel_delay)
-        g.zoom(
-            "mouse",
-            self._constrain(
-                self._translate(
-                    self._scale(t, k),
-                    g.mouse[0],
-                    g.mouse[1],
-                ),
-                g.extent,
-                self._translate_extent,
-            ),
-        )
+        g.wheel[0] += delta
+        g.wheel[1] = now()
+        self._drive()
 
     def _mouse_downed(self, event: MouseEvent, d: T | None, node: etree.Element):
         if self._touch_ending or not self._filter(event, d, node):
@@ -590,7 +775,7 @@ class Zoom:
         self._y0 = event.client_y
 
         g.mouse = [p, self._shared.get_zoom(node).invert(p)]
-        # interrupt(node)
+        self._interrupt(node)
         g.start()
 
     def _mouse_moved(self, event: MouseEvent, d: T | None, node: etree.Element):
@@ -634,11 +819,10 @@ class Zoom:
         )
 
         noevent(event, d, node)
-        # Transition not supported for the moment
-        # if self._duration > 0:
-        #     select(node).transition().duration(duration).call(self._schedule, t1, p0, event)
-        # else:
-        select(node).call(self.transform, t1, p0, event)
+        if self._duration > 0:
+            self._schedule(select(node), t1, p0, event)
+        else:
+            select(node).call(self.transform, t1, p0, event)
 
     def _touch_started(self, event: Event, d: T | None, node: etree.Element):
         if not self._filter(event, d, node):
@@ -668,7 +852,7 @@ class Zoom:
                     # def timeout():
                     #     self._touch_starting = None
                     # self._touch_starting = setTimeout(timeout, self._touch_delay)
-                # interrupt(node)
+                self._interrupt(node)
                 g.start()
 
     def _touch_moved(self, event: Event, d: T | None, node: etree.Element):
@@ -1021,6 +1205,129 @@ class Zoom:
         self._interpolate = interpolation
         return self
 
+    def set_culling(self, culling: bool = True, padding: float = 0) -> TZoom:
+        """
+        Enables or disables viewport culling and returns the zoom behavior.
+        When enabled, the zoom extent of each element on which the behavior
+        is applied becomes a viewport: differences of descendant shapes which
+        lie outside of the extent, once mapped through the transforms of their
+        ancestors (including the current transform written by zoom
+        listeners), are not sent until the shapes come back into view (see
+        :code:`DirtyTracker.set_viewport`). It must be set before applying the
+        behavior and requires dirty tracking: :code:`LiveSelection.create_app`
+        warns when it is called without :code:`dirty_tracking=True`.
+
+        Parameters
+        ----------
+        culling : bool
+            :code:`True` for enabling culling
+        padding : float
+            Margin added around the extent, useful for shapes whose stroke
+            overflows their geometry
+
+        Returns
+        -------
+        Zoom
+            Itself
+
+        Examples
+        --------
+
+        >>> zoom = d3.zoom().set_culling(True, padding=10).on("zoom", zoomed)
+        >>> svg.call(zoom)
+        >>> app = svg.create_app(dirty_tracking=True)
+        """
+        self._culling = padding if culling else None
+        return self
+
+    def set_level_of_detail(
+        self,
+        levels: list[float],
+        level_of_detail: Callable[[int, Transform, etree.Element], None] | None,
+    ) -> TZoom:
+        """
+        Sets the level-of-detail hook and returns the zoom behavior. Scale
+        factors in :code:`levels` split the scale extent in levels; the hook
+        is called with the new level (the number of values in :code:`levels`
+        lower than or equal to :math:`k`), the transform and the element
+        whenever a zoom event changes the level, before zoom listeners. It
+        typically aggregates dense regions of a chart when zoomed out and
+        restores individual marks when zoomed in. If :code:`level_of_detail`
+        is :code:`None`, removes the hook.
+
+        Parameters
+        ----------
+        levels : list[float]
+            Scale factors which separate levels
+        level_of_detail : Callable[[int, Transform, etree.Element], None] | None
+            Hook called when the level changes
+
+        Returns
+        -------
+        Zoom
+            Itself
+
+        Examples
+        --------
+
+        >>> def detail(level, transform, node):
+        ...     if level == 0:  # k < 0.5
+        ...         points.remove()
+        ...         bins.data(hexbin(data)).join("path")
+        ...     else:
+        ...         bins.remove()
+        ...         points.data(data).join("circle")
+        >>> zoom = d3.zoom().set_level_of_detail([0.5], detail)
+        """
+        self._levels = sorted(levels)
+        self._level_of_detail = level_of_detail
+        return self
+
+    def set_predictive(
+        self, target: LiveSelection | etree.Element | None
+    ) -> TZoom:
+        """
+        Enables client-side prediction of pans and zooms on the specified
+        target (typically the group whose :code:`transform` attribute is
+        written by zoom listeners) and returns the zoom behavior. The client
+        applies wheel zooms and mouse pans to the target immediately with the
+        extent, scale extent and translate extent of the behavior, while the
+        server still runs listeners and sends the authoritative transform.
+        Transforms received during a gesture are held back; once the gesture
+        is idle for :code:`wheel_delay` milliseconds and no event remains
+        unacknowledged, the client reconciles to the last one. It must be set
+        before applying the behavior; :code:`None` disables prediction.
+
+        The client mirrors the default wheel delta, filter and constrain
+        functions; prediction may be off until reconciliation when custom
+        ones are set.
+
+        Parameters
+        ----------
+        target : LiveSelection | etree.Element | None
+            Transformed element
+
+        Returns
+        -------
+        Zoom
+            Itself
+
+        Examples
+        --------
+
+        >>> g = svg.append("g")
+        >>> zoom = (
+        ...     d3.zoom()
+        ...     .set_predictive(g)
+        ...     .on("zoom", lambda event, d, node: g.attr("transform", event.transform))
+        ... )
+        >>> svg.call(zoom)
+        """
+        if isinstance(target, LiveSelection):
+            target = target.node()
+        self._predictive = target
+        return self
+
     def set_click_distance(self, click_distance: int | float) -> TZoom:
         """
         Sets the maximum distance that the mouse can move between mousedown and
@@ -1091,6 +1398,17 @@ class Zoom:
     def get_interpolation(self) -> Callable[[float, float], Callable[[float], float]]:
         return self._interpolate
 
+    def get_culling(self) -> bool:
+        return self._culling is not None
+
+    def get_level_of_detail(
+        self,
+    ) -> Callable[[int, Transform, etree.Element], None] | None:
+        return self._level_of_detail
+
+    def get_predictive(self) -> etree.Element | None:
+        return self._predictive
+
     def get_click_distance(self) -> float:
         return sqrt(self._click_distance2)
 
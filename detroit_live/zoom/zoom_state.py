@@ -2,6 +2,7 @@ from typing import TypeVar
 
 from lxml import etree
 
+from ..events.session import Session, get_session
 from .transform import Transform, identity
 
 Gesture = TypeVar("Gesture", bound="Gesture")
@@ -11,24 +12,45 @@ class ZoomState:
     def __init__(self):
         self.__zoom = {}
         self.__zooming = {}
+        self.__levels = {}
+
+    def fork(self, session: Session) -> "ZoomState":
+        state = ZoomState()
+        for node, transform in self.__zoom.items():
+            state.__zoom[session.node(node)] = transform
+        for node, level in self.__levels.items():
+            state.__levels[session.node(node)] = level
+        return state
+
+    @property
+    def _state(self) -> "ZoomState":
+        if (session := get_session()) is None:
+            return self
+        return session.state(ZoomState, self.fork)
 
     def set_zoom(self, node: etree.Element, transform: Transform):
-        self.__zoom[node] = transform
+        self._state.__zoom[node] = transform
 
     def get_zoom(self, node: etree.Element) -> Transform | None:
-        return self.__zoom.get(node)
+        return self._state.__zoom.get(node)
 
     def remove_zoom(self, node: etree.Element):
-        self.__zoom.pop(node, None)
+        self._state.__zoom.pop(node, None)
 
     def set_zooming(self, node: etree.Element, gesture: Gesture):
-        self.__zooming[node] = gesture
+        self._state.__zooming[node] = gesture
 
     def get_zooming(self, node: etree.Element) -> Gesture | None:
-        return self.__zooming.get(node)
+        return self._state.__zooming.get(node)
 
     def remove_zooming(self, node: etree.Element):
-        self.__zooming.pop(node, None)
+        self._state.__zooming.pop(node, None)
+
+    def set_level(self, node: etree.Element, level: int):
+        self._state.__levels[node] = level
+
+    def get_level(self, node: etree.Element) -> int | None:
+        return self._state.__levels.get(node)
 
 
 _zoom_state = ZoomState()
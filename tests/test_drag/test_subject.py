@@ -0,0 +1,148 @@
+import random
+
+import pytest
+from detroit.force import force_many_body
+
+import detroit_live as d3
+from detroit_live.drag import QuadtreeSubject
+from detroit_live.events import EventProducers, MouseEvent
+from detroit_live.events.event_producers import SharedState
+from detroit_live.events.spatial import Quadtree
+from detroit_live.events.tracking_tree import TrackingTree
+from detroit_live.timer import TimerEvent
+
+
+@pytest.fixture(autouse=True)
+def shared_state(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+
+
+def brute_force(nodes, x, y, radius=None):
+    best = float("inf") if radius is None else radius * radius
+    closest = None
+    for node in nodes:
+        distance = (node["x"] - x) ** 2 + (node["y"] - y) ** 2
+        if distance < best:
+            best = distance
+            closest = node
+    return closest
+
+
+def mouse_event(x, y):
+    return MouseEvent(
+        x=x,
+        y=y,
+        client_x=x,
+        client_y=y,
+        page_x=x,
+        page_y=y,
+        button=0,
+        ctrl_key=False,
+        shift_key=False,
+        alt_key=False,
+        element_id="svg",
+        rect_top=0,
+        rect_left=0,
+    )
+
+
+def test_quadtree_nearest():
+    random.seed(1)
+    quadtree = Quadtree()
+    points = [(random.random() * 500, random.random() * 300) for _ in range(2000)]
+    for i, (x, y) in enumerate(points):
+        quadtree.insert(i, (x, y, x, y))
+    for _ in range(200):
+        x, y = random.random() * 600 - 50, random.random() * 400 - 50
+        distances = [(px - x) ** 2 + (py - y) ** 2 for px, py in points]
+        expected = min(range(len(points)), key=distances.__getitem__)
+        assert quadtree.nearest(x, y) == expected
+        assert quadtree.nearest(x, y, 5) == (
+            expected if distances[expected] < 25 else None
+        )
+    assert Quadtree().nearest(0, 0) is None
+
+
+def test_subject():
+    random.seed(2)
+    nodes = [
+        {"x": random.random() * 100, "y": random.random() * 100} for _ in range(500)
+    ]
+    subject = QuadtreeSubject(nodes, radius=10)
+    assert len(subject) == 500
+    for _ in range(100):
+        x, y = random.random() * 120 - 10, random.random() * 120 - 10
+        assert subject.find(x, y) is brute_force(nodes, x, y, 10)
+        assert subject.find(x, y, 1000) is brute_force(nodes, x, y)
+
+    nodes[0]["x"], nodes[0]["y"] = 500, 500
+    assert subject.find(500, 500) is None
+    assert subject.update([0]).find(500, 500) is nodes[0]
+
+    points = [(1, 2), (3, 4)]
+    subject = QuadtreeSubject(points, lambda d: d[0], lambda d: d[1])
+    assert subject.find(2.9, 4) == (3, 4)
+    assert subject.set_x(lambda d: -d[0]).find(-1, 2) == (1, 2)
+
+
+def test_subject_simulation():
+    random.seed(3)
+    simulation = d3.force_simulation(
+        [{"x": random.random() * 100, "y": random.random() * 100} for _ in range(300)]
+    ).set_force("charge", force_many_body())
+    subject = QuadtreeSubject(radius=5).bind(simulation)
+    nodes = simulation.get_nodes()
+    assert subject.get_data() is nodes
+    for _ in range(10):
+        simulation._step(0, TimerEvent())
+        for _ in range(20):
+            x, y = random.random() * 200 - 50, random.random() * 200 - 50
+            assert subject.find(x, y) is brute_force(nodes, x, y, 5)
+
+    nodes = [{"x": 0, "y": 0}, {"x": 50, "y": 50}]
+    simulation.set_nodes(nodes)
+    simulation._step(0, TimerEvent())
+    assert len(subject) == 2
+    assert subject.find(nodes[1]["x"], nodes[1]["y"]) is nodes[1]
+
+
+def test_subject_simulation_numpy():
+    pytest.importorskip("numpy")
+    random.seed(4)
+    svg = d3.create("svg")
+    simulation = d3.force_simulation(
+        [{"x": random.random() * 100, "y": random.random() * 100} for _ in range(50)],
+        backend="numpy",
+    ).set_force("charge", force_many_body())
+    simulation.on("tick", lambda simulation: None, [svg.node()])
+    stepper = simulation._stepper
+    subject = QuadtreeSubject(radius=5).bind(simulation)
+
+    # The timer of the simulation keeps its extra nodes
+    assert simulation._stepper is stepper
+    assert stepper._updated_nodes == [svg.node()]
+
+    # Positions are written into nodes before the subject is updated
+    nodes = simulation.get_nodes()
+    for _ in range(3):
+        simulation._step(0, TimerEvent())
+        node = nodes[random.randrange(len(nodes))]
+        assert subject.find(node["x"], node["y"]) is node
+
+
+def test_subject_drag():
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    nodes = [{"x": 10, "y": 10}, {"x": 40, "y": 20}]
+    subject = QuadtreeSubject(nodes, radius=8)
+    started = []
+    drag = d3.drag().set_subject(subject).on(
+        "start", lambda event, d, node: started.append(event.subject)
+    )
+    svg.call(drag)
+    node = svg.node()
+    drag._mouse_downed(mouse_event(37, 24), None, node)
+    assert started == [nodes[1]]
+    drag._mouse_upped(mouse_event(37, 24), None, node)
+    drag._mouse_downed(mouse_event(25, 15), None, node)
+    assert started == [nodes[1]]
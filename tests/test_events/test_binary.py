@@ -0,0 +1,75 @@
+import struct
+
+import orjson
+
+from detroit_live.events import BinaryEncoder
+from detroit_live.events.binary import parse_number
+
+
+def test_parse_number():
+    assert parse_number("12") == (12.0, 4)
+    assert parse_number("-1.5") == (-1.5, 4)
+    assert parse_number("0") == (0.0, 4)
+    assert parse_number("123.456789") == (123.456789, 8)
+    assert parse_number("1.50") is None
+    assert parse_number("01") is None
+    assert parse_number("-0") is None
+    assert parse_number("1e-07") is None
+    assert parse_number("0.0000001") is None
+    assert parse_number("red") is None
+    assert parse_number("translate(1,2)") is None
+
+
+def test_binary_encoder_1():
+    encoder = BinaryEncoder()
+    content = encoder.encode(
+        [
+            {"elementId": 1, "diff": {"remove": [], "change": [["cx", "1.5"]]}},
+            {"elementId": 2, "diff": {"remove": [], "change": [["cx", "2"]]}},
+        ]
+    )
+    assert content == (
+        b"\x00"
+        + struct.pack("<BHH", 1, 0, 2)
+        + b"cx"
+        + struct.pack("<BBHHI", 2, 4, 1, 0, 2)
+        + struct.pack("<2I", 1, 2)
+        + struct.pack("<2f", 1.5, 2.0)
+    )
+    # Attribute names are interned once per encoder
+    content = encoder.encode(
+        [{"elementId": 1, "diff": {"remove": [], "change": [["cx", "1.123456789"]]}}]
+    )
+    assert content == (
+        b"\x00"
+        + struct.pack("<BBHHI", 2, 8, 1, 0, 1)
+        + struct.pack("<I", 1)
+        + struct.pack("<d", 1.123456789)
+    )
+
+
+def test_binary_encoder_2():
+    encoder = BinaryEncoder()
+    operation = {"op": "remove", "elementIds": [3]}
+    content = encoder.encode(
+        [
+            {
+                "elementId": 1,
+                "diff": {"remove": [["class", "a"]], "change": [["fill", "red"]]},
+            },
+            operation,
+        ]
+    )
+    json = orjson.dumps(operation)
+    assert content == (
+        b"\x00"
+        + struct.pack("<BHH", 1, 0, 4)
+        + b"fill"
+        + struct.pack("<BHH", 1, 1, 5)
+        + b"class"
+        + struct.pack("<BIHHI", 3, 1, 1, 0, 3)
+        + b"red"
+        + struct.pack("<BIHH", 4, 1, 1, 1)
+        + struct.pack("<BI", 5, len(json))
+        + json
+    )
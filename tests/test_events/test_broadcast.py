@@ -0,0 +1,129 @@
+import asyncio
+
+import orjson
+import pytest
+
+import detroit_live as d3
+from detroit_live.events import Broadcaster, EventProducers, TrackingTree
+from detroit_live.events.event_producers import SharedState
+
+
+def diff(element_id, key, value):
+    return {"elementId": element_id, "diff": {"remove": [], "change": [[key, value]]}}
+
+
+def sender(messages):
+    async def send(message):
+        messages.append(message)
+
+    return send
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def svg(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    ttree.enable_ids()
+    return svg
+
+
+@pytest.mark.asyncio
+async def test_broadcast_1(svg):
+    broadcaster = Broadcaster(frame_window=0)
+    received = [[], []]
+    subscribers = [broadcaster.subscribe(sender(messages)) for messages in received]
+    await settle()
+    for messages in received:
+        assert orjson.loads(messages.pop()) == [
+            {
+                "op": "replace",
+                "elementId": 1,
+                "outerHTML": '<svg xmlns="http://www.w3.org/2000/svg" '
+                'data-detroit-id="1"></svg>',
+            }
+        ]
+    broadcaster.extend([diff(1, "width", "10")])
+    broadcaster.extend([diff(1, "width", "20")])
+    broadcaster.acknowledge(subscribers[0], "mousemove")
+    await settle()
+    assert received[0][0] is received[1][0]
+    assert orjson.loads(received[0][0]) == [diff(1, "width", "20")]
+    assert orjson.loads(received[0][1]) == [{"ack": [["mousemove", 1]]}]
+    assert len(received[1]) == 1
+    assert broadcaster.published == 1
+    for subscriber in subscribers:
+        broadcaster.unsubscribe(subscriber)
+    assert broadcaster.subscribers == 0
+
+
+@pytest.mark.asyncio
+async def test_broadcast_2(svg):
+    broadcaster = Broadcaster(frame_window=0, buffer_size=2)
+    fast = []
+    slow = []
+    unblock = asyncio.Event()
+
+    async def send_slow(message):
+        await unblock.wait()
+        slow.append(message)
+
+    fast_subscriber = broadcaster.subscribe(sender(fast))
+    slow_subscriber = broadcaster.subscribe(send_slow)
+    await settle()
+    for width in range(5):
+        svg.attr("width", width)
+        broadcaster.extend([diff(1, "width", str(width))])
+        await settle()
+    assert [orjson.loads(message) for message in fast[1:]] == [
+        [diff(1, "width", str(width))] for width in range(5)
+    ]
+    assert slow_subscriber.resyncs == 2
+    assert fast_subscriber.resyncs == 0
+    unblock.set()
+    await settle()
+    assert len(slow) == 2
+    [snapshot] = orjson.loads(slow[-1])
+    assert snapshot["op"] == "replace"
+    assert 'width="4"' in snapshot["outerHTML"]
+    broadcaster.unsubscribe(fast_subscriber)
+    broadcaster.unsubscribe(slow_subscriber)
+
+
+def test_broadcast_3():
+    with pytest.raises(ValueError):
+        Broadcaster(buffer_size=0)
+    svg = d3.create("svg")
+    with pytest.raises(ValueError):
+        svg.create_app(sessions=True, broadcast=True)
+
+
+@pytest.mark.asyncio
+async def test_broadcast_4(svg):
+    rect = svg.append("rect").attr("width", 1)
+    TrackingTree().assign_ids()
+    values = []
+
+    def callback(elapsed, timer_event):
+        values.append(elapsed)
+        rect.attr("width", 2)
+        timer_event.set()
+
+    d3.event_producers().add_timer(callback, [rect.node()])
+    app = svg.create_app(broadcast=True, frame_window=0, binary=True)
+    client = app.test_client()
+    async with client.websocket("/ws") as first:
+        async with client.websocket("/ws") as second:
+            snapshot = await second.receive()
+            assert snapshot[0] == 0
+            messages = [await first.receive() for _ in range(3)]
+    assert len(values) == 1
+    assert messages[0] == bytes([0])  # no interned names yet
+    assert b'"op":"replace"' in messages[1]
+    assert messages[2][0] == 0 and b"width" in messages[2]
@@ -0,0 +1,75 @@
+from detroit_live.events import DiffCoalescer
+
+
+def diff(element_id, change=None, remove=None):
+    return {
+        "elementId": element_id,
+        "diff": {"remove": remove or [], "change": change or []},
+    }
+
+
+def test_coalescer_1():
+    coalescer = DiffCoalescer()
+    assert not coalescer
+    coalescer.extend([])
+    assert not coalescer
+    assert coalescer.flush() == []
+
+
+def test_coalescer_2():
+    coalescer = DiffCoalescer()
+    coalescer.extend([diff(1, [["x", "1"], ["y", "1"]]), diff(2, [["x", "5"]])])
+    coalescer.extend([diff(1, [["x", "2"]], [["y", "1"]])])
+    coalescer.extend([diff(1, [["x", "3"]])])
+    assert coalescer
+    assert coalescer.flush() == [
+        diff(1, [["x", "3"]], [["y", "1"]]),
+        diff(2, [["x", "5"]]),
+    ]
+    assert not coalescer
+
+
+def test_coalescer_3():
+    coalescer = DiffCoalescer()
+    insert = {"op": "insert", "parentId": 1, "anchorId": None, "outerHTML": "<g/>"}
+    coalescer.extend([diff(2, [["x", "1"]]), diff(3, [["x", "1"]])])
+    coalescer.extend([{"op": "remove", "elementIds": [3]}, insert])
+    coalescer.extend([diff(2, [["x", "2"]])])
+    assert coalescer.flush() == [
+        diff(2, [["x", "1"]]),
+        {"op": "remove", "elementIds": [3]},
+        insert,
+        diff(2, [["x", "2"]]),
+    ]
+
+
+def test_coalescer_4():
+    coalescer = DiffCoalescer()
+    coalescer.acknowledge("mousemove")
+    coalescer.acknowledge("mousemove")
+    coalescer.acknowledge("wheel")
+    coalescer.acknowledge(None)
+    assert coalescer
+    assert coalescer.flush() == [{"ack": [["mousemove", 2], ["wheel", 1]]}]
+    assert not coalescer
+
+
+def test_coalescer_5():
+    coalescer = DiffCoalescer()
+    first = {"op": "attrs", "start": 2, "count": 2, "attributes": {"cx": "1 2"}}
+    second = {"op": "attrs", "start": 2, "count": 2, "attributes": {"cx": "3 4"}}
+    other = {"op": "attrs", "elementIds": [2, 4], "attributes": {"cy": "5 6"}}
+    coalescer.extend([first, diff(2, [["x", "2"]]), second])
+    coalescer.extend([{**second, "attributes": {"cy": "0 0"}}, other])
+    assert coalescer.flush() == [
+        first,
+        diff(2, [["x", "2"]]),
+        {
+            "op": "attrs",
+            "start": 2,
+            "count": 2,
+            "attributes": {"cx": "3 4", "cy": "0 0"},
+        },
+        other,
+    ]
+    assert second["attributes"] == {"cx": "3 4"}
@@ -1,3 +1,7 @@
+import asyncio
+
+import pytest
+
 import detroit_live as d3
 from detroit_live.events import ContextListener, TrackingTree
 
@@ -60,3 +64,42 @@ def test_context_listener_3():
             "diff": {"remove": [], "change": [["width", "100"], ["height", "200"]]},
         }
     ]
+
+
+@pytest.mark.asyncio
+async def test_context_listener_4():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    rect = svg.append("rect")
+    circle = svg.append("circle")
+    gate = asyncio.Event()
+
+    async def slow(event, d, node):
+        d3.select(node).attr("width", 1)
+        await gate.wait()
+        d3.select(node).attr("height", 2)
+
+    def fast(event, d, node):
+        d3.select(node).attr("r", 3)
+
+    slow_listener = ContextListener([rect.node()], [], slow, lambda node: None)
+    fast_listener = ContextListener([circle.node()], [], fast, lambda node: None)
+    [task] = list(slow_listener(Event()))
+    assert isinstance(task, asyncio.Task)
+    await asyncio.sleep(0)
+    assert list(fast_listener(Event())) == [
+        {
+            "elementId": "svg circle:nth-of-type(1)",
+            "diff": {"remove": [], "change": [["r", "3"]]},
+        }
+    ]
+    gate.set()
+    jsons = await task
+    jsons[0]["diff"]["change"].sort(key=lambda value: value[0], reverse=True)
+    assert jsons == [
+        {
+            "elementId": "svg rect:nth-of-type(1)",
+            "diff": {"remove": [], "change": [["width", "1"], ["height", "2"]]},
+        }
+    ]
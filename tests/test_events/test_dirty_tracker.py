@@ -0,0 +1,378 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import detroit_live as d3
+from detroit_live.events import ContextListener, DirtyTracker, TrackingTree
+
+
+class Event:
+    pass
+
+
+def test_dirty_tracker_1():
+    tracker = DirtyTracker()
+    svg = d3.create("svg")
+    svg.attr("width", 10)
+    tracker.enable()
+    svg.attr("width", 20)
+    assert tracker.recording is False
+    assert list(tracker.flush()) == []
+    tracker.enable(False)
+
+
+def test_dirty_tracker_2():
+    tracker = DirtyTracker()
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    svg.attr("width", 10).attr("height", 10)
+    tracker.enable()
+    tracker.start()
+    svg.attr("width", 20).attr("width", 30).attr("height", 10)
+    assert list(tracker.flush()) == []  # still recording
+    tracker.stop()
+    assert list(tracker.flush()) == [
+        {"elementId": "svg", "diff": {"remove": [], "change": [["width", "30"]]}}
+    ]
+    assert list(tracker.flush()) == []
+    tracker.enable(False)
+
+
+def test_dirty_tracker_3():
+    tracker = DirtyTracker()
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    circles = (
+        svg.select_all("circle").data([1, 2, 3]).join("circle").attr("cx", 0)
+    )
+    tracker.enable()
+
+    def listener(event, d, node):
+        circles.filter(lambda d: d == 2).attr("cx", 5).classed("active", True)
+
+    context_listener = ContextListener(
+        [svg.node()] + circles.nodes(), [], listener, lambda node: None
+    )
+    jsons = list(context_listener(Event()))
+    tracker.enable(False)
+    assert jsons == [
+        {
+            "elementId": "svg circle:nth-of-type(2)",
+            "diff": {"remove": [], "change": [["cx", "5"], ["class", "active"]]},
+        }
+    ]
+
+
+def test_dirty_tracker_4():
+    tracker = DirtyTracker()
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    text = svg.append("text").text("foo")
+    tracker.enable()
+    tracker.start()
+    text.text("bar")
+    detached = d3.create("svg").attr("width", 10)
+    tracker.stop()
+    jsons = list(tracker.flush())
+    tracker.enable(False)
+    assert detached.node().get("width") == "10"
+    assert jsons == [
+        {
+            "elementId": "svg text:nth-of-type(1)",
+            "diff": {"remove": [], "change": [["innerHTML", "bar"]]},
+        }
+    ]
+
+
+def test_dirty_tracker_5():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    g = svg.append("g")
+    g.append("circle").attr("r", 1)
+
+    def listener(event, d, node):
+        g.select_all("circle").data([1, 2, 3]).join("circle").attr("r", lambda d: d)
+
+    context_listener = ContextListener([g.node()], [], listener, lambda node: None)
+    jsons = list(context_listener(Event()))
+    assert jsons == [
+        {
+            "op": "insert",
+            "parentId": "svg g:nth-of-type(1)",
+            "anchorId": None,
+            "outerHTML": '<circle r="2"></circle><circle r="3"></circle>',
+        }
+    ]
+
+
+def test_dirty_tracker_6():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    svg.select_all("circle").data([1, 2, 3]).join("circle")
+
+    def listener(event, d, node):
+        svg.select_all("circle").data([1]).join("circle")
+        svg.insert("rect", "circle").append("title")
+
+    context_listener = ContextListener([svg.node()], [], listener, lambda node: None)
+    jsons = list(context_listener(Event()))
+    assert jsons == [
+        {
+            "op": "remove",
+            "elementIds": ["svg circle:nth-of-type(2)", "svg circle:nth-of-type(3)"],
+        },
+        {
+            "op": "insert",
+            "parentId": "svg",
+            "anchorId": "svg circle:nth-of-type(1)",
+            "outerHTML": "<rect><title></title></rect>",
+        },
+    ]
+    assert ttree.get_path(svg.select("circle").node()) == "svg/circle[1]"
+
+
+def test_dirty_tracker_7():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    svg.select_all("g").data(["a", "b", "c"]).join("g").attr("id", lambda d: d)
+    tracker = DirtyTracker()
+    tracker.start()
+    svg.select_all("g").data(["c", "a", "b"], lambda d: d).order()
+    tracker.stop()
+    jsons = list(tracker.flush())
+    assert [node.get("id") for node in svg.select_all("g").nodes()] == ["c", "a", "b"]
+    assert jsons == [
+        {
+            "op": "move",
+            "elementId": "svg g:nth-of-type(3)",
+            "parentId": "svg",
+            "anchorId": "svg g:nth-of-type(1)",
+        }
+    ]
+
+
+def test_dirty_tracker_8():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    svg.select_all("g").data([1, 2]).join("g")
+    ttree.enable_ids()
+
+    def listener(event, d, node):
+        svg.select("g").remove()
+        svg.append("g").append("circle").attr("r", 1)
+
+    context_listener = ContextListener([svg.node()], [], listener, lambda node: None)
+    jsons = list(context_listener(Event()))
+    ttree.set_root(svg.node())
+    assert jsons == [
+        {"op": "remove", "elementIds": [2]},
+        {
+            "op": "insert",
+            "parentId": 1,
+            "anchorId": None,
+            "outerHTML": (
+                '<g data-detroit-id="4"><circle r="1" data-detroit-id="5"></circle></g>'
+            ),
+        },
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dirty_tracker_9():
+    tracker = DirtyTracker()
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    rect = svg.append("rect")
+    gate = asyncio.Event()
+    tracker.enable()
+
+    async def slow(event, d, node):
+        rect.attr("width", 1)
+        await gate.wait()
+        rect.attr("height", 2)
+
+    def fast(event, d, node):
+        svg.attr("width", 3)
+
+    slow_listener = ContextListener([rect.node()], [], slow, lambda node: None)
+    fast_listener = ContextListener([svg.node()], [], fast, lambda node: None)
+    try:
+        [task] = list(slow_listener(Event()))
+        await asyncio.sleep(0)
+        assert tracker.recording is False
+        # Changes recorded so far by the awaiting listener are flushed as well
+        assert list(fast_listener(Event())) == [
+            {
+                "elementId": "svg rect:nth-of-type(1)",
+                "diff": {"remove": [], "change": [["width", "1"]]},
+            },
+            {"elementId": "svg", "diff": {"remove": [], "change": [["width", "3"]]}},
+        ]
+        gate.set()
+        assert await task == [
+            {
+                "elementId": "svg rect:nth-of-type(1)",
+                "diff": {"remove": [], "change": [["height", "2"]]},
+            }
+        ]
+    finally:
+        tracker.enable(False)
+
+
+def test_dirty_tracker_10():
+    tracker = DirtyTracker()
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    circles = svg.select_all("circle").data([1, 2, 3]).join("circle")
+    texts = svg.select_all("text").data([1, 2]).join("text")
+    ttree.enable_ids()
+    tracker.enable()
+    tracker.start()
+    circles.attrs({"cx": np.array([1.5, 2.0, 3.25]), "cy": 0})
+    circles.attrs({"cy": [4, 5, 6]})
+    texts.attrs({"transform": ["translate(1, 2)", "scale(2)"]})
+    tracker.stop()
+    jsons = list(tracker.flush())
+    tracker.enable(False)
+    assert [node.get("cx") for node in circles.nodes()] == ["1.5", "2.0", "3.25"]
+    assert jsons == [
+        {
+            "op": "attrs",
+            "start": 2,
+            "count": 3,
+            "attributes": {"cx": "1.5 2.0 3.25", "cy": "4 5 6"},
+        },
+        {
+            "op": "attrs",
+            "start": 5,
+            "count": 2,
+            "attributes": {"transform": ["translate(1, 2)", "scale(2)"]},
+        },
+    ]
+    with pytest.raises(ValueError):
+        circles.attrs({"cx": [1, 2]})
+
+
+def test_dirty_tracker_11():
+    tracker = DirtyTracker()
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    circle = svg.append("circle")
+    ttree.enable_ids()
+    tracker.enable()
+    tracker.start()
+    circle.attr("r", 3).remove()
+    svg.attr("width", 10)
+    tracker.stop()
+    jsons = list(tracker.flush())
+    tracker.enable(False)
+    assert not tracker.attached(circle.node())
+    assert jsons == [
+        {"op": "remove", "elementIds": [2]},
+        {"elementId": 1, "diff": {"remove": [], "change": [["width", "10"]]}},
+    ]
+    assert circle.node().get("data-detroit-id") is None
+    assert ttree.get_node(3) is None
+
+
+def test_dirty_tracker_12():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    svg.append("g")
+    ttree.enable_ids()
+
+    def listener(event, d, node):
+        g = svg.append("g")
+        g.append("circle")
+        g.select("circle").remove()
+        g.remove()
+        svg.append("rect")
+
+    context_listener = ContextListener([svg.node()], [], listener, lambda node: None)
+    jsons = list(context_listener(Event()))
+    released = ttree.get_node(3)
+    rect = ttree.get_node(4)
+    ttree.set_root(svg.node())
+    # Removed nodes keep the ids of the recorded operations
+    assert jsons == [
+        {
+            "op": "insert",
+            "parentId": 1,
+            "anchorId": None,
+            "outerHTML": '<g data-detroit-id="3"></g>',
+        },
+        {"op": "remove", "elementIds": [3]},
+        {
+            "op": "insert",
+            "parentId": 1,
+            "anchorId": None,
+            "outerHTML": '<rect data-detroit-id="4"></rect>',
+        },
+    ]
+    assert released is None
+    assert rect is svg.select("rect").node()
+
+
+def test_dirty_tracker_13():
+    tracker = DirtyTracker()
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    circles = svg.select_all("circle").data([1, 2]).join("circle").attr("cx", 1)
+    ttree.enable_ids()
+    tracker.enable()
+    tracker.start()
+    circles.attr("cx", 3)
+    circles.attrs({"cx": [5, 5]})
+    circles.attr("cx", 1)
+    tracker.stop()
+    jsons = list(tracker.flush())
+    tracker.enable(False)
+    assert jsons == [
+        {"op": "attrs", "start": 2, "count": 2, "attributes": {"cx": "5 5"}},
+        {"elementId": 2, "diff": {"remove": [], "change": [["cx", "1"]]}},
+        {"elementId": 3, "diff": {"remove": [], "change": [["cx", "1"]]}},
+    ]
+
+
+def test_dirty_tracker_14():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    circles = svg.select_all("circle").data([1, 2]).join("circle").attr("r", 1)
+
+    def listener(event, d, node):
+        circles.clone().attr("r", 2)
+
+    context_listener = ContextListener([svg.node()], [], listener, lambda node: None)
+    jsons = list(context_listener(Event()))
+    assert jsons == [
+        {
+            "op": "insert",
+            "parentId": "svg",
+            "anchorId": None,
+            "outerHTML": '<circle r="2"></circle>',
+        },
+        {
+            "op": "insert",
+            "parentId": "svg",
+            "anchorId": "svg circle:nth-of-type(2)",
+            "outerHTML": '<circle r="2"></circle>',
+        },
+    ]
+    nodes = svg.select_all("circle").nodes()
+    assert [node.get("r") for node in nodes] == ["1", "2", "1", "2"]
+    assert [svg._shared.data[node] for node in nodes] == [1, 1, 2, 2]
+    assert ttree.get_path(nodes[2]) == "svg/circle[3]"
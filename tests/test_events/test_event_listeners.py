@@ -1,7 +1,12 @@
+import shutil
+import subprocess
+
+import orjson
 import pytest
 
 import detroit_live as d3
 from detroit_live.events.context_listener import ContextListener
+from detroit_live.events.dirty_tracker import DirtyTracker
 from detroit_live.events.event_listeners import (
     EventListener,
     EventListeners,
@@ -9,6 +14,7 @@ from detroit_live.events.event_listeners import (
     TrackingTree,
     parse_target,
 )
+from detroit_live.events.headers import EVENT_HEADERS, headers
 from detroit_live.events.types import MouseEvent
 
 
@@ -114,7 +120,8 @@ def test_event_listeners_group_4(group_and_svg):
 
 
 def test_event_listeners_group_5(group_and_svg):
-    group, _ = group_and_svg
+    group, svg = group_and_svg
+    TrackingTree().set_root(svg)
 
     # Program to split long string
     #
@@ -185,6 +192,80 @@ def test_event_listeners_group_7(group_and_svg):
     assert len(list(group.propagate(event))) == 0
 
 
+def test_event_listeners_group_8(group_and_svg):
+    group, svg = group_and_svg
+    [mouseup] = group.listeners(svg, "mouseup")
+    assert group.listeners(svg, "mouseup") is group.listeners(svg, "mouseup")
+    assert group.listeners(None, "mouseup") == (mouseup,)
+    assert group.listeners(svg, "foo") == ()
+
+    group.set_active((svg, "mouseup", "drag"), False)
+    assert mouseup.active is False
+    assert group.listeners(svg, "mouseup") == ()
+    assert group.listeners(None, "mouseup") == ()
+    group.set_active((svg, "mouseup", None), True)
+    assert group.listeners(None, "mouseup") == (mouseup,)
+
+    circle = d3.select(svg).append("circle").node()
+    other = EventListener(
+        "mouseup", "", ContextListener([circle], [], lambda event: None, str)
+    )
+    group[(circle, "mouseup", "")] = other
+    assert group.listeners(None, "mouseup") == (mouseup, other)
+    assert group.listeners(circle, "mouseup") == (other,)
+    group.pop((svg, "mouseup", "drag"))
+    assert group.listeners(svg, "mouseup") == ()
+    assert group.listeners(None, "mouseup") == (other,)
+
+
+def test_event_listeners_group_9(group_and_svg):
+    group, svg = group_and_svg
+    ttree = TrackingTree()
+    ttree.set_root(svg)
+    assert group.filter_script() == ""
+    ttree.enable_ids()
+    svg_id = ttree.get_id(svg)
+    script = group.into_script()
+    assert (
+        f"FS['mouseup'] = new Set([{svg_id}]);FS['mouseover'] = new Set([{svg_id}]);"
+        in script
+    )
+    assert "FO = null;FD = null;FM = false;" in script
+    assert (
+        "window.addEventListener('click', (e) => {var u = p(e.srcElement);"
+        "if (FT('click', u)) f(_ev(e), 'click', u);});"
+    ) in script
+
+    event = {"elementId": svg_id, "typename": "mousedown"}
+    assert len(list(group.propagate(event))) == 1
+    assert f"FD = {svg_id};FM = true;" in group.filter_script()
+
+    # Nodes which gain or lose listeners inside listeners are sent
+    circles = d3.select(svg).select_all("circle").data([1, 2]).join("circle")
+    ids = [ttree.get_id(node) for node in circles.nodes()]
+    tracker = DirtyTracker()
+    tracker.start()
+    for node in circles.nodes():
+        group[(node, "click", "")] = EventListener(
+            "click", "", ContextListener([node], [], lambda event: None, str)
+        )
+    group[(circles.node(), "click", "other")] = EventListener(
+        "click", "other", ContextListener([node], [], lambda event: None, str)
+    )
+    group.pop((circles.node(), "click", ""))
+    group.pop((circles.node(), "click", "other"))
+    tracker.stop()
+    assert list(tracker.flush()) == [
+        {"op": "listen", "typename": "click", "listening": True, "elementIds": ids},
+        {
+            "op": "listen",
+            "typename": "click",
+            "listening": False,
+            "elementIds": ids[:1],
+        },
+    ]
+
+
 @pytest.fixture
 def event_listeners_and_svg():
     svg = d3.create("svg")
@@ -225,47 +306,23 @@ def test_event_listeners_1(event_listeners_and_svg):
 
 
 def test_event_listeners_2(event_listeners_and_svg):
-    event_listeners, _ = event_listeners_and_svg
-    assert event_listeners.into_script() == (
-        """const socket = new WebSocket("ws://localhost:5000/ws");function f(o, t, u) {"""
-        """o.elementId = u;o.typename = t;point = pointer(o, document.querySelector("sv"""
-        """g"));o.pageX = point[0];o.pageY = point[1];socket.send(JSON.stringify(o, nul"""
-        """l, 0));}function sourceEvent(event) {let sourceEvent;while (sourceEvent = ev"""
-        """ent.sourceEvent) event = sourceEvent;return event;}function pointer(event, n"""
-        """ode) {event = sourceEvent(event);if (node === undefined) node = event.curren"""
-        """tTarget;if (node) {var svg = node.ownerSVGElement || node;if (svg.createSVGP"""
-        """oint) {var point = svg.createSVGPoint();point.x = event.clientX, point.y = e"""
-        """vent.clientY;point = point.matrixTransform(node.getScreenCTM().inverse());re"""
-        """turn [point.x, point.y];}if (node.getBoundingClientRect) {var rect = node.ge"""
-        """tBoundingClientRect();return [event.clientX - rect.left - node.clientLeft, e"""
-        """vent.clientY - rect.top - node.clientTop];}}return [event.pageX, event.pageY"""
-        """];}function p(e) {if (!e) return;if (e === document.body) return 'body';let """
-        """t = e.parentNode;if (null == t) return '';let r = Array.from(t.children).fil"""
-        """ter((t => t.tagName === e.tagName)),n = r.indexOf(e) + 1,a = e.tagName.toLow"""
-        """erCase(),o = p(t) + '/' + a;return r.length > 1 && (o += `[${n}]`), o}functi"""
-        """on q(u) {var n, s = u.split(" "), t = s[s.length - 2], els = document.queryS"""
-        """electorAll(u);if ((n = els.length) === 1 || t === undefined) {return els[0];"""
-        """} else {for (var i = 0, el; i < n; i++){el = els[i];if (el.parentNode.tagNam"""
-        """e === t) {return el;}}}}socket.addEventListener('message', (e) => {const fr """
-        """= new FileReader();fr.onload = function(o) {const t = JSON.parse(o.target.re"""
-        """sult);for (var i1 = 0, r, n = t.length; i1 < n; ++i1) {r = t[i1];const el = """
-        """q(r.elementId);if (el == undefined) {continue;}if (r.diff != undefined) {var"""
-        """ c = r.diff.change;for (var i2 = 0, k, v, m = c.length; i2 < m; ++i2) {[k, v"""
-        """] = c[i2];k === "innerHTML" ? el[k] = v: el.setAttribute(k, v)}c = r.diff.re"""
-        """move;for (var i2 = 0, k, v, m = c.length; i2 < m; ++i2) {[k, v] = c[i2];k =="""
-        """= "innerHTML" ? el[k] = undefined : el.removeAttribute(k);}} else {el.outerH"""
-        """TML = r.outerHTML;}}};fr.readAsText(e.data);});function _ev(e){return {type:"""
-        """ 'MouseEvent', x: event.x, y: event.y, clientX: event.clientX, clientY: even"""
-        """t.clientY, pageX: event.pageX, pageY: event.pageY, button: event.button, ctr"""
-        """lKey: event.ctrlKey, shiftKey: event.shiftKey, altKey: event.altKey, element"""
-        """Id: event.elementId, rectTop: event.srcElement.getBoundingClientRect().top, """
-        """rectLeft: event.srcElement.getBoundingClientRect().left}}window.addEventList"""
-        """ener('mouseup', (e) =>  f(_ev(e), 'mouseup', p(e.srcElement)));window.addEve"""
-        """ntListener('mouseover', (e) =>  f(_ev(e), 'mouseover', p(e.srcElement)));win"""
-        """dow.addEventListener('mousedown', (e) =>  f(_ev(e), 'mousedown', p(e.srcElem"""
-        """ent)));window.addEventListener('mouseleave', (e) =>  f(_ev(e), 'mouseleave',"""
-        """ p(e.srcElement)));window.addEventListener('click', (e) =>  f(_ev(e), 'click"""
-        """', p(e.srcElement)));"""
+    event_listeners, svg = event_listeners_and_svg
+    TrackingTree().set_root(svg)
+    script = event_listeners.into_script()
+    header = headers("localhost", 5000)
+    assert script.startswith(header)
+    assert script[len(header):] == (
+        """function _ev(e){return {type: 'MouseEvent', x: event.x, y: event.y, clien"""
+        """tX: event.clientX, clientY: event.clientY, pageX: event.pageX, pageY: even"""
+        """t.pageY, button: event.button, ctrlKey: event.ctrlKey, shiftKey: event.shi"""
+        """ftKey, altKey: event.altKey, elementId: event.elementId, rectTop: event.sr"""
+        """cElement.getBoundingClientRect().top, rectLeft: event.srcElement.getBoundi"""
+        """ngClientRect().left}}window.addEventListener('mouseup', (e) =>  f(_ev(e), """
+        """'mouseup', p(e.srcElement)));window.addEventListener('mouseover', (e) =>  """
+        """f(_ev(e), 'mouseover', p(e.srcElement)));window.addEventListener('mousedow"""
+        """n', (e) =>  f(_ev(e), 'mousedown', p(e.srcElement)));window.addEventListe"""
+        """ner('mouseleave', (e) =>  f(_ev(e), 'mouseleave', p(e.srcElement)));windo"""
+        """w.addEventListener('click', (e) =>  f(_ev(e), 'click', p(e.srcElement)));"""
     )
 
 
@@ -286,3 +343,74 @@ def test_event_listeners_3(event_listeners_and_svg):
     assert len(list(event_listeners(event))) == 0
     event = {"elementId": "svg", "typename": "mouseover"}
     assert len(list(event_listeners(event))) == 0
+
+
+def test_event_listeners_group_in_flight():
+    svg = d3.create("svg")
+
+    def listener(event, d, node):
+        pass
+
+    group = EventListenersGroup("mousemove")
+    for typename, name, in_flight in [
+        ("mousemove", "a", None),
+        ("mousemove", "b", 3),
+        ("mousemove", "c", 2),
+        ("mousedown", "a", 5),
+    ]:
+        group[(svg.node(), typename, name)] = EventListener(
+            typename,
+            name,
+            ContextListener([svg.node()], [], listener, lambda node: None),
+            in_flight=in_flight,
+        )
+    assert group.in_flight_limits() == {"mousemove": 2}
+    assert group.into_script().endswith("L['mousemove'] = 2;")
+
+
+def test_event_listeners_group_10():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    circle = svg.append("circle").node()
+    rect = svg.append("rect").node()
+    ttree.enable_ids()
+    circle_id, rect_id = ttree.get_id(circle), ttree.get_id(rect)
+    group = EventListenersGroup("mousemove")
+    for typename in ["mousedown", "mousemove", "mouseup"]:
+        group[(circle, typename, "")] = EventListener(
+            typename, "", ContextListener([circle], [], lambda event: None, str)
+        )
+
+    def event(element_id):
+        return MouseEvent(*([0] * 10), element_id=element_id, rect_top=0, rect_left=0)
+
+    # A node without listeners does not hold the pointer
+    steps = [
+        ("mousedown", rect_id),
+        ("mousemove", circle_id),
+        ("mousemove", rect_id),
+        ("mouseup", circle_id),
+        ("mousedown", circle_id),
+        ("mousemove", rect_id),
+        ("mouseup", rect_id),
+    ]
+    sent = []
+    for typename, element_id in steps:
+        sent.append(bool(group.filter_by(event(element_id), typename)))
+    assert sent == [False, True, False, True, True, True, True]
+    assert group._mousedowned_node is None
+
+    # The client filter applies the same rule
+    if (node := shutil.which("node")) is None:
+        return
+    start = EVENT_HEADERS.index("const FS")
+    stop = EVENT_HEADERS.index("function sourceEvent")
+    calls = "".join(f"r.push(FT({t!r}, {i}));" for t, i in steps)
+    script = (
+        EVENT_HEADERS[start:stop]
+        + group.filter_script()
+        + f"var r = [];{calls}console.log(JSON.stringify(r));"
+    )
+    result = subprocess.run([node, "-e", script], capture_output=True, text=True)
+    assert orjson.loads(result.stdout) == sent
@@ -3,7 +3,13 @@ import asyncio
 import pytest
 
 import detroit_live as d3
-from detroit_live.events.event_producers import TimerParameters
+from detroit_live.events import EventProducers, TrackingTree
+from detroit_live.events.event_producers import (
+    ProducerQueue,
+    SharedState,
+    TimerParameters,
+)
+from detroit_live.events.event_source import EventSource
 from detroit_live.timer import Interval, Timer
 
 
@@ -107,3 +113,95 @@ async def test_event_producers_6():
     assert event_producers.queue_task(None) is not None
     assert event_producers.queue_task(0) is not None
     assert event_producers.queue_task((0, 0)) is not None
+
+
+def frame(element_id, x):
+    diff = {"remove": [], "change": [["x", x]]}
+    return (None, [{"elementId": element_id, "diff": diff}])
+
+
+@pytest.mark.asyncio
+async def test_producer_queue_1():
+    queue = ProducerQueue(2, "drop-oldest")
+    for i in range(4):
+        assert queue.put_frame(frame(1, str(i))) is None
+    assert queue.qsize() == 2
+    assert queue.dropped == 2
+    assert await queue.get_frame() == frame(1, "2")
+    assert await queue.get_frame() == frame(1, "3")
+
+
+@pytest.mark.asyncio
+async def test_producer_queue_2():
+    queue = ProducerQueue(2, "merge")
+    queue.put_frame(frame(1, "0"))
+    queue.put_frame(frame(1, "1"))
+    queue.put_frame(frame(2, "2"))
+    queue.put_frame(frame(1, "3"))
+    assert queue.qsize() == 2
+    assert queue.merged == 2
+    assert await queue.get_frame() == frame(1, "0")
+    assert await queue.get_frame() == (
+        None,
+        [
+            {"elementId": 1, "diff": {"remove": [], "change": [["x", "3"]]}},
+            {"elementId": 2, "diff": {"remove": [], "change": [["x", "2"]]}},
+        ],
+    )
+
+
+@pytest.mark.asyncio
+async def test_producer_queue_3():
+    queue = ProducerQueue(1, "block")
+    assert queue.put_frame(frame(1, "0")) is None
+    waiting = asyncio.create_task(queue.put_frame(frame(1, "1")))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+    assert await queue.get_frame() == frame(1, "0")
+    await waiting
+    assert await queue.get_frame() == frame(1, "1")
+    with pytest.raises(ValueError):
+        ProducerQueue(1, "foo")
+    with pytest.raises(ValueError):
+        ProducerQueue(0)
+
+
+@pytest.mark.asyncio
+async def test_producer_queue_4(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+    event_producers = d3.event_producers()
+    event_producers.configure_queue(3, "drop-oldest")
+    queue = event_producers._queue
+    for i in range(4):
+        queue.put_frame(frame(1, str(i)))
+    event_producers.configure_queue(1, "block")
+    assert event_producers._queue.maxsize == 1
+    assert event_producers.dropped_frames == 1
+    assert event_producers.merged_frames == 2
+    assert await event_producers.queue_task() == frame(1, "3")
+
+
+@pytest.mark.asyncio
+async def test_event_producers_async(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    rect = svg.append("rect").attr("width", 0)
+
+    async def callback(elapsed, timer_event):
+        await asyncio.sleep(0)
+        rect.attr("width", 10)
+        timer_event.set()
+
+    event_producers = d3.event_producers()
+    event_producers.add_timer(callback, [rect.node()])
+    await asyncio.wait(event_producers.next_tasks())
+    assert await event_producers.queue_task() == (
+        EventSource.PRODUCER,
+        [
+            {
+                "elementId": "svg rect:nth-of-type(1)",
+                "diff": {"remove": [], "change": [["width", "10"]]},
+            }
+        ],
+    )
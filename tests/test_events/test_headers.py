@@ -8,3 +8,9 @@ def test_headers():
     multiple = headers("128.284.1.8", "1500")
     assert "128.284.1.8" in multiple
     assert "1500" in multiple
+
+
+def test_headers_2():
+    assert 'socket.binaryType = "arraybuffer";' in EVENT_HEADERS
+    assert "requestAnimationFrame(Y)" in EVENT_HEADERS
+    assert "FileReader" not in EVENT_HEADERS
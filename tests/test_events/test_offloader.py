@@ -0,0 +1,184 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+import detroit_live as d3
+from detroit_live.events import (
+    DetachedCall,
+    EventProducers,
+    Offloader,
+    Session,
+    TrackingTree,
+)
+from detroit_live.events.event_producers import SharedState
+from detroit_live.events.session import get_session
+
+
+class Event:
+    pass
+
+
+def heavy(event, d, node):
+    node.attrib.pop("height", None)
+    d3.select(node).attr("width", d * 2).text("done")
+
+
+def test_offloader_1():
+    svg = d3.create("svg")
+    rect = svg.append("rect").attr("height", 1)
+    call = DetachedCall(heavy, Event(), 5, svg.node())
+    assert call() == [(0, "width", "10")]
+    call = DetachedCall(heavy, Event(), 5, rect.node())
+    assert sorted(call()) == [
+        (0, "height", None),
+        (0, "innerHTML", "done"),
+        (0, "width", "10"),
+    ]
+    assert rect.node().get("height") == "1"
+
+
+@pytest.mark.asyncio
+async def test_offloader_2():
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    rect = svg.append("rect").datum({"value": 5}).attr("width", 0)
+    threads = []
+    nodes = []
+
+    def listener(event, d, node):
+        threads.append(threading.current_thread())
+        nodes.append(node)
+        d["value"] += 1
+        rect.attr("width", lambda d: d["value"] * 2)
+
+    with ThreadPoolExecutor(1) as executor:
+        rect.on("click.thread", listener, executor=executor)
+        [event_listener] = svg.event_listeners["MouseEvent"].search(
+            typename="click", name="thread"
+        )
+        [task] = list(event_listener.listener(Event()))
+        assert rect.node().get("width") == "0"
+        jsons = await task
+    assert threads[0] is not threading.current_thread()
+    assert nodes[0] is not rect.node()
+    assert jsons == [
+        {
+            "elementId": "svg rect:nth-of-type(1)",
+            "diff": {"remove": [], "change": [["width", "12"]]},
+        }
+    ]
+    assert rect.node().get("width") == "12"
+    assert svg._shared.data[rect.node()] == {"value": 5}
+
+
+@pytest.mark.asyncio
+async def test_offloader_3():
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    rect = svg.append("rect").datum(5)
+
+    with ProcessPoolExecutor(1) as executor:
+        rect.on(
+            "click.process", heavy, html_nodes=[rect.node()], executor=executor
+        )
+        [event_listener] = svg.event_listeners["MouseEvent"].search(
+            typename="click", name="process"
+        )
+        [task] = list(event_listener.listener(Event()))
+        jsons = await task
+    jsons[0]["diff"]["change"].sort()
+    assert jsons == [
+        {
+            "elementId": "svg rect:nth-of-type(1)",
+            "diff": {"remove": [], "change": [["innerHTML", "done"], ["width", "10"]]},
+        }
+    ]
+    assert rect.node().get("width") == "10"
+    assert rect.node().text == "done"
+
+
+@pytest.mark.asyncio
+async def test_offloader_4(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    rect = svg.append("rect").attr("width", 0)
+    ttree.enable_ids()
+
+    def callback(elapsed, timer_event):
+        rect.attr("width", 3)
+        timer_event.set()
+
+    event_producers = d3.event_producers()
+    with ThreadPoolExecutor(1) as executor:
+        event_producers.add_timer(callback, [rect.node()], executor=executor)
+        tasks = event_producers.next_tasks()
+        await asyncio.wait(tasks)
+        _, values = await event_producers.queue_task()
+    assert values == [
+        {"elementId": 2, "diff": {"remove": [], "change": [["width", "3"]]}}
+    ]
+    assert rect.node().get("width") == "3"
+
+
+def test_offloader_5():
+    with ProcessPoolExecutor(1) as executor:
+        with pytest.raises(ValueError):
+            d3.event_producers().add_timer(
+                lambda elapsed, timer_event: None, executor=executor
+            )
+    svg = d3.create("svg")
+    rect = svg.append("rect")
+    session = Session(svg.node(), {})
+    session.enter()
+    try:
+        nested = Session(session.root, session.data)
+    finally:
+        session.exit()
+    assert nested.node(rect.node()) is nested.node(session.node(rect.node()))
+    assert nested.node(rect.node()) is not rect.node()
+    assert Offloader().listener(heavy, executor) is not heavy
+
+
+@pytest.mark.asyncio
+async def test_offloader_6():
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    rects = svg.select_all("rect").data([{"value": 1}, {"value": 2}]).join("rect")
+    first = d3.select(rects.nodes()[0])
+    sessions = []
+
+    def callback(elapsed, timer_event):
+        sessions.append(get_session())
+        first.attr("width", lambda d: d["value"])
+
+    def failing(elapsed, timer_event):
+        sessions.append(get_session())
+        first.attr("width", 0)
+        raise RuntimeError
+
+    with ThreadPoolExecutor(1) as executor:
+        offloaded = Offloader().timer(callback, executor)
+        await offloaded(0, None)
+        await offloaded(0, None)
+        # The copy of the document is reused and holds its writes
+        assert sessions[0] is sessions[1]
+        assert first.node().get("width") == "1"
+        assert sessions[1].node(first.node()).get("width") == "1"
+        # Only read data are copied
+        assert list(sessions[1].data.values()) == [{"value": 1}]
+
+        first.attr("height", 3)
+        await offloaded(0, None)
+        assert sessions[2] is not sessions[1]
+        assert sessions[2].node(first.node()).get("height") == "3"
+
+        with pytest.raises(RuntimeError):
+            await Offloader().timer(failing, executor)(0, None)
+        assert first.node().get("width") == "1"
+        await offloaded(0, None)
+        assert sessions[4] is not sessions[3]
+        assert sessions[4].node(first.node()).get("width") == "1"
@@ -0,0 +1,193 @@
+import asyncio
+
+import orjson
+import pytest
+
+import detroit_live as d3
+from detroit_live.events import (
+    EventProducers,
+    Session,
+    SessionAttribute,
+    TrackingTree,
+    get_session,
+)
+from detroit_live.events.event_producers import SharedState
+
+
+class Event:
+    pass
+
+
+class Behavior:
+    state = SessionAttribute()
+
+    def __init__(self):
+        self.state = {}
+
+
+def test_session_1():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    circles = svg.select_all("circle").data([1, 2]).join("circle")
+    ttree.enable_ids()
+    session = Session(ttree.root, svg._shared.data)
+    session.enter()
+    try:
+        assert get_session() is session
+        assert ttree.root is session.root
+        circles.attr("r", lambda d: d * 10)
+        assert [svg._shared.data[node] for node in circles.nodes()] == [1, 2]
+        assert [ttree.get_id(node) for node in circles.nodes()] == [2, 3]
+        assert ttree.get_node(2) is circles.node()
+    finally:
+        session.exit()
+    assert get_session() is None
+    assert circles.node().get("r") is None
+    assert [node.get("r") for node in session.root.iter("circle")] == ["10", "20"]
+    assert session.master(session.node(circles.node())) is circles.node()
+
+
+def test_session_2():
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    rect = svg.append("rect").attr("width", 1)
+    ttree.enable_ids()
+
+    def listener(event, d, node):
+        rect.attr("width", lambda d: d)
+
+    rect.datum(5).on("click.session", listener)
+    sessions = [Session(ttree.root, svg._shared.data) for _ in range(2)]
+    for session in sessions:
+        session.enter()
+        try:
+            [event_listener] = svg.event_listeners["MouseEvent"].search(
+                typename="click", name="session"
+            )
+            jsons = list(event_listener.listener(Event()))
+        finally:
+            session.exit()
+        assert jsons == [
+            {"elementId": 2, "diff": {"remove": [], "change": [["width", "5"]]}}
+        ]
+    assert rect.node().get("width") == "1"
+
+
+def test_session_3():
+    behavior = Behavior()
+    behavior.state["count"] = 1
+    session = Session(d3.create("svg").node(), {})
+    session.enter()
+    try:
+        behavior.state["count"] += 1
+        assert behavior.state == {"count": 2}
+    finally:
+        session.exit()
+    assert behavior.state == {"count": 1}
+
+
+@pytest.mark.asyncio
+async def test_session_4(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+    svg = d3.create("svg")
+    ttree = TrackingTree()
+    ttree.set_root(svg.node())
+    rect = svg.append("rect").attr("width", 0)
+    ticks = []
+
+    def callback(elapsed, timer_event):
+        ticks.append(get_session())
+        rect.attr("width", len(ticks))
+        timer_event.set()
+
+    event_producers = d3.event_producers()
+    event_producers.add_timer(callback, [rect.node()])
+    session = Session(svg.node(), {})
+    session.enter()
+    try:
+        tasks = event_producers.next_tasks()
+        await asyncio.wait(tasks)
+        _, values = await event_producers.queue_task()
+    finally:
+        session.exit()
+    assert ticks == [session]
+    assert values == [
+        {
+            "elementId": "svg rect:nth-of-type(1)",
+            "diff": {"remove": [], "change": [["width", "1"]]},
+        }
+    ]
+    assert rect.node().get("width") == "0"
+    assert len(EventProducers._shared_state.restart) == 1
+
+
+@pytest.mark.asyncio
+async def test_session_5(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    rect = svg.append("rect").attr("width", 1)
+
+    def listener(event, d, node):
+        rect.attr("width", 2)
+
+    rect.on("click.session", listener)
+    app = svg.create_app(sessions=True)
+    event = {
+        "x": 0,
+        "y": 0,
+        "clientX": 0,
+        "clientY": 0,
+        "pageX": 0,
+        "pageY": 0,
+        "button": 0,
+        "ctrlKey": False,
+        "shiftKey": False,
+        "altKey": False,
+        "elementId": 2,
+        "rectTop": 0,
+        "rectLeft": 0,
+        "type": "MouseEvent",
+        "typename": "click",
+    }
+    client = app.test_client()
+    for _ in range(2):
+        async with client.websocket("/ws") as test_websocket:
+            await test_websocket.send(orjson.dumps(event).decode())
+            result = await test_websocket.receive()
+        assert orjson.loads(result) == [
+            {"elementId": 2, "diff": {"remove": [], "change": [["width", "2"]]}},
+            {"ack": [["click", 1]]},
+        ]
+    assert rect.node().get("width") == "1"
+
+
+def test_session_6():
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    circles = svg.select_all("circle").data([1, 2]).join("circle")
+    sessions = [Session(svg.node(), svg._shared.data) for _ in range(2)]
+    groups = []
+    for session in sessions:
+        session.enter()
+        try:
+            # Nodes are mapped once per session
+            assert circles._groups is circles._groups
+            assert circles._parents is circles._parents
+            groups.append(circles._groups)
+            assert circles.nodes() == list(session.root.iter("circle"))
+        finally:
+            session.exit()
+    assert groups[0][0][0] is not groups[1][0][0]
+    assert circles.nodes() == list(svg.node().iter("circle"))
+
+    circles._groups = [circles.nodes()[:1]]
+    session = sessions[0]
+    session.enter()
+    try:
+        assert circles.nodes() == [session.node(circles.node())]
+    finally:
+        session.exit()
+    assert session.masters[session.root] is svg.node()
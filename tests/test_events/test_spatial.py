@@ -0,0 +1,232 @@
+import random
+
+import pytest
+
+import detroit_live as d3
+from detroit_live.events.context_listener import ContextListener
+from detroit_live.events.event_listeners import EventListener, EventListenersGroup
+from detroit_live.events.spatial import (
+    Quadtree,
+    SpatialIndex,
+    SpatialState,
+    contains,
+    geometry,
+    parse_path,
+    parse_transform,
+)
+from detroit_live.events.tracking_tree import TrackingTree
+from detroit_live.events.types import MouseEvent
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(SpatialIndex, "_SpatialIndex__state", SpatialState())
+    return SpatialIndex()
+
+
+@pytest.mark.parametrize(
+    "transform, expected",
+    [
+        [None, (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)],
+        ["translate(10)", (1.0, 0.0, 0.0, 1.0, 10.0, 0.0)],
+        ["translate(10, 20) scale(2)", (2.0, 0.0, 0.0, 2.0, 10.0, 20.0)],
+        ["scale(2 3)", (2.0, 0.0, 0.0, 3.0, 0.0, 0.0)],
+        ["matrix(1,2,3,4,5,6)", (1.0, 2.0, 3.0, 4.0, 5.0, 6.0)],
+    ],
+)
+def test_parse_transform(transform, expected):
+    assert parse_transform(transform) == expected
+
+
+def test_parse_path():
+    assert parse_path("M0,0L10,0L10,10Z") == [[(0, 0), (10, 0), (10, 10)]]
+    assert parse_path("m5 5 h10 v10 h-10 z") == [[(5, 5), (15, 5), (15, 15), (5, 15)]]
+    assert parse_path("M0,0 10,0 10,10") == [[(0, 0), (10, 0), (10, 10)]]
+    assert parse_path("M0,0C0,10,10,10,10,0")[0][-1] == (10, 0)
+    assert parse_path("") == []
+
+
+@pytest.mark.parametrize(
+    "point, expected",
+    [
+        [(0, 0), True],
+        [(9.5, 0), True],
+        [(0, -9.9), True],
+        [(7.5, 7.5), False],
+        [(11, 0), False],
+    ],
+)
+def test_contains_arc(point, expected):
+    # Circle drawn with two arcs as d3.arc does
+    rings = parse_path("M0,-10A10,10,0,1,1,0,10A10,10,0,1,1,0,-10Z")
+    assert contains("polygon", rings, *point) is expected
+
+
+def test_geometry():
+    svg = d3.create("svg")
+    circle = svg.append("circle").attr("cx", 10).attr("cy", 20).attr("r", 5).node()
+    rect = svg.append("rect").attr("width", 10).attr("height", "50%").node()
+    text = svg.append("text").node()
+    assert geometry(circle) == ("circle", (10, 20, 5), (5, 15, 15, 25))
+    assert geometry(rect) is None
+    assert geometry(text) is None
+
+
+def test_quadtree():
+    random.seed(0)
+    quadtree = Quadtree()
+    boxes = {}
+    for i in range(2000):
+        x, y, size = random.random() * 100, random.random() * 100, random.random() * 10
+        boxes[i] = (x, y, x + size, y + size)
+        quadtree.insert(i, boxes[i])
+    for i in range(0, 2000, 3):
+        x, y = random.random() * 300 - 100, random.random() * 100
+        boxes[i] = (x, y, x + 2, y + 2)
+        quadtree.insert(i, boxes[i])
+    for i in range(1, 2000, 7):
+        quadtree.remove(i)
+        del boxes[i]
+    assert len(quadtree) == len(boxes)
+    for _ in range(500):
+        px, py = random.random() * 300 - 100, random.random() * 100
+        expected = {
+            i
+            for i, (x0, y0, x1, y1) in boxes.items()
+            if x0 <= px <= x1 and y0 <= py <= y1
+        }
+        assert set(quadtree.query(px, py)) == expected
+
+
+def test_spatial_index_1(index):
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    g = svg.append("g").attr("transform", "translate(100, 0) scale(2)")
+    circles = (
+        g.select_all("circle")
+        .data([0, 1, 2])
+        .join("circle")
+        .attr("cx", lambda d: d * 10)
+        .attr("cy", 0)
+        .attr("r", 4)
+        .spatial_index()
+    )
+    nodes = circles.nodes()
+    assert index.enabled
+    assert index.find(120, 0) is nodes[1]
+    assert index.find(0, 0) is None
+    assert index.find(100 + 2 * 4.5, 0) is None
+
+    # Writes through selections are followed
+    circles.attr("cx", lambda d: d * 20)
+    assert index.find(140, 0) is nodes[1]
+    circles.attrs({"cy": [0, 50, 0]})
+    assert index.find(140, 100) is nodes[1]
+    assert index.find(140, 0) is None
+
+    # Transformations of containers are applied on the pointer
+    g.attr("transform", "translate(0, 0)")
+    assert index.find(20, 50) is nodes[1]
+
+    d3.select(nodes[1]).attr("pointer-events", "none")
+    assert index.find(20, 50) is None
+    circles.spatial_index(False)
+    assert not index.enabled
+
+
+def test_spatial_index_2(index):
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    back = svg.append("rect").attr("width", 100).attr("height", 100).spatial_index()
+    front = svg.append("path").attr("d", "M0,0L50,0L0,50Z").spatial_index()
+    assert index.find(10, 10) is front.node()
+    assert index.find(40, 40) is back.node()
+
+    svg.node().insert(0, front.node())
+    assert index.find(10, 10) is back.node()
+
+    back.remove()
+    assert index.find(40, 40) is None
+    assert index.find(10, 10) is front.node()
+
+
+def test_spatial_index_3(index):
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    circle = svg.append("circle").attr("r", 10).spatial_index()
+    rect = svg.append("rect").attr("width", 10).attr("height", 10)
+
+    def listener(event, d, node):
+        pass
+
+    group = EventListenersGroup("click")
+    for node in [svg.node(), circle.node()]:
+        group[(node, "click", "")] = EventListener(
+            "click", "", ContextListener([node], [], listener, lambda node: None)
+        )
+    assert index.resolves([svg.node(), circle.node()])
+    assert "'click', null)" in group.into_script()
+
+    event = MouseEvent(*([0] * 10), element_id=None, rect_top=0, rect_left=0)
+    assert group.filter_by(event, "click")[0].node is circle.node()
+    event = MouseEvent(*([50] * 10), element_id=None, rect_top=0, rect_left=0)
+    assert group.filter_by(event, "click")[0].node is svg.node()
+
+    group[(rect.node(), "click", "")] = EventListener(
+        "click", "", ContextListener([rect.node()], [], listener, lambda node: None)
+    )
+    assert not index.resolves([svg.node(), circle.node(), rect.node()])
+    assert "'click', p(e.srcElement))" in group.into_script()
+
+
+def test_spatial_index_4(index, monkeypatch):
+    svg = d3.create("svg")
+    TrackingTree().set_root(svg.node())
+    left = svg.append("g")
+    right = svg.append("g").attr("transform", "translate(200, 0)")
+    a = left.append("rect").attr("width", 10).attr("height", 10).spatial_index()
+    b = right.append("rect").attr("width", 10).attr("height", 10).spatial_index()
+    assert index.find(5, 5) is a.node()
+    assert index.find(205, 5) is b.node()
+
+    # The surface is searched again after structural edits only
+    assert index.surface() is svg.node()
+    structure = TrackingTree().structure
+    a.attr("width", 20)
+    assert TrackingTree().structure == structure
+    assert index._state.surface == (structure, svg.node())
+    svg.append("g")
+    assert TrackingTree().structure > structure
+    assert index.surface() is svg.node()
+
+    # Frames of layers are reused until the document changes
+    calls = []
+    frame = SpatialIndex._frame
+
+    def counted(*args):
+        calls.append(args[0])
+        return frame(*args)
+
+    monkeypatch.setattr(SpatialIndex, "_frame", staticmethod(counted))
+    index.find(5, 5)
+    calls.clear()
+    assert index.find(205, 5) is b.node()
+    assert index.find(15, 5) is a.node()
+    assert calls == []
+
+    # Layers whose extent does not contain the point are not queried
+    queried = []
+    for parent, layer in index._state.layers.items():
+        monkeypatch.setattr(
+            layer,
+            "query",
+            lambda x, y, parent=parent, query=layer.query: queried.append(parent)
+            or query(x, y),
+        )
+    assert index.find(205, 5) is b.node()
+    assert queried == [right.node()]
+
+    right.attr("transform", "translate(300, 0)")
+    assert index.find(205, 5) is None
+    assert index.find(305, 5) is b.node()
+    assert right.node() in calls
@@ -14,6 +14,79 @@ def test_tracking_tree_1():
     assert ttree.get_node("svg/g[1]/circle[2]") is None
     assert ttree.get_node("svg/g[2]/circle[2]") is None
 
-    assert ttree.get_path(circle1.node()) == "/g[1]/circle[1]"
-    assert ttree.get_path(circle2.node()) == "/g[2]/circle[1]"
-    assert ttree.get_path(svg.node()) == "svg/.[1]"
+    assert ttree.get_path(circle1.node()) == "svg/g[1]/circle[1]"
+    assert ttree.get_path(circle2.node()) == "svg/g[2]/circle[1]"
+    assert ttree.get_path(svg.node()) == "svg"
+
+
+def test_tracking_tree_2():
+    ttree = TrackingTree()
+    svg = d3.create("svg")
+    circles = svg.append("g").select_all("circle").data([1, 2]).join("circle")
+    ttree.set_root(svg.node())
+    assert ttree.ids_enabled is False
+    assert ttree.get_reference(circles.node()) == "svg g circle:nth-of-type(1)"
+    ttree.enable_ids()
+    assert [node.get("data-detroit-id") for node in svg.node().iter()] == [
+        "1",
+        "2",
+        "3",
+        "4",
+    ]
+    assert ttree.get_reference(circles.node()) == 3
+    assert ttree.get_node(4) is circles.nodes()[1]
+    circles.remove()
+    assert ttree.get_node(4) is None
+    assert circles.node().get("data-detroit-id") is None
+    ttree.set_root(svg.node())
+    assert ttree.ids_enabled is False
+
+
+def test_tracking_tree_3():
+    ttree = TrackingTree()
+    svg = d3.create("svg")
+    g = svg.append("g")
+    ttree.set_root(svg.node())
+    circles = g.select_all("circle").data([1, 2, 3]).join("circle")
+    first, second, third = circles.nodes()
+    assert ttree.get_path(g.node()) == "svg/g[1]"
+    assert ttree.get_path(second) == "svg/g/circle[2]"
+    assert ttree.get_node("svg/g/circle[3]") is third
+    assert (ttree.hits, ttree.misses) == (0, 3)
+    assert ttree.get_path(second) == "svg/g/circle[2]"
+    assert ttree.get_node("svg/g/circle[3]") is third
+    assert (ttree.hits, ttree.misses) == (2, 3)
+    rebuilds = ttree.rebuilds
+
+    # Appended nodes do not rebuild indexes
+    fourth = g.append("circle").node()
+    assert ttree.get_path(fourth) == "svg/g/circle[4]"
+    assert ttree.get_path(second) == "svg/g/circle[2]"
+    assert ttree.rebuilds == rebuilds
+
+    # Removed nodes shift their next siblings
+    d3.select(first).remove()
+    assert ttree.get_path(second) == "svg/g/circle[1]"
+    assert ttree.get_node("svg/g/circle[3]") is fourth
+    assert ttree.get_node("svg/g/circle[4]") is None
+
+    # Inserted and moved nodes
+    g.insert("circle", "circle")
+    inserted = g.node()[0]
+    assert ttree.get_path(inserted) == "svg/g/circle[1]"
+    assert ttree.get_path(fourth) == "svg/g/circle[4]"
+    nodes = g.select_all("circle").data([1, 2, 3, 4]).join("circle").nodes()
+    g.select_all("circle").data([4, 3, 2, 1], lambda d: d).order()
+    assert list(g.node()) == nodes[::-1]
+    assert [ttree.get_path(node) for node in nodes] == [
+        f"svg/g/circle[{i}]" for i in range(4, 0, -1)
+    ]
+
+    # Steps become indexed with a second sibling of the same tag
+    assert ttree.get_path(g.node()) == "svg/g[1]"
+    assert ttree.get_path(inserted) == "svg/g/circle[4]"
+    svg.append("g")
+    assert ttree.get_path(inserted) == "svg/g[1]/circle[4]"
+    assert ttree.get_node("svg/g/circle[4]") is inserted
+    d3.select(svg.node()).select_all("g").filter(lambda d, i: i == 1).remove()
+    assert ttree.get_path(inserted) == "svg/g/circle[4]"
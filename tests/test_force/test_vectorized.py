@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+from detroit.force import (
+    force_center,
+    force_collide,
+    force_link,
+    force_many_body,
+    force_x,
+)
+
+import detroit_live as d3
+from detroit_live.events import EventProducers
+from detroit_live.events.event_producers import SharedState
+from detroit_live.force import vectorized
+from detroit_live.force.vectorized import VectorizedForceSimulation
+from detroit_live.timer import TimerEvent
+
+
+@pytest.fixture(autouse=True)
+def shared_state(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+
+
+def scattered():
+    return [
+        {"x": (i * 37) % 101 * 3.0, "y": (i * 53) % 97 * 3.0} for i in range(200)
+    ]
+
+
+def pairs():
+    return [
+        node
+        for i in range(50)
+        for node in (
+            {"x": 100.0 * i, "y": 7.0 * (i % 3)},
+            {"x": 100.0 * i + 3 + i % 5, "y": 7.0 * (i % 3) + 1.5},
+        )
+    ]
+
+
+def states(nodes, force, iterations=3):
+    simulation = d3.force_simulation(nodes, backend="python")
+    simulation.set_force("force", force()).stop().tick(iterations)
+    expected = [[d["x"], d["y"], d["vx"], d["vy"]] for d in simulation.get_nodes()]
+    return np.array(expected)
+
+
+def vectorized_states(nodes, force, iterations=3):
+    simulation = d3.force_simulation(nodes, backend="numpy")
+    simulation.set_force("force", force()).stop().tick(iterations)
+    actual = [[d["x"], d["y"], d["vx"], d["vy"]] for d in simulation.get_nodes()]
+    return np.array(actual)
+
+
+@pytest.mark.parametrize(
+    "nodes, force, iterations",
+    [
+        (scattered, lambda: force_many_body().set_theta(1e-3), 3),
+        (scattered, lambda: force_center(5, 5), 3),
+        (scattered, lambda: force_x(3), 3),
+        (pairs, lambda: force_collide(lambda d: 3 + d["index"] % 2), 1),
+        (
+            pairs,
+            lambda: force_link(
+                [{"source": 2 * i, "target": 2 * i + 1} for i in range(50)]
+            ).set_id(lambda d: d["index"]),
+            1,
+        ),
+    ],
+)
+def test_vectorized_1(nodes, force, iterations):
+    expected = states(nodes(), force, iterations)
+    actual = vectorized_states(nodes(), force, iterations)
+    np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-6)
+
+
+def test_vectorized_2():
+    nodes = scattered()
+    simulation = d3.force_simulation(nodes, backend="numpy")
+    assert isinstance(simulation, VectorizedForceSimulation)
+    simulation.set_force("charge", force_many_body()).stop()
+    x = nodes[0]["x"]
+    simulation.tick(2)
+    assert nodes[0]["x"] == x
+    ticks = []
+    simulation.on("tick", lambda simulation: ticks.append(nodes[0]["x"]))
+    simulation._step(0, TimerEvent())
+    assert ticks[0] != x
+    assert simulation.find(nodes[0]["x"], nodes[0]["y"]) is nodes[0]
+    assert simulation.find(-1e6, -1e6, radius=1) is None
+
+
+def test_vectorized_3():
+    nodes = scattered()
+    nodes[3]["fx"] = 10
+    simulation = d3.force_simulation(nodes, backend="numpy")
+    simulation.set_force("charge", force_many_body()).stop().tick(5)
+    nodes[4]["fy"] = 20
+    simulation.tick(5)
+    nodes = simulation.get_nodes()
+    assert nodes[3]["x"] == 10 and nodes[3]["vx"] == 0
+    assert nodes[4]["y"] == 20 and nodes[4]["vy"] == 0
+    assert nodes[3]["y"] != nodes[3].get("fy")
+
+
+def test_vectorized_4():
+    nodes = scattered()
+    simulation = d3.force_simulation(nodes, backend="numpy")
+    simulation.set_force("charge", force_many_body()).stop().tick(3)
+    expected = states(scattered(), force_many_body)
+    actual = np.array([[d["vx"], d["vy"]] for d in simulation.get_nodes()])
+    error = np.abs(actual - expected[:, 2:]).max()
+    assert error < 0.05 * np.abs(expected[:, 2:]).max()
+    with pytest.raises(ValueError):
+        d3.force_simulation([], backend="cuda")
+    assert d3.force_simulation([], backend="numpy").find(0, 0) is None
+
+
+def test_vectorized_5(monkeypatch):
+    def links():
+        return force_link(
+            [{"source": i, "target": (i + 1) % 20} for i in range(20)]
+            + [{"source": i, "target": (i + 7) % 20} for i in range(0, 20, 4)]
+        ).set_id(lambda d: d["index"])
+
+    # Few links are applied one after another, as the Python backend does
+    expected = states(scattered()[:20], links, 10)
+    actual = vectorized_states(scattered()[:20], links, 10)
+    np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-6)
+
+    # Links applied all at once drift from the Python backend
+    monkeypatch.setattr(vectorized, "SEQUENTIAL_LINKS", 0)
+    expected = states(scattered()[:20], links, 1)
+    actual = vectorized_states(scattered()[:20], links, 1)
+    initial = np.array([[d["x"], d["y"]] for d in scattered()[:20]])
+    moved = np.abs(expected[:, :2] - initial).max()
+    drift = np.abs(actual[:, :2] - expected[:, :2]).max()
+    assert 0 < drift < 0.5 * moved
@@ -0,0 +1,155 @@
+import random
+from array import array
+from base64 import b64decode
+
+import numpy as np
+import pytest
+
+import detroit_live as d3
+from detroit_live.events import DirtyTracker
+from detroit_live.events.marks import CanvasMarks, Marks, MarksState
+from detroit_live.events.tracking_tree import TrackingTree
+from detroit_live.selection import CanvasSelection, Mark
+
+
+def unpack(value: str) -> list[float]:
+    return array("f", b64decode(value)).tolist()
+
+
+@pytest.fixture
+def canvas(monkeypatch):
+    monkeypatch.setattr(CanvasMarks, "_CanvasMarks__state", MarksState())
+    canvas = d3.create("canvas").attr("width", 100).attr("height", 100)
+    TrackingTree().set_root(canvas.node())
+    return canvas
+
+
+def test_canvas_1(canvas):
+    circles = (
+        canvas.select_all("circle")
+        .data([1, 2, 3])
+        .join("circle")
+        .attr("cx", lambda d: d * 10)
+        .attr("cy", [5, 6, 7])
+        .attr("r", 2)
+        .style("fill", lambda d, i: "red" if i else "blue")
+    )
+    assert isinstance(circles, CanvasSelection)
+    assert circles.size() == 3
+    assert circles.data() == [1, 2, 3]
+    assert circles.attr("cx") == 10
+    assert len(canvas.node()) == 0
+    marks = CanvasMarks().layer(canvas.node(), "circle")
+    assert marks.columns["cx"].tolist() == [10, 20, 30]
+    assert marks.columns["fill"] == ["blue", "red", "red"]
+
+    circles.attrs({"cx": np.array([1, 2, 3], dtype=np.float32)})
+    assert marks.columns["cx"].tolist() == [1, 2, 3]
+
+    circles = canvas.select_all("circle").data([1, 2, 3, 4])
+    assert marks.columns["cx"].tolist() == [1, 2, 3, 0]
+    assert marks.columns["fill"] == ["blue", "red", "red", None]
+
+    with pytest.raises(ValueError):
+        circles.attr("cx", [1, 2])
+    with pytest.raises(ValueError):
+        circles.join("rect")
+    with pytest.raises(ValueError):
+        Marks(canvas.node(), "path")
+
+
+def test_canvas_2(canvas):
+    circles = canvas.select_all("circle").data([1, 2, 3]).join("circle")
+    tracker = DirtyTracker()
+    tracker.start()
+    circles.attr("cx", [1.5, 2.5, 3.5]).attr("fill", "red")
+    d3.select(circles.nodes()[1]).attr("cy", 4)
+    tracker.stop()
+    [value] = list(tracker.flush())
+    assert value["op"] == "marks"
+    assert value["kind"] == "circle"
+    assert (value["size"], value["start"]) == (3, 0)
+    assert unpack(value["columns"]["cx"]) == [1.5, 2.5, 3.5]
+    assert unpack(value["columns"]["cy"]) == [0, 4, 0]
+    assert value["columns"]["fill"] == ["red", "red", "red"]
+
+    # Writes of a single mark only send its values
+    tracker.start()
+    d3.select(circles.nodes()[2]).attr("r", 8)
+    tracker.stop()
+    [value] = list(tracker.flush())
+    assert (value["start"], unpack(value["columns"]["r"])) == (2, [8])
+
+    tracker.start()
+    circles.filter(lambda d: d > 1).remove()
+    tracker.stop()
+    [value] = list(tracker.flush())
+    assert value["size"] == 1
+    assert unpack(value["columns"]["cx"]) == [1.5]
+
+
+def test_canvas_3(canvas):
+    rects = (
+        canvas.select_all("rect")
+        .data(["a", "b"])
+        .join("rect")
+        .attr("x", [0, 5])
+        .attr("y", 0)
+        .attr("width", 10)
+        .attr("height", 10)
+    )
+    clicked = []
+
+    def listener(event, d, node):
+        clicked.append((d, node))
+        d3.select(node).attr("fill", "red")
+
+    rects.on("click.canvas-test", listener)
+    event = {
+        "type": "MouseEvent",
+        "typename": "click",
+        "elementId": "canvas",
+        "clientX": 18,
+        "clientY": 15,
+        "rectLeft": 10,
+        "rectTop": 10,
+    }
+    [values] = list(canvas.event_listeners(event))
+    assert clicked == [("b", Mark(canvas.node(), "rect", 1))]
+    assert [value["op"] for value in values] == ["marks"]
+    assert rects.nodes()[1].get("fill") == "red"
+
+    [values] = list(canvas.event_listeners(event | {"clientX": 50}))
+    assert values == []
+    assert len(clicked) == 1
+
+    with pytest.raises(ValueError):
+        rects.on("wheel", listener)
+    rects.on("click.canvas-test", None)
+    assert list(canvas.event_listeners(event)) == []
+
+
+def test_canvas_4(canvas):
+    random.seed(0)
+    marks = Marks(canvas.node(), "circle")
+    marks.resize(1000)
+    marks.write("cx", [random.random() * 100 for _ in range(1000)])
+    marks.write("cy", [random.random() * 100 for _ in range(1000)])
+    marks.write("r", [random.random() * 5 for _ in range(1000)])
+    marks.write("r", [60], [10])
+    cx, cy, r = (marks.columns[key] for key in ("cx", "cy", "r"))
+    for _ in range(200):
+        x, y = random.random() * 100, random.random() * 100
+        inside = [
+            i for i in range(1000) if (x - cx[i]) ** 2 + (y - cy[i]) ** 2 <= r[i] ** 2
+        ]
+        assert marks.find(x, y) == (inside[-1] if inside else None)
+
+
+def test_canvas_5(canvas):
+    canvas.select_all("circle").data([1, 2]).join("circle").attr("r", 1)
+    [value] = CanvasMarks().snapshot(canvas.node())
+    assert value["elementId"] == "canvas"
+    assert value["size"] == 2
+    assert unpack(value["columns"]["r"]) == [1, 1]
+    assert CanvasMarks().snapshot(d3.create("svg").node()) == []
@@ -6,6 +6,7 @@ import pytest
 import detroit_live as d3
 from detroit_live.events.event_listeners import EventListeners
 from detroit_live.events.event_producers import EventProducers
+from detroit_live.events.tracking_tree import TrackingTree
 
 
 @pytest.mark.asyncio
@@ -105,7 +106,8 @@ async def test_create_app_6(monkeypatch):
     }
 
     def mock_call(self, event):
-        yield "Success"
+        yield [{"elementId": 1, "diff": {"remove": [], "change": [["x", "1"]]}}]
+        yield [{"elementId": 1, "diff": {"remove": [], "change": [["x", "2"]]}}]
 
     monkeypatch.setattr(EventListeners, "__call__", mock_call)
 
@@ -119,7 +121,10 @@ async def test_create_app_6(monkeypatch):
     async with client.websocket("/ws") as test_websocket:
         await test_websocket.send(orjson.dumps(json).decode())
         result = await test_websocket.receive()
-    assert result.decode() == '"Success"'
+    assert orjson.loads(result) == [
+        {"elementId": 1, "diff": {"remove": [], "change": [["x", "2"]]}},
+        {"ack": [["mousedown", 1]]},
+    ]
     event_producers = d3.event_producers()
     for task in event_producers._pending.values():
         task.cancel()
@@ -131,7 +136,8 @@ async def test_create_app_7(monkeypatch):
     calls = {"next_tasks": 0, "queue_task": 0}
 
     async def task():
-        queue.put_nowait((None, {"status": "success"}))
+        queue.put_nowait((None, []))
+        queue.put_nowait((None, [{"op": "remove", "elementIds": [1]}]))
         return 10
 
     def mock_next_tasks(self, result=None):
@@ -141,7 +147,7 @@ async def test_create_app_7(monkeypatch):
 
     def mock_queue_task(self, result=None):
         calls["queue_task"] += 1
-        if result is None:
+        if result is None or isinstance(result, tuple):
             return asyncio.create_task(queue.get())
 
     monkeypatch.setattr(EventProducers, "next_tasks", mock_next_tasks)
@@ -151,6 +157,17 @@ async def test_create_app_7(monkeypatch):
     client = app.test_client()
     async with client.websocket("/ws") as test_websocket:
         result = await test_websocket.receive()
-    assert orjson.loads(result) == {"status": "success"}
-    assert calls["next_tasks"] == 3
-    assert calls["queue_task"] == 3
+    assert orjson.loads(result) == [{"op": "remove", "elementIds": [1]}]
+
+
+@pytest.mark.asyncio
+async def test_create_app_8():
+    svg = d3.create("svg")
+    svg.append("g").append("circle")
+    TrackingTree().set_root(svg.node())
+    app = svg.create_app()
+    client = app.test_client()
+    response = await client.get("/")
+    content = (await response.get_data()).decode()
+    assert ' data-detroit-id="1"><g data-detroit-id="2">' in content
+    assert '<circle data-detroit-id="3"></circle>' in content
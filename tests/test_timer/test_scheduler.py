@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from detroit_live.timer import Interval, Timer, frame_scheduler, now
+
+
+@pytest.mark.asyncio
+async def test_scheduler_1():
+    scheduler = frame_scheduler()
+    times = {}
+
+    def make_callback(i):
+        def callback(elapsed, timer_event):
+            times.setdefault(i, []).append(now())
+            if len(times[i]) == 3:
+                timer_event.set()
+
+        return callback
+
+    start = now()
+    timers = [Timer() for _ in range(10)]
+    await asyncio.gather(
+        *(timer.restart(make_callback(i), 0, start) for i, timer in enumerate(timers))
+    )
+    assert scheduler.clock is None
+    assert len({tuple(values) for values in times.values()}) == 1
+    frames = times[0]
+    assert frames[1] - frames[0] >= 0.9 / scheduler.frame_rate
+
+
+@pytest.mark.asyncio
+async def test_scheduler_2():
+    scheduler = frame_scheduler()
+    scheduler.frame_rate = 200
+    calls = []
+
+    def callback(elapsed, timer_event):
+        calls.append(elapsed)
+        if len(calls) == 3:
+            timer_event.set()
+
+    interval = Interval()
+    await interval.restart(callback, 20)
+    scheduler.frame_rate = 60
+    assert len(calls) == 3
+    assert all(elapsed > 20 * i - 1 for i, elapsed in enumerate(calls, 1))
+
+
+@pytest.mark.asyncio
+async def test_scheduler_3():
+    def callback(elapsed, timer_event):
+        raise RuntimeError("foo")
+
+    with pytest.raises(RuntimeError):
+        await Timer().restart(callback)
+    with pytest.raises(ValueError):
+        frame_scheduler().frame_rate = 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_4():
+    gate = asyncio.Event()
+    ticks = []
+
+    async def slow(elapsed, timer_event):
+        await gate.wait()
+        timer_event.set()
+
+    def fast(elapsed, timer_event):
+        ticks.append(elapsed)
+        if len(ticks) == 3:
+            gate.set()
+            timer_event.set()
+
+    await asyncio.wait_for(
+        asyncio.gather(Timer().restart(slow), Timer().restart(fast)), 1
+    )
+    assert len(ticks) == 3
@@ -0,0 +1,101 @@
+import warnings
+
+import pytest
+
+import detroit_live as d3
+from detroit_live.events import DirtyTracker, TrackingTree
+
+
+def diffs(values):
+    return {value["elementId"]: value["diff"]["change"] for value in values}
+
+
+def test_culling_1():
+    tracker = DirtyTracker()
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    TrackingTree().set_root(svg.node())
+    g = svg.append("g")
+    circles = (
+        g.select_all("circle")
+        .data([10, 50, 150])
+        .join("circle")
+        .attr("cx", lambda d: d)
+        .attr("cy", 10)
+        .attr("r", 5)
+    )
+    text = svg.append("text").attr("x", 500)
+    zoom = d3.zoom().set_culling(True, padding=2)
+    svg.call(zoom)
+    tracker.enable()
+    try:
+        tracker.start()
+        circles.attr("fill", "red")
+        text.attr("fill", "red")
+        tracker.stop()
+        ids = [TrackingTree().get_reference(node) for node in circles.nodes()]
+        text_id = TrackingTree().get_reference(text.node())
+        assert diffs(tracker.flush()) == {
+            ids[0]: [["fill", "red"]],
+            ids[1]: [["fill", "red"]],
+            text_id: [["fill", "red"]],
+        }
+
+        # The third circle comes into view once the group is translated
+        tracker.start()
+        circles.attr("fill", "blue")
+        g.attr("transform", "translate(-60, 0)")
+        tracker.stop()
+        assert diffs(tracker.flush()) == {
+            ids[2]: [["fill", "blue"]],
+            TrackingTree().get_reference(g.node()): [
+                ["transform", "translate(-60, 0)"]
+            ],
+        }
+        tracker.start()
+        g.attr("transform", "translate(0, 0)")
+        tracker.stop()
+        values = diffs(tracker.flush())
+        assert values[ids[0]] == values[ids[1]] == [["fill", "blue"]]
+
+        # Within the padding
+        tracker.start()
+        circles.attr("cx", lambda d: 106 if d == 150 else d)
+        tracker.stop()
+        assert diffs(tracker.flush())[ids[2]] == [["cx", "106"]]
+    finally:
+        tracker.set_viewport(svg.node(), None)
+        tracker.enable(False)
+    assert zoom.get_culling()
+
+
+def test_level_of_detail():
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    levels = []
+    zoom = d3.zoom().set_level_of_detail(
+        [0.5, 2], lambda level, transform, node: levels.append((level, transform.k))
+    )
+    svg.call(zoom)
+    svg.call(zoom.scale_to, 1.5, None, None)
+    assert levels == []
+    svg.call(zoom.scale_to, 0.25, None, None)
+    svg.call(zoom.scale_to, 0.3, None, None)
+    svg.call(zoom.scale_to, 4, None, None)
+    assert levels == [(0, 0.25), (2, 4)]
+
+
+def test_culling_2():
+    tracker = DirtyTracker()
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    TrackingTree().set_root(svg.node())
+    svg.call(d3.zoom().set_culling(True))
+    try:
+        assert tracker.culling
+        with pytest.warns(UserWarning, match="dirty_tracking=True"):
+            svg.create_app()
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            svg.create_app(dirty_tracking=True)
+    finally:
+        tracker.set_viewport(svg.node(), None)
+        tracker.enable(False)
+    assert not tracker.culling
@@ -0,0 +1,29 @@
+import json
+
+import detroit_live as d3
+from detroit_live.events import TrackingTree
+from detroit_live.zoom.transform import Transform
+
+
+def test_predictive():
+    svg = d3.create("svg").attr("width", 200).attr("height", 100)
+    TrackingTree().set_root(svg.node())
+    g = svg.append("g")
+    zoom = d3.zoom().set_scale_extent([0.5, 8]).set_predictive(g)
+    svg.call(zoom)
+    assert zoom.get_predictive() is g.node()
+    svg.call(zoom.transform, Transform(2, 10, 20), None, None)
+
+    script = svg.event_listeners.into_script()
+    # Client scripts come after event listeners
+    call = script.rsplit("Z(", 1)[1].removesuffix(");")
+    viewport, target, options = json.loads(f"[{call.replace('Infinity', '1e999')}]")
+    assert viewport == TrackingTree().get_reference(svg.node())
+    assert target == TrackingTree().get_reference(g.node())
+    assert options["z"] == [2, 10, 20]
+    assert options["k"] == [0.5, 8]
+    assert options["e"] == [[0, 0], [200, 100]]
+    assert options["d"] == 150
+    svg.event_listeners.set_script((type(zoom), svg.node()), None)
+    assert '"z": [2, 10, 20]' not in svg.event_listeners.into_script()
+
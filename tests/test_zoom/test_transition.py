@@ -0,0 +1,106 @@
+import pytest
+
+import detroit_live as d3
+from detroit_live.events import EventProducers, Session, TrackingTree
+from detroit_live.events.event_producers import SharedState, TimerStatus
+from detroit_live.timer import TimerEvent
+from detroit_live.zoom import zoom as zoom_module
+from detroit_live.zoom.transform import Transform
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+    clock = [0.0]
+    monkeypatch.setattr(zoom_module, "now", lambda: clock[0])
+    return clock
+
+
+def test_transition_1(clock):
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    events = []
+    zoom = d3.zoom().on("start zoom end", lambda event, d, node: events.append(event))
+    svg.call(zoom)
+    zoom.transition(svg, Transform(4, -150, -150))
+    assert d3.zoom_transform(svg.node()) == Transform(1, 0, 0)
+    assert [event.event_type for event in events] == ["start"]
+
+    timer_event = TimerEvent()
+    clock[0] = 0.125
+    zoom._tick(125, timer_event)
+    k = d3.zoom_transform(svg.node()).k
+    assert 1 < k < 4
+    assert not timer_event.is_set()
+
+    clock[0] = 0.25
+    zoom._tick(250, timer_event)
+    assert d3.zoom_transform(svg.node()) == Transform(4, -150, -150)
+    assert [event.event_type for event in events] == ["start", "zoom", "zoom", "end"]
+    assert timer_event.is_set()
+
+
+def test_transition_2(clock):
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    events = []
+    zoom = d3.zoom().on(
+        "start end", lambda event, d, node: events.append(event.event_type)
+    )
+    svg.call(zoom)
+    zoom.transition(svg, Transform(4, 0, 0))
+    driver = zoom._driver
+    assert id(driver._timer) in EventProducers()._restart
+
+    # A transform interrupts the transition and stops its driver
+    svg.call(zoom.transform, Transform(2, 0, 0), None, None)
+    assert events == ["start", "end", "start", "end"]
+    assert zoom._transitions == {}
+    assert driver._timer.is_stopped()
+    clock[0] = 1.0
+    zoom._tick(1000, TimerEvent())
+    assert d3.zoom_transform(svg.node()) == Transform(2, 0, 0)
+
+    # The same driver is restarted by the next transition
+    zoom.transition(svg, Transform(1, 0, 0))
+    assert zoom._driver is driver
+    statuses = [status for status, _ in EventProducers()._future_tasks.queue]
+    assert statuses == [TimerStatus.STOP, TimerStatus.STOP, TimerStatus.RESTART]
+
+
+def test_transition_3(clock):
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    TrackingTree().set_root(svg.node())
+    zoom = d3.zoom()
+    svg.call(zoom)
+    first = Session(svg.node(), svg._shared.data)
+    second = Session(svg.node(), svg._shared.data)
+
+    # Each session drives its transitions with its own timer
+    first.enter()
+    try:
+        zoom.transition(svg, Transform(4, 0, 0))
+        driver = zoom._driver
+        timer = driver._timer
+    finally:
+        first.exit()
+    second.enter()
+    try:
+        zoom.transition(svg, Transform(2, 0, 0))
+        assert zoom._driver is not driver
+        svg.call(zoom.transform, Transform(1, 0, 0), None, None)
+        assert zoom._driver._timer.is_stopped()
+    finally:
+        second.exit()
+    assert not timer.is_stopped()
+
+    first.enter()
+    try:
+        assert zoom._driving
+        clock[0] = 1.0
+        timer_event = TimerEvent()
+        zoom._tick(1000, timer_event)
+        assert timer_event.is_set()
+        assert d3.zoom_transform(svg.node()) == Transform(4, 0, 0)
+    finally:
+        first.exit()
+    assert zoom._driver is None
+    assert d3.zoom_transform(svg.node()) == Transform(1, 0, 0)
@@ -0,0 +1,121 @@
+import pytest
+
+import detroit_live as d3
+from detroit_live.events import EventProducers, Session, TrackingTree, WheelEvent
+from detroit_live.events.event_producers import SharedState
+from detroit_live.timer import TimerEvent
+from detroit_live.zoom import zoom as zoom_module
+from detroit_live.zoom.transform import Transform
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(EventProducers, "_shared_state", SharedState())
+    clock = [0.0]
+    monkeypatch.setattr(zoom_module, "now", lambda: clock[0])
+    return clock
+
+
+def wheel(delta_y: float, x: float = 0, y: float = 0) -> WheelEvent:
+    return WheelEvent(x, y, 0, delta_y, 0, False, 0, 0, 0)
+
+
+def test_wheel(clock):
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    events = []
+    zoom = d3.zoom().on(
+        "start zoom end", lambda event, d, node: events.append(event.event_type)
+    )
+    svg.call(zoom)
+    node = svg.node()
+
+    # Deltas of one frame are summed into a single zoom step
+    for _ in range(5):
+        zoom._wheeled(wheel(-100), None, node)
+    assert events == ["start"]
+    assert d3.zoom_transform(node) == Transform(1, 0, 0)
+    timer_event = TimerEvent()
+    clock[0] = 0.016
+    zoom._tick(16, timer_event)
+    assert events == ["start", "zoom"]
+    assert d3.zoom_transform(node) == Transform(2, 0, 0)
+
+    clock[0] = 0.02
+    zoom._wheeled(wheel(-100, 10, 10), None, node)
+    clock[0] = 0.032
+    zoom._tick(32, timer_event)
+    assert d3.zoom_transform(node).k == pytest.approx(2 ** 1.2)
+    assert events == ["start", "zoom", "zoom"]
+
+    # The gesture ends after `wheel_delay` milliseconds without wheel events
+    clock[0] = 0.1
+    zoom._tick(100, timer_event)
+    assert events == ["start", "zoom", "zoom"]
+    assert not timer_event.is_set()
+    clock[0] = 0.2
+    zoom._tick(200, timer_event)
+    assert events == ["start", "zoom", "zoom", "end"]
+    assert timer_event.is_set()
+    assert zoom._wheels == {}
+
+
+def test_wheel_scale_extent(clock):
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    zoom = d3.zoom().set_scale_extent([1, 1])
+    svg.call(zoom)
+    zoom._wheeled(wheel(-100), None, svg.node())
+    assert zoom._wheels == {}
+    assert zoom._driver is None
+
+
+def test_wheel_sessions(clock):
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    TrackingTree().set_root(svg.node())
+    zoom = d3.zoom()
+    svg.call(zoom)
+    sessions = [Session(svg.node(), svg._shared.data) for _ in range(2)]
+    drivers = []
+    for session, delta in zip(sessions, [-100, 100]):
+        session.enter()
+        try:
+            for _ in range(5):
+                zoom._wheeled(wheel(delta), None, session.node(svg.node()))
+            drivers.append(zoom._driver)
+        finally:
+            session.exit()
+    assert drivers[0] is not drivers[1]
+
+    # The gesture of a session ends without stopping the other one
+    clock[0] = 0.016
+    for session, k in zip(sessions, [2, 0.5]):
+        session.enter()
+        try:
+            timer_event = TimerEvent()
+            zoom._tick(16, timer_event)
+            assert d3.zoom_transform(svg.node()) == Transform(k, 0, 0)
+            assert not timer_event.is_set()
+        finally:
+            session.exit()
+    clock[0] = 0.2
+    sessions[1].enter()
+    try:
+        timer_event = TimerEvent()
+        zoom._tick(200, timer_event)
+        assert timer_event.is_set()
+        assert not zoom._driving
+    finally:
+        sessions[1].exit()
+    sessions[0].enter()
+    try:
+        assert zoom._driving
+        clock[0] = 0.1
+        for _ in range(5):
+            zoom._wheeled(wheel(-100), None, sessions[0].node(svg.node()))
+        assert zoom._driver is drivers[0]
+        assert not zoom._driver._timer.is_stopped()
+        clock[0] = 0.116
+        zoom._tick(116, TimerEvent())
+        assert d3.zoom_transform(svg.node()) == Transform(4, 0, 0)
+    finally:
+        sessions[0].exit()
+    assert d3.zoom_transform(svg.node()) == Transform(1, 0, 0)
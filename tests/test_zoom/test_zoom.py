@@ -2,6 +2,7 @@ from math import inf
 
 import detroit_live as d3
 from detroit_live.zoom.transform import Transform
+from detroit_live.zoom.zoom import default_constrain
 
 
 def test_zoom_1():
@@ -143,3 +144,18 @@ def test_zoom_9():
     assert a[0][0] == Transform(1, 10, 10)
     assert a[0][1] == [[0, 0], [0, 0]]
     assert a[0][2] == [[-inf, -inf], [inf, inf]]
+
+
+def test_zoom_10():
+    extent = [[0, 0], [100, 100]]
+    # The y-extent depends on the y-translation only
+    constrained = default_constrain(Transform(1, 0, -50), extent, extent)
+    assert constrained == Transform(1, 0, 0)
+    constrained = default_constrain(Transform(2, -20, 10), extent, extent)
+    assert constrained == Transform(2, -20, 0)
+
+    svg = d3.create("svg").attr("width", 100).attr("height", 100)
+    zoom = d3.zoom().set_translate_extent(extent)
+    svg.call(zoom)
+    svg.call(zoom.translate_by, 0, -50, None)
+    assert d3.zoom_transform(svg.node()) == Transform(1, 0, 0)